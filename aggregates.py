@@ -0,0 +1,144 @@
+"""Materialized per-team roster totals (TeamAggregate).
+
+Every route that moves a player into or out of a team, or edits a rostered
+player's stats, applies that player's contribution as a single
+`UPDATE team_aggregate SET col = col + delta` in the same transaction, so
+evaluate_team, Team.stats and view_team read one row instead of walking the
+roster.
+
+A team's row is created with the team. Databases from before this table
+get theirs from `flask init-db` (backfill) or `flask check-aggregates --fix`;
+reads never write, and a team without a row reads as an empty roster.
+check() rebuilds everything from scratch to report or repair drift.
+"""
+from sqlalchemy import update
+from models import db, Team, TeamAggregate
+from loaders import polymorphic_player, PLAYER_CATEGORIES
+
+CATEGORY_STATS = {
+    'batsmen': ['runs', 'average', 'strike_rate', 'fifties', 'hundreds'],
+    'wicketkeepers': ['runs', 'average', 'strike_rate', 'fifties', 'hundreds'],
+    'allrounders': ['runs', 'average', 'strike_rate', 'fifties', 'hundreds', 'wickets', 'economy'],
+    'bowlers': ['wickets', 'economy'],
+}
+
+FIELDS = [c.key for c in TeamAggregate.__table__.columns if c.key != 'team_id']
+
+# Float totals are built by repeated add/subtract; differences below this are noise
+TOLERANCE = 1e-6
+
+
+def contributions(player):
+    """What one player adds to its team's aggregate row"""
+    category = player.type
+    deltas = {'total_matches': getattr(player, 'matches', 0) or 0}
+    if category in CATEGORY_STATS:
+        deltas[f'{category}_count'] = 1
+        deltas[f'spent_{category}'] = player.selling_price or player.base_price or 0
+        for stat in CATEGORY_STATS[category]:
+            deltas[f'total_{stat}_{category}'] = getattr(player, stat, 0) or 0
+    return deltas
+
+
+def add(team_id, deltas):
+    """Apply column deltas to a team's row in one UPDATE.
+
+    Teams without a row yet are skipped: backfill() builds it from the
+    roster, which already includes this change.
+    """
+    values = {
+        getattr(TeamAggregate, field): getattr(TeamAggregate, field) + delta
+        for field, delta in deltas.items() if delta
+    }
+    if team_id is None or not values:
+        return
+    db.session.execute(
+        update(TeamAggregate).where(TeamAggregate.team_id == team_id).values(values)
+    )
+
+
+def apply(team_id, player, sign=1):
+    """Add (sign=1) or remove (sign=-1) a player's contribution to a team"""
+    add(team_id, {field: sign * value for field, value in contributions(player).items()})
+
+
+def apply_change(team_id, before, after):
+    """Apply the difference between two contributions() of the same player"""
+    add(team_id, {field: after.get(field, 0) - before.get(field, 0)
+                  for field in set(before) | set(after)})
+
+
+def reset(team_id):
+    """Zero a team's row (its roster was just emptied)"""
+    db.session.execute(
+        update(TeamAggregate).where(TeamAggregate.team_id == team_id)
+        .values(dict.fromkeys(FIELDS, 0))
+    )
+
+
+def compute_all():
+    """Totals for every team rebuilt from the player table, keyed by team id"""
+    totals = {}
+    poly = polymorphic_player()
+    for player in db.session.query(poly).filter(poly.team_id.isnot(None)):
+        team_totals = totals.setdefault(player.team_id, dict.fromkeys(FIELDS, 0))
+        for field, value in contributions(player).items():
+            team_totals[field] += value
+    return totals
+
+
+def backfill():
+    """Build the rows of teams that have none from their rosters; returns how many"""
+    teams = Team.query.filter(~Team.aggregate.has()).all()
+    actual_by_team = compute_all() if teams else {}
+    for team in teams:
+        team.aggregate = TeamAggregate(team_id=team.id, **actual_by_team.get(team.id, dict.fromkeys(FIELDS, 0)))
+    db.session.commit()
+    return len(teams)
+
+
+def totals(aggregate):
+    """Aggregate row as a plain dict, with float noise rounded off.
+
+    A team without a row (aggregate None) has all zeros until it is backfilled.
+    """
+    values = {}
+    for field in FIELDS:
+        value = getattr(aggregate, field, 0) or 0
+        values[field] = round(value, 6) if isinstance(value, float) else value
+    return values
+
+
+def spent(values):
+    """Money spent per category and 'overall', from totals() output"""
+    by_category = {cat: values[f'spent_{cat}'] for cat in PLAYER_CATEGORIES}
+    by_category['overall'] = round(sum(by_category.values()), 6)
+    return by_category
+
+
+def check(fix=False):
+    """Rebuild every team's totals from scratch and report rows that drifted.
+
+    Returns a list of {'team', 'field', 'stored', 'actual'}; with fix=True the
+    stored rows are overwritten with the rebuilt values.
+    """
+    actual_by_team = compute_all()
+    drift = []
+    for team in Team.query.all():
+        actual = actual_by_team.get(team.id, dict.fromkeys(FIELDS, 0))
+        if team.aggregate is None:
+            drift.append({'team': team.name, 'field': '*', 'stored': None, 'actual': actual})
+            if fix:
+                team.aggregate = TeamAggregate(team_id=team.id, **actual)
+            continue
+
+        for field in FIELDS:
+            stored = getattr(team.aggregate, field) or 0
+            if abs(stored - actual[field]) > TOLERANCE:
+                drift.append({'team': team.name, 'field': field, 'stored': stored, 'actual': actual[field]})
+                if fix:
+                    setattr(team.aggregate, field, actual[field])
+
+    if fix:
+        db.session.commit()
+    return drift
@@ -0,0 +1,192 @@
+"""Gap-filling allocation of player ids, team ids and player numbers.
+
+Every scope keeps a high-water mark (AllocatorSequence) plus a free-list of
+values released below it (AllocatorFreeSlot). Allocation hands out the lowest
+free slot, or bumps the high-water mark when there are no gaps, so it never
+scans the player/team tables and the cost per insert stays flat.
+
+Both steps are single conditional statements (DELETE of one slot, UPDATE
+high_water = high_water + 1), so concurrent gunicorn workers serialize on the
+row they touch instead of racing on a Python-side read.
+
+A scope is seeded from the existing rows the first time it is used; run
+`flask resync-allocators` after editing ids or numbers outside the app.
+"""
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.exc import IntegrityError
+from models import db, Team, Player, AllocatorSequence, AllocatorFreeSlot
+
+# Each category owns a block of player numbers: 1-100, 101-200, ...
+CATEGORY_START_NUMBER = {
+    'batsmen': 1, 'bowlers': 101, 'wicketkeepers': 201, 'allrounders': 301
+}
+
+
+def _player_number_scope(category):
+    return f'player_number:{category}'
+
+
+def _scope_floor(scope):
+    if scope.startswith('player_number:'):
+        return CATEGORY_START_NUMBER.get(scope.split(':', 1)[1], 1)
+    return 1
+
+
+def _existing_values(scope):
+    if scope == 'player_id':
+        query = db.session.query(Player.id)
+    elif scope == 'team_id':
+        query = db.session.query(Team.id)
+    else:
+        category = scope.split(':', 1)[1]
+        query = db.session.query(Player.player_number).filter(Player.type == category)
+    return set(value for (value,) in query if value is not None)
+
+
+def _ensure_scope(scope):
+    """Seed a scope from the table it allocates for, once"""
+    exists = db.session.execute(
+        select(AllocatorSequence.scope).where(AllocatorSequence.scope == scope)
+    ).scalar()
+    if exists:
+        return
+
+    floor = _scope_floor(scope)
+    values = set(v for v in _existing_values(scope) if v >= floor)
+    high_water = max(values) if values else floor - 1
+    gaps = [v for v in range(floor, high_water + 1) if v not in values]
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(AllocatorSequence(scope=scope, high_water=high_water))
+            db.session.add_all(AllocatorFreeSlot(scope=scope, value=v) for v in gaps)
+    except IntegrityError:
+        # Another worker seeded it first; its rows are just as good.
+        pass
+
+
+def _allocate(scope):
+    _ensure_scope(scope)
+
+    # Lowest released value first (gap filling)
+    while True:
+        value = db.session.execute(
+            select(func.min(AllocatorFreeSlot.value)).where(AllocatorFreeSlot.scope == scope)
+        ).scalar()
+        if value is None:
+            break
+        taken = db.session.execute(
+            delete(AllocatorFreeSlot)
+            .where(AllocatorFreeSlot.scope == scope, AllocatorFreeSlot.value == value)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if taken:
+            return value
+        # Someone else claimed that slot between the two statements; try the next one.
+
+    db.session.execute(
+        update(AllocatorSequence)
+        .where(AllocatorSequence.scope == scope)
+        .values(high_water=AllocatorSequence.high_water + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return db.session.execute(
+        select(AllocatorSequence.high_water).where(AllocatorSequence.scope == scope)
+    ).scalar()
+
+
+class _SlotRace(Exception):
+    pass
+
+
+def _allocate_many(scope, count):
+    """Allocate `count` values in a handful of statements, lowest gaps first"""
+    if count <= 0:
+        return []
+    _ensure_scope(scope)
+
+    slots = list(db.session.execute(
+        select(AllocatorFreeSlot.value)
+        .where(AllocatorFreeSlot.scope == scope)
+        .order_by(AllocatorFreeSlot.value)
+        .limit(count)
+    ).scalars())
+    if slots:
+        try:
+            with db.session.begin_nested():
+                taken = db.session.execute(
+                    delete(AllocatorFreeSlot)
+                    .where(AllocatorFreeSlot.scope == scope, AllocatorFreeSlot.value.in_(slots))
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                if taken != len(slots):
+                    raise _SlotRace()
+        except _SlotRace:
+            # Lost some slots to a concurrent insert; claim one at a time instead.
+            return [_allocate(scope) for _ in range(count)]
+
+    remaining = count - len(slots)
+    if remaining:
+        db.session.execute(
+            update(AllocatorSequence)
+            .where(AllocatorSequence.scope == scope)
+            .values(high_water=AllocatorSequence.high_water + remaining)
+            .execution_options(synchronize_session=False)
+        )
+        high_water = db.session.execute(
+            select(AllocatorSequence.high_water).where(AllocatorSequence.scope == scope)
+        ).scalar()
+        slots.extend(range(high_water - remaining + 1, high_water + 1))
+    return slots
+
+
+def _release(scope, value):
+    """Return a value to the free-list so the next allocation reuses it"""
+    if value is None:
+        return
+    high_water = db.session.execute(
+        select(AllocatorSequence.high_water).where(AllocatorSequence.scope == scope)
+    ).scalar()
+    # Unseeded scopes pick the gap up from the table when they are seeded.
+    if high_water is None or value > high_water:
+        return
+    db.session.add(AllocatorFreeSlot(scope=scope, value=value))
+
+
+def next_player_id():
+    return _allocate('player_id')
+
+
+def next_team_id():
+    return _allocate('team_id')
+
+
+def next_player_number(category):
+    return _allocate(_player_number_scope(category))
+
+
+def next_player_ids(count):
+    return _allocate_many('player_id', count)
+
+
+def next_player_numbers(category, count):
+    return _allocate_many(_player_number_scope(category), count)
+
+
+def release_player(player):
+    """Call in the same transaction that deletes the player"""
+    _release('player_id', player.id)
+    if player.player_number is not None and player.player_number >= _scope_floor(_player_number_scope(player.type)):
+        _release(_player_number_scope(player.type), player.player_number)
+
+
+def release_team(team):
+    """Call in the same transaction that deletes the team"""
+    _release('team_id', team.id)
+
+
+def resync():
+    """Drop all allocator state so every scope is re-seeded from the tables"""
+    db.session.execute(delete(AllocatorFreeSlot))
+    db.session.execute(delete(AllocatorSequence))
+    db.session.commit()
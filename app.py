@@ -1,8 +1,36 @@
-from flask import Flask, render_template, jsonify, request, redirect, url_for, flash
+from flask import (Flask, Response, render_template, jsonify, request, redirect, url_for, flash,
+                   stream_with_context)
 import os
 from dotenv import load_dotenv
-from models import db, Team, Player, BidHistory, Batsman, Bowler, WicketKeeper, AllRounder
-from sqlalchemy import func
+from models import (db, Team, Player, BidHistory, TeamAggregate,
+                    PLAYER_STORAGE, PLAYER_STORAGE_LAYOUTS)
+from sqlalchemy import func, inspect, select
+from sqlalchemy.exc import IntegrityError
+from loaders import (load_players, load_teams, load_team, load_team_summaries,
+                     group_by_category, PLAYER_CATEGORIES)
+import aggregates
+import allocator
+from auction_rules import DEFAULT_MAX_SQUAD, MIN_PRICE
+from player_data import parse_player, PLAYER_CLASSES
+import importer
+import export
+import player_storage
+import live
+import cache
+import player_search
+import settlement
+import metrics
+import db_pool
+import state_engine
+import event_log
+import auth
+import schema
+import scoring
+import simulator
+import squad_solver
+import click
+from datetime import datetime
+from urllib.parse import urlsplit
 
 load_dotenv()
 
@@ -13,195 +41,121 @@ app.secret_key = os.environ.get("SESSION_SECRET", "default-secret-key")
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('SUPABASE_DB_URL')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Live update fan-out: 'local' (single process) or 'redis' (see live.py)
+app.config['AUCTION_EVENTS_BACKEND'] = os.environ.get('AUCTION_EVENTS_BACKEND', 'local')
+app.config['AUCTION_EVENTS_URL'] = os.environ.get('AUCTION_EVENTS_URL')
+# Open /api/events streams per process before new pages are refused; 0 = no cap
+app.config['AUCTION_EVENTS_MAX_CLIENTS'] = int(os.environ.get('AUCTION_EVENTS_MAX_CLIENTS') or 0)
+
+# Upper bound for cached pages, fragments and player JSON (see cache.py)
+app.config['AUCTION_CACHE_MAX_BYTES'] = int(os.environ.get('AUCTION_CACHE_MAX_BYTES', cache.DEFAULT_MAX_BYTES))
+# Compiled template bytecode; 'off' compiles in every process (see cache.py)
+app.config['TEMPLATE_CACHE_DIR'] = os.environ.get('TEMPLATE_CACHE_DIR', cache.DEFAULT_TEMPLATE_CACHE_DIR)
+
+# Events between history snapshots (see event_log.py)
+app.config['AUCTION_SNAPSHOT_EVERY'] = int(os.environ.get('AUCTION_SNAPSHOT_EVERY', event_log.DEFAULT_SNAPSHOT_EVERY))
+
+# Requests slower than this are logged with their slowest SQL (see metrics.py)
+app.config['SLOW_REQUEST_MS'] = float(os.environ.get('SLOW_REQUEST_MS', metrics.DEFAULT_SLOW_REQUEST_MS))
+
+# Pool size, timeouts and PgBouncer mode for Postgres (see db_pool.py)
+for key, default in db_pool.DEFAULTS.items():
+    app.config[key] = os.environ.get(key, default)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = db_pool.engine_options(app.config)
+
+# 'memory' serves the auction from process memory with a write-behind journal (see state_engine.py)
+for key, default in state_engine.DEFAULTS.items():
+    app.config[key] = os.environ.get(key, default)
+
+# Logins for the write endpoints; AUCTION_AUTH=off disables the checks (see auth.py)
+for key, default in auth.DEFAULTS.items():
+    app.config[key] = os.environ.get(key, default)
+
 db.init_app(app)
+metrics.init_app(app)
+db_pool.init_app(app, db)
+state_engine.init_app(app, db)
+live.init_app(app)
+cache.init_app(app)
+auth.init_app(app)
+
+if app.config['AUCTION_STATE'] == 'memory':
+    # Pages read the in-memory state instead of querying (see state_engine.py)
+    from state_engine import load_players, load_teams, load_team, load_team_summaries  # noqa: F811
 
 @app.route('/')
+@cache.cached_page('index')
 def index():
     """Home page with player selection and teams overview"""
-    teams_data = Team.query.all()
+    # Only squad counts are shown here, which come from the aggregate rows
+    teams_data = load_team_summaries()
     
-    # Process available players
     # Fetch ALL players so frontend can filter by status (Available, Sold, Unsold)
-    available_players_query = Player.query.all()
-    
-    available_players = {
-        'batsmen': [], 'bowlers': [], 'wicketkeepers': [], 'allrounders': []
-    }
-    
-    for player in available_players_query:
-        # Group by category
-        cat = player.category
-        if cat in available_players:
-            # Convert to dict for template if needed, or pass object
-            # Template expects player['name'], player['base_price'], etc.
-            # Start strict: DB objects can be accessed like attributes
-            # BUT existing templates use dict syntax {{ player.name }} works for both IF access is attribute-like
-            # Jinja2 handles dot notation for both dict keys and object attributes transparently.
-            # Except if template uses player['name'] explicitly.
-            # Let's check templates later. Safe bet is objects.
-            available_players[cat].append(player)
-            
-    # Sort by number
-    for cat in available_players:
-        available_players[cat].sort(key=lambda x: x.player_number or 0)
+    # Subclass columns and team come back in the same query (see loaders.py)
+    available_players = group_by_category(load_players())
 
     return render_template('index.html', 
                          players=available_players, 
                          teams=teams_data)
 
 @app.route('/teams')
+@cache.cached_page('teams')
 def teams():
     """Teams page showing detailed team information"""
-    teams_data = Team.query.all()
+    teams_data = load_teams()
     return render_template('teams.html', teams=teams_data)
 
 @app.route('/players')
+@cache.cached_page('players')
 def players():
     """View all players page"""
-    all_players_query = Player.query.all()
-    all_players = {
-        'batsmen': [], 'bowlers': [], 'wicketkeepers': [], 'allrounders': []
-    }
-    for player in all_players_query:
-        if player.category in all_players:
-            all_players[player.category].append(player)
-            
-    for cat in all_players:
-        all_players[cat].sort(key=lambda x: x.player_number or 0)
+    all_players = group_by_category(load_players())
         
     return render_template('players.html', players=all_players)
 
 @app.route('/team/<team_name>')
+@cache.cached_page('team')
 def view_team(team_name):
     """View specific team details"""
-    team = Team.query.filter_by(name=team_name).first()
+    team = load_team(team_name)
     if team:
-        # Calculate money spent
-        total_spent = {
-            'batsmen': 0, 'bowlers': 0, 'wicketkeepers': 0, 'allrounders': 0, 'overall': 0
-        }
-        
-        for player in team.all_players:
-            price = player.selling_price or player.base_price
-            cat = player.category
-            if cat in total_spent:
-                total_spent[cat] += price
-                total_spent['overall'] += price
-        
+        # Money spent per category comes from the team's aggregate row
+        total_spent = aggregates.spent(aggregates.totals(team.aggregate))
+
         return render_template('team_detail.html', team=team, total_spent=total_spent)
     return redirect(url_for('teams'))
 
 @app.route('/add-player', methods=['GET', 'POST'])
+@auth.require('admin')
+@state_engine.write_through
 def add_player():
     if request.method == 'POST':
         try:
-            category = request.form.get('category')
-            print(f"DEBUG: Adding player. Category: {category}, Name: {request.form.get('name')}")
-            
-            # Simple Validation
-            if not category or category not in ['batsmen', 'bowlers', 'wicketkeepers', 'allrounders']:
-                print(f"DEBUG: Invalid category '{category}'")
-                flash('Invalid player category', 'error')
-                return redirect(url_for('add_player'))
-
-            # Calculate next number
-            # Query max player number in this category
-            # Calculate next player number (Gap Filling)
-            start_number = {
-                'batsmen': 1, 'bowlers': 101, 'wicketkeepers': 201, 'allrounders': 301
-            }.get(category, 1)
-
-            # Get all existing numbers for this category
-            existing_numbers = set(p.player_number for p in Player.query.filter_by(type=category).all() if p.player_number)
-            
-            next_number = start_number
-            while next_number in existing_numbers:
-                next_number += 1
-            
-            print(f"DEBUG: Calculated Gap-Filling Player Number: {next_number}")
-
-            base_price = float(request.form.get('base_price', 0))
-            if base_price < 0:
-                flash('Base price cannot be negative', 'error')
+            app.logger.debug('Adding player. Category: %s, Name: %s',
+                             request.form.get('category'), request.form.get('name'))
+
+            # Same rules as bulk import (see player_data.py)
+            try:
+                category, fields = parse_player(request.form)
+            except ValueError as e:
+                app.logger.debug('Rejected player: %s', e)
+                flash(str(e), 'error')
                 return redirect(url_for('add_player'))
 
-            # Calculate lowest available ID (Gap Filling)
-            # Fetch all existing IDs
-            existing_ids = [p.id for p in Player.query.all()]
-            new_id = 1
-            while new_id in existing_ids:
-                new_id += 1
+            # Lowest free number in the category's block and lowest free id
+            # (Gap Filling), taken from the allocator's free-list
+            next_number = allocator.next_player_number(category)
+            new_id = allocator.next_player_id()
             
-
+            app.logger.debug('Calculated gap-filling player number: %s', next_number)
 
             # Create specific player instance based on category
-            if category == 'batsmen':
-                player = Batsman(
-                    id=new_id,
-                    name=request.form.get('name'),
-                    player_name=request.form.get('name'), # Denormalized
-                    player_number=next_number,
-                    base_price=base_price,
-                    status='untouched',
-                    matches=int(request.form.get('matches') or 0),
-                    runs=int(request.form.get('runs') or 0),
-                    average=float(request.form.get('average') or 0),
-                    strike_rate=float(request.form.get('strike_rate') or 0),
-                    highest_score=int(request.form.get('highest_score') or 0),
-                    fifties=int(request.form.get('fifties') or 0),
-                    hundreds=int(request.form.get('hundreds') or 0)
-                )
-            elif category == 'bowlers':
-                player = Bowler(
-                    id=new_id,
-                    name=request.form.get('name'),
-                    player_name=request.form.get('name'), # Denormalized
-                    player_number=next_number,
-                    base_price=base_price,
-                    status='untouched',
-                    matches=int(request.form.get('matches') or 0),
-                    wickets=int(request.form.get('wickets') or 0),
-                    economy=float(request.form.get('economy') or 0),
-                    best_bowling=request.form.get('best_bowling') or '0/0'
-                )
-            elif category == 'wicketkeepers':
-                player = WicketKeeper(
-                    id=new_id,
-                    name=request.form.get('name'),
-                    player_name=request.form.get('name'), # Denormalized
-                    player_number=next_number,
-                    base_price=base_price,
-                    status='untouched',
-                    matches=int(request.form.get('matches') or 0),
-                    runs=int(request.form.get('runs') or 0),
-                    average=float(request.form.get('average') or 0),
-                    strike_rate=float(request.form.get('strike_rate') or 0),
-                    highest_score=int(request.form.get('highest_score') or 0),
-                    fifties=int(request.form.get('fifties') or 0),
-                    hundreds=int(request.form.get('hundreds') or 0)
-                )
-            elif category == 'allrounders':
-                player = AllRounder(
-                    id=new_id,
-                    name=request.form.get('name'),
-                    player_name=request.form.get('name'), # Denormalized
-                    player_number=next_number,
-                    base_price=base_price,
-                    status='untouched',
-                    matches=int(request.form.get('matches') or 0),
-                    runs=int(request.form.get('runs') or 0),
-                    average=float(request.form.get('average') or 0),
-                    strike_rate=float(request.form.get('strike_rate') or 0),
-                    highest_score=int(request.form.get('highest_score') or 0),
-                    fifties=int(request.form.get('fifties') or 0),
-                    hundreds=int(request.form.get('hundreds') or 0),
-                    wickets=int(request.form.get('wickets') or 0),
-                    economy=float(request.form.get('economy') or 0),
-                    best_bowling=request.form.get('best_bowling') or '0/0'
-                )
+            player = PLAYER_CLASSES[category](id=new_id, player_number=next_number, **fields)
             
             db.session.add(player)
+            event_log.barrier('player_added')
             db.session.commit()
+            live.publish('player_added', players=[live.player_payload(player)], reload=True)
 
             flash('Player added successfully', 'success')
             return redirect(url_for('add_player'))
@@ -213,6 +167,8 @@ def add_player():
     return render_template('add_player.html')
 
 @app.route('/add-team', methods=['POST'])
+@auth.require('admin')
+@state_engine.write_through
 def add_team():
     if request.method == 'POST':
         try:
@@ -228,13 +184,9 @@ def add_team():
                 return redirect(url_for('add_player'))
 
             # Calculate lowest available ID (Gap Filling)
-            # Fetch all existing IDs
-            existing_ids = [t.id for t in Team.query.all()]
-            new_id = 1
-            while new_id in existing_ids:
-                new_id += 1
+            new_id = allocator.next_team_id()
             
-            print(f"DEBUG: Calculated Gap-Filling Team ID: {new_id}")
+            app.logger.debug('Calculated gap-filling team id: %s', new_id)
                 
             new_team = Team(
                 id=new_id,
@@ -242,9 +194,18 @@ def add_team():
                 owner_name=owner_name,
                 purse=100.0
             )
+            new_team.aggregate = TeamAggregate() # Empty roster totals
             
             db.session.add(new_team)
-            db.session.commit()
+            event_log.barrier('team_added')
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Added by another request since the check (uq_team_name_lower)
+                db.session.rollback()
+                flash('Team already exists!', 'error')
+                return redirect(url_for('add_player'))
+            live.publish('team_added', teams=[live.team_payload(new_team)], reload=True)
 
             flash('Team added successfully', 'success')
             return redirect(url_for('add_player'))
@@ -253,7 +214,58 @@ def add_team():
             flash(f'Error adding team: {str(e)}', 'error')
             return redirect(url_for('add_player'))
 
+@app.route('/api/players/bulk', methods=['POST'])
+@auth.require('admin')
+@state_engine.write_through
+def bulk_import_players():
+    """Import many players from an uploaded .csv/.xlsx file; returns a per-row error report"""
+    try:
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            return jsonify({'error': 'No file uploaded'}), 400
+
+        try:
+            fmt = importer.detect_format(upload.filename)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        batch_size = request.form.get('batch_size', type=int) or importer.DEFAULT_BATCH_SIZE
+        report = importer.import_players(importer.iter_rows(upload.stream, fmt), batch_size)
+        if report['created']:
+            event_log.barrier('players_imported')
+            db.session.commit()
+            live.publish('players_added', reload=True)
+        return jsonify({'success': True, **report})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/players')
+@state_engine.flushed
+def search_players():
+    """Filtered, keyset-paginated player list (see player_search.py)"""
+    try:
+        try:
+            params = player_search.parse_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        try:
+            page, next_cursor = player_search.search(params)
+        except LookupError as e:
+            return jsonify({'error': str(e)}), 404
+
+        return jsonify({
+            'players': [live.player_payload(p) for p in page],
+            'next_cursor': next_cursor,
+            'limit': params['limit'],
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/player/<int:player_id>/action', methods=['POST'])
+@auth.require('admin')
 def player_action(player_id):
     try:
         data = request.json
@@ -261,8 +273,11 @@ def player_action(player_id):
         team_name = data.get('team')
         price = float(data.get('price', 0))
 
-        if action == 'sold' and price < 2:
-            return jsonify({'error': 'Minimum selling price is 2'}), 400
+        if action == 'sold' and price < MIN_PRICE:
+            return jsonify({'error': f'Minimum selling price is {MIN_PRICE}'}), 400
+
+        if state_engine.enabled():
+            return _player_action_in_memory(player_id, action, team_name, price)
 
         # Look up player directly by ID
         player = db.session.get(Player, player_id)
@@ -274,24 +289,30 @@ def player_action(player_id):
             if not team:
                 return jsonify({'error': 'Team not found'}), 404
 
-            if team.purse >= price:
-                player.status = 'sold'
-                player.selling_price = price
-                player.team_id = team.id
-                player.team_name = team.name # Denormalized
-                
-                team.purse -= price
-                
-                db.session.commit()
-                return jsonify({'success': True})
-            return jsonify({'error': 'Insufficient team budget'}), 400
+            # Purse check-and-debit, refund of a previous owner and the move
+            # happen in one transaction (see settlement.py)
+            try:
+                affected = settlement.sell(player_id, team, price)
+            except settlement.InsufficientPurse as e:
+                return jsonify({'error': str(e)}), 400
+            except settlement.SettlementConflict as e:
+                return jsonify({'error': str(e)}), 409
+
+            player = db.session.get(Player, player_id)
+            live.publish('player_sold', players=[live.player_payload(player)],
+                         teams=[live.team_payload(db.session.get(Team, t)) for t in affected])
+            return jsonify({'success': True})
 
         elif action == 'unsold':
-            player.status = 'unsold'
-            player.selling_price = None
-            player.team_id = None
-            player.team_name = None # Clear denormalized
-            db.session.commit()
+            try:
+                previous_team_id = settlement.release(player_id, 'unsold')
+            except settlement.SettlementConflict as e:
+                return jsonify({'error': str(e)}), 409
+
+            player = db.session.get(Player, player_id)
+            previous_team = db.session.get(Team, previous_team_id) if previous_team_id else None
+            live.publish('player_unsold', players=[live.player_payload(player)],
+                         teams=[live.team_payload(previous_team)] if previous_team else [])
             return jsonify({'success': True})
 
         return jsonify({'error': 'Invalid action'}), 400
@@ -299,29 +320,55 @@ def player_action(player_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def _player_action_in_memory(player_id, action, team_name, price):
+    """player_action against the in-memory state; the database catches up on the next flush"""
+    engine = state_engine.current()
+    with engine.lock:
+        try:
+            if action == 'sold':
+                player, teams = engine.sell(player_id, team_name, price)
+            elif action == 'unsold':
+                player, teams = engine.release(player_id, 'unsold')
+            elif player_id not in engine.players:
+                return jsonify({'error': 'Player not found'}), 404
+            else:
+                return jsonify({'error': 'Invalid action'}), 400
+        except settlement.InsufficientPurse as e:
+            return jsonify({'error': str(e)}), 400
+        except LookupError as e:
+            return jsonify({'error': str(e)}), 404
+
+        live.publish(f'player_{action}', players=[live.player_payload(player)],
+                     teams=[live.team_payload(team) for team in teams])
+    return jsonify({'success': True})
+
+# The team a request acts on, for owner-scoped routes (see auth.require)
+
+def _team_in_path(team_name, **kwargs):
+    team = Team.query.filter_by(name=team_name).first()
+    return team.id if team else None
+
 @app.route('/api/team/<team_name>/reset', methods=['POST'])
+@auth.require('admin')
+@state_engine.write_through
 def reset_team(team_name):
     try:
         team = Team.query.filter_by(name=team_name).first()
         if not team:
             return jsonify({'error': 'Team not found'}), 404
 
-        team.purse = 100.0
-        
-        # Reset all players in this team
-        for player in team.all_players:
-            player.status = 'untouched'
-            player.selling_price = None
-            player.team_id = None # Removes from team
-            player.team_name = None # Clear denormalized
-            
+        # One UPDATE for the whole roster, however many players it has
+        released = settlement.reset_team(team.id)
         db.session.commit()
+        live.publish('team_reset', released=released, teams=[live.team_payload(team)])
         return jsonify({'success': True})
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/team/<team_name>/update-purse', methods=['POST'])
+@auth.require('admin')
+@state_engine.write_through
 def update_team_purse(team_name):
     try:
         data = request.json
@@ -334,142 +381,225 @@ def update_team_purse(team_name):
         if not team:
             return jsonify({'error': 'Team not found'}), 404
 
+        event_log.record('purse_set', teams={team.id: ({'purse': team.purse}, {'purse': amount})})
         team.purse = amount
         db.session.commit()
+        live.publish('purse_changed', teams=[live.team_payload(team)])
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/team/<team_name>/delete', methods=['POST'])
+@auth.require('admin')
+@state_engine.write_through
 def delete_team(team_name):
     try:
         team = Team.query.filter_by(name=team_name).first()
         if team:
-            # Release all players first
-            for p in team.all_players:
-                p.status = 'untouched'
-                p.selling_price = None
-                p.team_id = None
-                p.team_name = None # Clear denormalized
-            
-            db.session.delete(team)
+            # Players are released and the team removed with set-based statements
+            team_id = team.id
+            allocator.release_team(team)
+            released = settlement.delete_team(team_id)
+            event_log.barrier('team_deleted')
             db.session.commit()
+            live.publish('team_deleted', deleted_team_ids=[team_id], released=released)
         return jsonify({'success': True})
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def _named_player(name, team_id=None):
+    """(player, None) for the only player with this name, or (None, error response)"""
+    # Player names are not unique: answer 409 with every match rather than pick one
+    query = select(Player.id).where(Player.name == name)
+    if team_id is not None:
+        query = query.where(Player.team_id == team_id)
+    ids = list(db.session.scalars(query.order_by(Player.id)))
+    if not ids:
+        not_found = 'Player not found in team' if team_id is not None else 'Player not found'
+        return None, (jsonify({'error': not_found}), 404)
+    if len(ids) > 1:
+        return None, (jsonify({'error': f'{len(ids)} players are named {name!r}; address them by id',
+                               'player_ids': ids}), 409)
+    return db.session.get(Player, ids[0]), None
+
 @app.route('/api/remove-player', methods=['POST'])
+@auth.require('admin')
+@state_engine.write_through
 def remove_player():
     try:
         data = request.json
         team_name = data.get('team')
         player_name = data.get('player')
-        category = data.get('category')
 
         team = Team.query.filter_by(name=team_name).first()
         if not team:
             return jsonify({'error': 'Team not found'}), 404
 
-        player = Player.query.filter_by(name=player_name, team_id=team.id).first()
+        player, error = _named_player(player_name, team.id)
+        if error:
+            return error
+        return _release_from_team(player, team)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/player/<int:player_id>/release', methods=['POST'])
+@auth.require('admin')
+@state_engine.write_through
+def release_player(player_id):
+    """Take a player off its team, refunding the team (remove_player by id)"""
+    try:
+        player = db.session.get(Player, player_id)
         if not player:
+            return jsonify({'error': 'Player not found'}), 404
+        if not player.team_id:
             return jsonify({'error': 'Player not found in team'}), 404
-
-        selling_price = player.selling_price or player.base_price
-        team.purse += selling_price
-        
-        player.status = 'untouched'
-        player.selling_price = None
-        player.team_id = None
-        player.team_name = None # Clear denormalized
-        
-        db.session.commit()
-        return jsonify({'success': True})
+        return _release_from_team(player, db.session.get(Team, player.team_id))
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def _release_from_team(player, team):
+    try:
+        settlement.release(player.id, 'untouched', team_id=team.id)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except settlement.SettlementConflict as e:
+        return jsonify({'error': str(e)}), 409
+
+    live.publish('player_released', released=[player.id], teams=[live.team_payload(team)])
+    return jsonify({'success': True})
+
 @app.route('/api/remove-player-all', methods=['POST'])
+@auth.require('admin')
+@state_engine.write_through
 def remove_player_all():
     try:
         data = request.json
-        player_name = data.get('player')
+        player, error = _named_player(data.get('player'))
+        if error:
+            return error
+        return _delete_player(player)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
 
-        # Find player by name (polymorphic)
-        player = Player.query.filter_by(name=player_name).first()
-        
+@app.route('/api/player/<int:player_id>/delete', methods=['POST'])
+@auth.require('admin')
+@state_engine.write_through
+def delete_player(player_id):
+    """Delete a player, refunding its team if sold (remove_player_all by id)"""
+    try:
+        player = db.session.get(Player, player_id)
         if not player:
             return jsonify({'error': 'Player not found'}), 404
-
-        # If player is sold, refund the team first
-        if player.status == 'sold' and player.team_id:
-             team = db.session.get(Team, player.team_id)
-             if team:
-                 team.purse += (player.selling_price or player.base_price)
-
-        db.session.delete(player)
-        db.session.commit()
-        
-        return jsonify({'success': True})
+        return _delete_player(player)
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def _delete_player(player):
+    # If player is sold, refund the team first
+    if player.status == 'sold' and player.team_id:
+        settlement.refund(player.team_id, settlement.paid(player))
+
+    previous_team_id = player.team_id
+    if previous_team_id:
+        aggregates.apply(previous_team_id, player, -1)
+
+    player_id = player.id
+    BidHistory.query.filter_by(player_id=player_id).delete()
+    allocator.release_player(player)
+    db.session.delete(player)
+    event_log.barrier('player_deleted')
+    db.session.commit()
+
+    previous_team = db.session.get(Team, previous_team_id) if previous_team_id else None
+    live.publish('player_deleted', deleted_player_ids=[player_id],
+                 teams=[live.team_payload(previous_team)] if previous_team else [])
+
+    return jsonify({'success': True})
+
 @app.route('/api/update-player', methods=['POST'])
+@auth.require('admin')
+@state_engine.write_through
 def update_player():
     try:
         data = request.json
-        category = data.get('category')
-        original_name = data.get('original_name')
-        updates = data.get('updates', {})
+        player, error = _named_player(data.get('original_name'))
+        if error:
+            return error
+        return _update_player(player, data.get('category'), data.get('updates', {}))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
 
-        # Query generic player first to check existence
-        player = Player.query.filter_by(name=original_name).first() # polymorphic load
+@app.route('/api/player/<int:player_id>/update', methods=['POST'])
+@auth.require('admin')
+@state_engine.write_through
+def update_player_by_id(player_id):
+    """Edit a player's name and stats (update_player by id); category is optional"""
+    try:
+        data = request.json
+        player = db.session.get(Player, player_id)
         if not player:
             return jsonify({'error': 'Player not found'}), 404
-            
-        if player.type != category:
-             return jsonify({'error': 'Category mismatch'}), 400
-
-        # Update base fields if any (currently none in updates dict usually)
-        
-        # Update subclass specific fields
-        # Define allowed fields per category
-        allowed_fields = {
-            'batsmen': ['matches', 'runs', 'average', 'strike_rate', 'highest_score', 'fifties', 'hundreds'],
-            'bowlers': ['matches', 'wickets', 'economy', 'best_bowling'],
-            'wicketkeepers': ['matches', 'runs', 'average', 'strike_rate', 'highest_score', 'fifties', 'hundreds'],
-            'allrounders': ['matches', 'runs', 'average', 'strike_rate', 'highest_score', 'fifties', 'hundreds', 'wickets', 'economy', 'best_bowling']
-        }
-        
-        # Helper to unpack updates - frontend sends {name: "foo", stats: {runs: 10, ...}}
-        stats_updates = updates.get('stats', {})
-        
-        # Update name if present
-        if 'name' in updates:
-            player.name = updates['name']
-            
-            # Update denormalized player_name in subclass
-            # Polymorphic load means 'player' is already the instance of Batsman/Bowler etc.
-            if hasattr(player, 'player_name'):
-                player.player_name = updates['name']
-
-        fields = allowed_fields.get(category, [])
-        for field in fields:
-            # Check in stats object first, then top-level updates (backward compat)
-            if field in stats_updates:
-                setattr(player, field, stats_updates[field])
-            elif field in updates:
-                setattr(player, field, updates[field])
-        
-        db.session.commit()
-        return jsonify({'success': True})
-
+        return _update_player(player, data.get('category') or player.type, data.get('updates', {}))
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def _update_player(player, category, updates):
+    if player.type != category:
+        return jsonify({'error': 'Category mismatch'}), 400
+
+    # Update base fields if any (currently none in updates dict usually)
+    
+    # Update subclass specific fields
+    # Define allowed fields per category
+    allowed_fields = {
+        'batsmen': ['matches', 'runs', 'average', 'strike_rate', 'highest_score', 'fifties', 'hundreds'],
+        'bowlers': ['matches', 'wickets', 'economy', 'best_bowling'],
+        'wicketkeepers': ['matches', 'runs', 'average', 'strike_rate', 'highest_score', 'fifties', 'hundreds'],
+        'allrounders': ['matches', 'runs', 'average', 'strike_rate', 'highest_score', 'fifties', 'hundreds', 'wickets', 'economy', 'best_bowling']
+    }
+    
+    # Helper to unpack updates - frontend sends {name: "foo", stats: {runs: 10, ...}}
+    stats_updates = updates.get('stats', {})
+
+    # Snapshot the player's share of its team's totals before editing
+    before = aggregates.contributions(player)
+    logged = event_log.player_state(player)
+    
+    # Update name if present
+    if 'name' in updates:
+        player.name = updates['name']
+        
+        # Update denormalized player_name in subclass
+        # Polymorphic load means 'player' is already the instance of Batsman/Bowler etc.
+        if hasattr(player, 'player_name'):
+            player.player_name = updates['name']
+
+    fields = allowed_fields.get(category, [])
+    for field in fields:
+        # Check in stats object first, then top-level updates (backward compat)
+        if field in stats_updates:
+            setattr(player, field, stats_updates[field])
+        elif field in updates:
+            setattr(player, field, updates[field])
+
+    if player.team_id:
+        aggregates.apply_change(player.team_id, before, aggregates.contributions(player))
+
+    event_log.record('player_edited', players={player.id: (logged, event_log.player_state(player))})
+    db.session.commit()
+    live.publish('player_updated', players=[live.player_payload(player)])
+    return jsonify({'success': True})
+
 @app.route('/api/team/<team_name>/update', methods=['POST'])
+@auth.require('admin', team=_team_in_path)
+@state_engine.write_through
 def update_team(team_name):
     try:
         data = request.json
@@ -479,14 +609,17 @@ def update_team(team_name):
         team = Team.query.filter_by(name=team_name).first()
         if not team:
             return jsonify({'error': 'Team not found'}), 404
+        before = event_log.team_state(team)
+        renamed = {}
             
         if new_name != team_name:
-             if Team.query.filter(func.lower(Team.name) == func.lower(new_name)).first():
+             if Team.query.filter(func.lower(Team.name) == func.lower(new_name), Team.id != team.id).first():
                 return jsonify({'error': 'Team name already exists'}), 400
              
              # Sync new team name to all players
-             for p in team.all_players:
-                 p.team_name = new_name
+             renamed = {player_id: ({'team_name': old}, {'team_name': new_name}) for player_id, old in
+                        db.session.execute(select(Player.id, Player.team_name).where(Player.team_id == team.id))}
+             settlement.rename_team(team.id, new_name)
         
         team.name = new_name
         team.owner_name = new_owner
@@ -496,105 +629,269 @@ def update_team(team_name):
         # When displaying, we use player.team.name.
         # So renaming team AUTOMATICALLY reflects in all players!
         # This is the beauty of Relational DBs!
+
+        event_log.record('team_updated', players=renamed, teams={team.id: (before, event_log.team_state(team))})
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another request took the name after the check (uq_team_name_lower)
+            db.session.rollback()
+            return jsonify({'error': 'Team name already exists'}), 400
+        live.publish('team_updated', teams=[live.team_payload(team)], previous_name=team_name)
+        return jsonify({'success': True})
         
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/auction/reset', methods=['POST'])
+@auth.require('admin')
+@state_engine.write_through
+def reset_auction():
+    """Return every player to the pool and every team to a full purse"""
+    try:
+        settlement.reset_auction()
+        event_log.barrier('auction_reset')
         db.session.commit()
+        live.publish('auction_reset', reload=True)
         return jsonify({'success': True})
-        
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/undo', methods=['POST'])
+@auth.require('admin')
+@state_engine.write_through
+def undo_last_event():
+    """Revert the most recent auction change that has not been undone yet (see event_log.py)"""
+    try:
+        try:
+            undone, event = event_log.undo()
+        except LookupError as e:
+            return jsonify({'error': str(e)}), 404
+        except event_log.UndoRefused as e:
+            return jsonify({'error': str(e)}), 409
+        db.session.commit()
+        live.publish('undo', reload=True)
+        return jsonify({'success': True, 'undone': event_log.to_dict(undone), 'event_id': event.id})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/history/events')
+@state_engine.flushed
+def history_events():
+    """Auction events after ?after=<id>, oldest first (?limit=, max 1000)"""
+    after = request.args.get('after', 0, type=int)
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    return jsonify({'events': [event_log.to_dict(e) for e in event_log.events(after, limit)]})
+
+@app.route('/api/history/state')
+@state_engine.flushed
+def history_state():
+    """Players and teams as of ?event=<id> or ?at=<ISO timestamp> (default: now)"""
+    try:
+        event_id = request.args.get('event', type=int)
+        at = request.args.get('at')
+        try:
+            at = datetime.fromisoformat(at) if at else None
+        except ValueError:
+            return jsonify({'error': f'Invalid timestamp: {at!r}'}), 400
+        try:
+            state = event_log.state_as_of(event_id, at)
+        except LookupError as e:
+            return jsonify({'error': str(e)}), 404
+        return jsonify(state)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/export')
+@auth.require(*auth.ROLES)
+@state_engine.flushed
+def export_auction():
+    """Download the ledger or team totals (?format=csv|xlsx|parquet, ?table=ledger|teams)"""
+    fmt = request.args.get('format', 'csv')
+    table = request.args.get('table') or None
+    try:
+        chunks = export.stream(fmt, table)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ImportError:
+        return jsonify({'error': 'Parquet export needs pyarrow (pip install pyarrow)'}), 501
+    return Response(stream_with_context(chunks), mimetype=export.FORMATS[fmt][0], headers={
+        'Content-Disposition': f'attachment; filename="{export.filename(fmt, table)}"'})
+
+@app.route('/login', methods=['GET', 'POST'])
+def login():
+    """Log in to make changes; a JSON body gets a JSON answer"""
+    if request.method == 'GET':
+        return render_template('login.html')
+    data = (request.get_json(silent=True) or {}) if request.is_json else request.form
+    user = auth.authenticate(data.get('username'), data.get('password'))
+    if request.is_json:
+        if not user:
+            return jsonify({'error': 'Invalid username or password'}), 401
+        auth.log_in(user)
+        return jsonify({'success': True, 'role': user.role, 'team_id': user.team_id})
+    if not user:
+        return render_template('login.html', error='Invalid username or password'), 401
+    auth.log_in(user)
+    return redirect(_local_target(request.args.get('next')) or url_for('index'))
+
+def _local_target(target):
+    """target if it is a path on this site, else None"""
+    # Browsers read a backslash as a slash, so /\evil.example leaves the site
+    if not target or '\\' in target or not target.startswith('/'):
+        return None
+    parts = urlsplit(target)
+    return target if not parts.scheme and not parts.netloc else None
+
+@app.route('/logout', methods=['POST'])
+def logout():
+    auth.log_out()
+    if request.is_json:
+        return jsonify({'success': True})
+    return redirect(url_for('login'))
+
+@app.route('/api/events')
+def auction_events():
+    """Server-Sent Events stream of auction changes, consumed by static/js/live.js"""
+    return live.response()
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Per-endpoint latency histograms and DB/render totals for Prometheus"""
+    return metrics.registry().render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@app.route('/api/pool/stats')
+def pool_stats():
+    """Connection pool occupancy, checkout waits and exhaustion counts"""
+    return jsonify(db_pool.stats())
+
+@app.route('/api/state/stats')
+def state_stats():
+    """In-memory state size and write-behind backlog (AUCTION_STATE=memory)"""
+    if not state_engine.enabled():
+        return jsonify({'mode': app.config['AUCTION_STATE']})
+    return jsonify({'mode': 'memory', **state_engine.current().stats()})
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    """Hit/miss/eviction counters for sizing AUCTION_CACHE_MAX_BYTES"""
+    stats = cache.store().stats()
+    stats['state_version'] = cache.state_version()
+    return jsonify(stats)
+
 @app.route('/evaluation')
+@cache.cached_page('evaluation')
 def evaluation():
     """Team evaluation page showing analysis of all teams"""
-    teams_data = Team.query.all()
-    evaluations = {}
-
-    for team in teams_data:
-        evaluations[team.name] = evaluate_team(team)
+    # Scores come from the aggregate rows; no rosters are loaded
+    teams_data = load_team_summaries()
+    evaluations = {team.name: evaluate_team(team) for team in teams_data}
 
     return render_template('evaluation.html', teams=teams_data, evaluations=evaluations)
 
+@app.route('/api/team/<team_name>/what-if')
+@state_engine.flushed
+def team_what_if(team_name):
+    """Score and grade the team with each available player added, best first"""
+    try:
+        team = Team.query.filter_by(name=team_name).first()
+        if not team:
+            return jsonify({'error': 'Team not found'}), 404
+
+        price = request.args.get('price')
+        category = request.args.get('category')
+        try:
+            price = float(price) if price not in (None, '') else None
+        except ValueError:
+            return jsonify({'error': f'Invalid price: {price!r}'}), 400
+        if price is not None and price < 0:
+            return jsonify({'error': 'Price cannot be negative'}), 400
+        if category and category not in PLAYER_CATEGORIES:
+            return jsonify({'error': f'Invalid category: {category!r}'}), 400
+
+        result = scoring.what_if(team, scoring.candidates(category), price)
+        result.update(team=team.name, purse=team.purse)
+        return jsonify(result)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/team/<team_name>/recommend')
+@state_engine.flushed
+def team_recommend(team_name):
+    """Available players that raise the team's score the most within its purse (see squad_solver.py)"""
+    try:
+        team = Team.query.filter_by(name=team_name).first()
+        if not team:
+            return jsonify({'error': 'Team not found'}), 404
+
+        purse = team.purse or 0
+        budget = request.args.get('budget')
+        pricing = request.args.get('pricing') or 'base'
+        try:
+            budget = float(budget) if budget not in (None, '') else purse
+        except ValueError:
+            return jsonify({'error': f'Invalid budget: {budget!r}'}), 400
+        if budget < 0:
+            return jsonify({'error': 'Budget cannot be negative'}), 400
+        if pricing not in squad_solver.PRICING:
+            return jsonify({'error': f'Invalid pricing: {pricing!r}'}), 400
+        minimums = {}
+        for category in PLAYER_CATEGORIES:
+            try:
+                minimums[category] = int(request.args.get(f'min_{category}') or 0)
+            except ValueError:
+                return jsonify({'error': f'Invalid min_{category}'}), 400
+
+        result = squad_solver.recommend(team, scoring.candidates(), min(budget, purse), pricing, minimums)
+        result.update(team=team.name, purse=purse, budget=min(budget, purse), pricing=pricing)
+        return jsonify(result)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 def evaluate_team(team):
-    """Calculate team score and analysis based on player composition"""
+    """Calculate team score and analysis based on player composition.
+
+    scoring.score() grades what-if rosters with the same ladders.
+    """
     score = 0
     strengths = []
     weaknesses = []
     
-    # We can use team.stats property we created in models.py
-    stats = team.stats # This gives counts
-    
-    # But we need deeper stats (avg runs etc)
-    # So we need to iterate players again
-    
-    # Reuse the logic from before but adapt dictionary access to object access
-    # player['stats']['runs'] -> player.stats['runs']
-    
-    # Initialize stats for evaluation
-    total_runs_batsmen = 0
-    total_runs_allrounders = 0
-    total_runs_wicketkeepers = 0
-    total_wickets_bowlers = 0
-    total_wickets_allrounders = 0
-    total_matches = 0
-    total_average_batsmen = 0
-    total_average_allrounders = 0
-    total_average_wicketkeepers = 0
-    total_strike_rate_batsmen = 0
-    total_strike_rate_allrounders = 0
-    total_strike_rate_wicketkeepers = 0
-    total_economy_bowlers = 0
-    total_economy_allrounders = 0
-    total_fifties_batsmen = 0
-    total_fifties_allrounders = 0
-    total_fifties_wicketkeepers = 0
-    total_hundreds_batsmen = 0
-    total_hundreds_allrounders = 0
-    total_hundreds_wicketkeepers = 0
-
-    batsmen_count = 0
-    bowlers_count = 0
-    allrounders_count = 0
-    wicketkeepers_count = 0
-
-    # Calculate stats for each category
-    # Iterate through team.all_players relationship
-    for player in team.all_players:
-        # category is stored in type column but available as attribute if needed, 
-        # or we check instance type. Polymorphic query returns specific instances!
-        
-        # However, for simplicity and compatibility with existing logic:
-        category = player.type # 'batsmen', 'bowlers' etc.
-        
-        total_matches += getattr(player, 'matches', 0) or 0
-        
-        if category == 'batsmen':
-            total_runs_batsmen += getattr(player, 'runs', 0) or 0
-            total_average_batsmen += getattr(player, 'average', 0) or 0
-            total_strike_rate_batsmen += getattr(player, 'strike_rate', 0) or 0
-            total_fifties_batsmen += getattr(player, 'fifties', 0) or 0
-            total_hundreds_batsmen += getattr(player, 'hundreds', 0) or 0
-            batsmen_count += 1
-        elif category == 'wicketkeepers':
-            total_runs_wicketkeepers += getattr(player, 'runs', 0) or 0
-            total_average_wicketkeepers += getattr(player, 'average', 0) or 0
-            total_strike_rate_wicketkeepers += getattr(player, 'strike_rate', 0) or 0
-            total_fifties_wicketkeepers += getattr(player, 'fifties', 0) or 0
-            total_hundreds_wicketkeepers += getattr(player, 'hundreds', 0) or 0
-            wicketkeepers_count += 1
-        elif category == 'allrounders':
-            total_runs_allrounders += getattr(player, 'runs', 0) or 0
-            total_average_allrounders += getattr(player, 'average', 0) or 0
-            total_strike_rate_allrounders += getattr(player, 'strike_rate', 0) or 0
-            total_fifties_allrounders += getattr(player, 'fifties', 0) or 0
-            total_hundreds_allrounders += getattr(player, 'hundreds', 0) or 0
-            total_wickets_allrounders += getattr(player, 'wickets', 0) or 0
-            total_economy_allrounders += getattr(player, 'economy', 0) or 0
-            allrounders_count += 1
-        elif category == 'bowlers':
-            total_wickets_bowlers += getattr(player, 'wickets', 0) or 0
-            total_economy_bowlers += getattr(player, 'economy', 0) or 0
-            bowlers_count += 1
+    # Running totals are kept per team in TeamAggregate (see aggregates.py),
+    # so scoring is O(1) per team instead of a walk over team.all_players
+    totals = aggregates.totals(team.aggregate)
+
+    total_runs_batsmen = totals['total_runs_batsmen']
+    total_runs_allrounders = totals['total_runs_allrounders']
+    total_runs_wicketkeepers = totals['total_runs_wicketkeepers']
+    total_wickets_bowlers = totals['total_wickets_bowlers']
+    total_wickets_allrounders = totals['total_wickets_allrounders']
+    total_matches = totals['total_matches']
+    total_average_batsmen = totals['total_average_batsmen']
+    total_average_allrounders = totals['total_average_allrounders']
+    total_average_wicketkeepers = totals['total_average_wicketkeepers']
+    total_strike_rate_batsmen = totals['total_strike_rate_batsmen']
+    total_strike_rate_allrounders = totals['total_strike_rate_allrounders']
+    total_strike_rate_wicketkeepers = totals['total_strike_rate_wicketkeepers']
+    total_economy_bowlers = totals['total_economy_bowlers']
+    total_economy_allrounders = totals['total_economy_allrounders']
+    total_fifties_batsmen = totals['total_fifties_batsmen']
+    total_fifties_allrounders = totals['total_fifties_allrounders']
+    total_fifties_wicketkeepers = totals['total_fifties_wicketkeepers']
+    total_hundreds_batsmen = totals['total_hundreds_batsmen']
+    total_hundreds_allrounders = totals['total_hundreds_allrounders']
+    total_hundreds_wicketkeepers = totals['total_hundreds_wicketkeepers']
+
+    batsmen_count = totals['batsmen_count']
+    bowlers_count = totals['bowlers_count']
+    allrounders_count = totals['allrounders_count']
+    wicketkeepers_count = totals['wicketkeepers_count']
 
     # Calculate averages
     avg_runs_batsmen = total_runs_batsmen / batsmen_count if batsmen_count > 0 else 0
@@ -723,6 +1020,183 @@ def evaluate_team(team):
         }
     }
 
+@app.cli.command('resync-allocators')
+def resync_allocators_command():
+    """Re-seed id/number allocation after editing rows outside the app"""
+    allocator.resync()
+    print('Allocator state cleared; scopes re-seed on next use.')
+
+@app.cli.command('import-players')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=importer.DEFAULT_BATCH_SIZE, show_default=True,
+              help='Rows per transaction')
+def import_players_command(path, batch_size):
+    """Bulk-load players from a .csv or .xlsx file"""
+    fmt = importer.detect_format(path)
+    with open(path, 'rb') as f:
+        report = importer.import_players(importer.iter_rows(f, fmt), batch_size)
+
+    for error in report['errors']:
+        print(f"Row {error['row']}: {error['error']}")
+    print(f"Imported {report['created']} players, {len(report['errors'])} rows rejected.")
+
+@app.cli.command('export-auction')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--table', type=click.Choice(list(export.TABLES)),
+              help='Table to export (default: ledger; both sheets for .xlsx)')
+@click.option('--batch-size', default=export.DEFAULT_BATCH_SIZE, show_default=True,
+              help='Rows fetched per round trip')
+def export_auction_command(path, table, batch_size):
+    """Write the auction ledger or team totals to a .csv, .xlsx or .parquet file"""
+    try:
+        fmt = export.detect_format(path)
+        chunks = export.stream(fmt, table, batch_size)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='PATH')
+    except ImportError:
+        raise click.UsageError('Parquet export needs pyarrow (pip install pyarrow)')
+    if state_engine.enabled():
+        state_engine.current().flush()
+    size = 0
+    with open(path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+            size += len(chunk)
+    print(f'Wrote {size} bytes to {path}.')
+
+@app.cli.command('simulate-auction')
+@click.option('--runs', default=10000, show_default=True, help='Auctions to simulate')
+@click.option('--strategy', 'team_strategies', multiple=True, metavar='TEAM=STRATEGY',
+              help=f"A team's bidding strategy, one of {', '.join(simulator.STRATEGIES)}; repeatable")
+@click.option('--default-strategy', type=click.Choice(simulator.STRATEGIES), default='base', show_default=True,
+              help='Strategy of the other teams')
+@click.option('--workers', type=int, help='Processes  [default: one per CPU]')
+@click.option('--seed', default=0, show_default=True)
+@click.option('--max-squad', default=DEFAULT_MAX_SQUAD, show_default=True,
+              help='Players after which a team stops bidding')
+def simulate_auction_command(runs, team_strategies, default_strategy, workers, seed, max_squad):
+    """Simulate the rest of the auction many times and report each team's grade odds (see simulator.py)"""
+    strategies = {}
+    for spec in team_strategies:
+        team_name, _, strategy = spec.rpartition('=')
+        if not team_name:
+            raise click.BadParameter(f'{spec!r} is not TEAM=STRATEGY', param_hint='--strategy')
+        strategies[team_name] = strategy
+    if state_engine.enabled():
+        state_engine.current().flush()
+    setup = simulator.load()
+    if not setup['teams']:
+        raise click.UsageError('No teams to simulate')
+    try:
+        report = simulator.simulate(setup, strategies, runs, default_strategy, workers, seed,
+                                    max_squad=max_squad)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    print(f"{runs} auctions of {len(setup['opening'])} players in {report['seconds']:.1f}s "
+          f"({report['per_minute']:.0f}/min)")
+    for team_name, result in report['teams'].items():
+        score = result['score']
+        grades = ', '.join(f'{grade} {share:.0%}' for grade, share in result['grades'].items())
+        print(f"{team_name} ({result['strategy']}): score {score['mean']:.1f} "
+              f"[p10 {score['p10']:g}, p90 {score['p90']:g}], signs {result['signed']:.1f}, "
+              f"spends {result['spent']:.2f}Cr; {grades}")
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the tables and nullable columns a database is missing (the server only checks them)"""
+    existing = set(inspect(db.engine).get_table_names())
+    added = schema.add_missing_columns(db.engine, db.metadata)
+    db.create_all()
+    cache.ensure_version_row()
+    created = [table.name for table in db.metadata.sorted_tables if table.name not in existing]
+    print(f"Created {', '.join(created)}." if created else 'All tables already exist.')
+    if added:
+        print(f"Added columns {', '.join(added)}.")
+    # Teams from before team_aggregate existed; pages read a missing row as zeros
+    built = aggregates.backfill()
+    if built:
+        print(f'Built aggregate rows for {built} teams.')
+
+@app.cli.command('create-user')
+@click.argument('username')
+@click.option('--role', type=click.Choice(auth.ROLES), default='viewer', show_default=True)
+@click.option('--team', 'team_name', help='Team an owner manages')
+@click.password_option()
+def create_user_command(username, role, team_name, password):
+    """Add a login; owners need --team"""
+    team_id = None
+    if team_name:
+        team = Team.query.filter_by(name=team_name).first()
+        if not team:
+            raise click.BadParameter(f'No team named {team_name!r}', param_hint='--team')
+        team_id = team.id
+    try:
+        auth.create_user(username, password, role, team_id)
+        db.session.commit()
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    except IntegrityError:
+        raise click.UsageError(f'User {username!r} already exists')
+    print(f'Created {role} {username}.')
+
+@app.cli.command('create-indexes')
+def create_indexes_command():
+    """Add indexes declared in models.py that an existing database is missing"""
+    inspector = inspect(db.engine)
+    created = failed = 0
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue  # created with all its indexes by db.create_all()
+        existing = {i['name'] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                try:
+                    index.create(db.engine)
+                except IntegrityError:
+                    # A unique index over rows that break it, e.g. team names differing only in case
+                    print(f'Could not create {index.name} on {table.name}: existing rows are not unique')
+                    failed += 1
+                    continue
+                print(f'Created {index.name} on {table.name}')
+                created += 1
+    if created or failed:
+        print(f'{created} indexes created, {failed} failed.' if failed else f'{created} indexes created.')
+    else:
+        print('All indexes already exist.')
+
+@app.cli.command('check-aggregates')
+@click.option('--fix', is_flag=True, help='Overwrite drifted rows with rebuilt values')
+def check_aggregates_command(fix):
+    """Rebuild team aggregates from the rosters and report any drift"""
+    drift = aggregates.check(fix=fix)
+    for row in drift:
+        print(f"{row['team']}: {row['field']} stored={row['stored']} actual={row['actual']}")
+    if not drift:
+        print('All team aggregates match their rosters.')
+    elif fix:
+        print(f'Fixed {len(drift)} drifted values.')
+
+@app.cli.command('migrate-player-storage')
+@click.argument('layout', type=click.Choice(PLAYER_STORAGE_LAYOUTS))
+def migrate_player_storage_command(layout):
+    """Convert the player tables to the joined or single storage layout"""
+    if not player_storage.migrate(db.engine, layout):
+        print(f'Player tables already use the {layout} layout.')
+        return
+    print(f'Player tables converted to the {layout} layout.')
+    if layout != PLAYER_STORAGE:
+        print(f'Set PLAYER_STORAGE={layout} and restart the app to use them.')
+
+@app.cli.command('rebuild-snapshots')
+@click.option('--every', type=int, default=None, help='Events between snapshots (default AUCTION_SNAPSHOT_EVERY)')
+def rebuild_snapshots_command(every):
+    """Recompute the auction history snapshots from the event log"""
+    every = every or app.config['AUCTION_SNAPSHOT_EVERY']
+    written = event_log.rebuild_snapshots(every)
+    db.session.commit()
+    print(f'Wrote {written} snapshots, one every {every} events.')
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
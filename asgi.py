@@ -0,0 +1,250 @@
+"""ASGI entry point that serves the spectator pages from async database reads.
+
+    uvicorn asgi:application --workers 4
+
+Spectators mostly sit on /, /players, /teams, /team/<name> and /evaluation.
+Under gunicorn each of those requests holds a worker thread while it waits
+on the remote database, so a few hundred open tabs exhaust the threads. Here
+they are served on the event loop instead: the queries are loaders.py's
+statements (the same SQL) run through SQLAlchemy's async engine on asyncpg,
+and while one page waits on Postgres the worker serves others. The HTML is
+rendered with the same templates inside a Flask request context, so
+url_for, the page and fragment cache, ETags, Server-Timing and /metrics
+behave exactly as under gunicorn.
+
+The live stream (/api/events) is served on the event loop too, from the
+broker's asyncio queue (live.Broker.astream): every open page keeps one
+stream for as long as it is open, and on the thread pool a few dozen tabs
+would take every thread. Everything else (writes, JSON APIs, static files)
+is passed to the Flask app as WSGI and runs on a pool of ASGI_WSGI_THREADS
+threads, as it would under gunicorn -k gthread. Pages go that way too in
+AUCTION_STATE=memory, where they never touch the database.
+
+Needs `pip install uvicorn a2wsgi asyncpg` (aiosqlite for SQLite URLs). The
+async engine has its own pool with the db_pool.py profile, so budget
+DB_POOL_SIZE + DB_MAX_OVERFLOW twice per worker.
+"""
+import asyncio
+import io
+import os
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from flask import g, redirect, render_template, request, url_for
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.exceptions import HTTPException
+from app import app, evaluate_team
+from loaders import (group_by_category, players_statement,
+                     team_statement, team_summaries_statement, teams_statement)
+from models import AuctionState
+import aggregates
+import cache
+import db_pool
+import live
+import state_engine
+
+ASYNC_DRIVERS = {'postgresql': 'asyncpg', 'sqlite': 'aiosqlite'}
+WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 20))
+
+
+def async_url(uri):
+    """The database URL with its async driver"""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver for {backend} URLs')
+    url = url.set(drivername=f'{backend}+{ASYNC_DRIVERS[backend]}')
+    if backend == 'postgresql':
+        if 'sslmode' in url.query:
+            # asyncpg takes libpq's sslmode values as `ssl`
+            url = url.difference_update_query(['sslmode']).update_query_dict({'ssl': url.query['sslmode']})
+        if db_pool.pgbouncer_mode(app.config, url) == 'transaction':
+            url = url.update_query_dict({'prepared_statement_cache_size': '0'})
+    return url
+
+
+_engine = None
+_sessions = None
+
+
+def sessions():
+    """The async sessionmaker, created on first use inside the worker's event loop"""
+    global _engine, _sessions
+    if _sessions is None:
+        url = async_url(app.config['SQLALCHEMY_DATABASE_URI'])
+        _engine = create_async_engine(url, **db_pool.engine_options(app.config, url, asynchronous=True))
+        _sessions = async_sessionmaker(_engine, expire_on_commit=False)
+    return _sessions
+
+
+async def _all(session, statement):
+    return (await session.scalars(statement)).unique().all()
+
+
+async def _render(session, template, **context):
+    # run_sync hands the templates a regular Session, so anything they touch
+    # that was not eager-loaded still loads instead of failing on the loop
+    return await session.run_sync(lambda _: render_template(template, **context))
+
+
+# Each page mirrors its view in app.py
+
+async def index(session):
+    teams_data = await _all(session, team_summaries_statement())
+    available_players = group_by_category(await _all(session, players_statement()))
+    return await _render(session, 'index.html', players=available_players, teams=teams_data)
+
+
+async def teams(session):
+    teams_data = await _all(session, teams_statement())
+    return await _render(session, 'teams.html', teams=teams_data)
+
+
+async def players(session):
+    all_players = group_by_category(await _all(session, players_statement()))
+    return await _render(session, 'players.html', players=all_players)
+
+
+async def view_team(session, team_name):
+    found = await _all(session, team_statement(team_name))
+    if not found:
+        return redirect(url_for('teams'))
+    team = found[0]
+    total_spent = aggregates.spent(aggregates.totals(team.aggregate))
+    return await _render(session, 'team_detail.html', team=team, total_spent=total_spent)
+
+
+async def evaluation(session):
+    teams_data = await _all(session, team_summaries_statement())
+    evaluations = {team.name: evaluate_team(team) for team in teams_data}
+    return await _render(session, 'evaluation.html', teams=teams_data, evaluations=evaluations)
+
+
+# endpoint -> (cached_page name, page)
+PAGES = {
+    'index': ('index', index),
+    'teams': ('teams', teams),
+    'players': ('players', players),
+    'view_team': ('team', view_team),
+    'evaluation': ('evaluation', evaluation),
+}
+
+
+async def _page(name, page, view_args):
+    # cache._serve, with the version read and the page built asynchronously
+    async with sessions()() as session:
+        version = await session.scalar(select(AuctionState.version).where(AuctionState.id == 1))
+        g.auction_state_version = version or 0
+        key, etag = cache.page_key(name)
+        if request.if_none_match.contains(etag):
+            return cache.page_response(None, etag)
+        body = cache.store().get(key)
+        if body is None:
+            result = await page(session, **view_args)
+            if not isinstance(result, str):
+                return result  # redirects are not cached
+            body = result
+            cache.store().set(key, body)
+        return cache.page_response(body, etag)
+
+
+def _match(environ):
+    """(endpoint, view args) of an async page, or None"""
+    if environ['REQUEST_METHOD'] not in ('GET', 'HEAD') or state_engine.enabled():
+        return None
+    try:
+        endpoint, view_args = app.url_map.bind_to_environ(environ).match()
+    except HTTPException:
+        return None
+    return (endpoint, view_args) if endpoint in PAGES else None
+
+
+async def _serve(environ, send, endpoint, view_args):
+    with app.request_context(environ):
+        # The steps of Flask.full_dispatch_request, with the view awaited
+        try:
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    rv = await _page(*PAGES[endpoint], view_args)
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            response = app.finalize_request(rv)
+        except Exception as e:
+            response = app.handle_exception(e)
+        body = b'' if environ['REQUEST_METHOD'] == 'HEAD' else response.get_data()
+
+    await send({
+        'type': 'http.response.start',
+        'status': response.status_code,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in response.headers.items()],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _disconnected(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def events(receive, send):
+    """/api/events, held on the event loop until the client goes away"""
+    try:
+        frames = app.extensions['auction_live'].astream()
+    except live.TooManyClients:
+        refused = live.refused_response()
+        await send({'type': 'http.response.start', 'status': refused.status_code,
+                    'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                for name, value in refused.headers.items()]})
+        await send({'type': 'http.response.body', 'body': refused.get_data()})
+        return
+
+    async def pump():
+        async for frame in frames:
+            await send({'type': 'http.response.body', 'body': frame.encode(), 'more_body': True})
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'text/event-stream; charset=utf-8')] +
+                   [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in live.HEADERS.items()],
+    })
+    tasks = [asyncio.ensure_future(pump()), asyncio.ensure_future(_disconnected(receive))]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await frames.aclose()  # unregisters the client
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if _engine is not None:
+                await _engine.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+wsgi = WSGIMiddleware(app, workers=WSGI_THREADS)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] == 'http' and scope['path'] == '/api/events' and scope['method'] == 'GET':
+        return await events(receive, send)
+    if scope['type'] == 'http':
+        # The same environ the Flask app would get; GET pages read no body
+        environ = build_environ(scope, io.BytesIO())
+        match = _match(environ)
+        if match is not None:
+            return await _serve(environ, send, *match)
+    await wsgi(scope, receive, send)
@@ -0,0 +1,8 @@
+"""Auction rules shared by the routes, the simulator and the squad planner.
+
+Kept apart from simulator.py so the planner (squad_solver.py) and the app
+can read them without importing the Monte Carlo module and its process pool.
+"""
+
+MIN_PRICE = 2  # lowest price a player can be sold for (player_action)
+DEFAULT_MAX_SQUAD = 25  # players a team may hold
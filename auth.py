@@ -0,0 +1,148 @@
+"""Logins and role checks for the write endpoints.
+
+Roles come from User.role:
+
+- admin    runs the auction: every write endpoint
+- owner    manages the team in User.team_id: @require('admin', team=...)
+           routes, for that team only. Releases and resets refund the purse,
+           which would let an owner undo their own purchases, so they stay
+           admin-only
+- viewer   reads, like anonymous spectators
+
+Spectators poll the pages hundreds of times a second, so checking a login
+must not cost a query. Pages never look at current_user, and flask-login
+only calls the user_loader when the session holds a login, so anonymous
+reads never run it. At login the user's id, role and team are written into
+the signed session cookie. The user_loader rebuilds the user from the
+cookie and re-reads the User row only once AUTH_RECHECK_SECONDS have
+passed, so a changed role or a deleted user takes effect within that
+window. Because the cookie is what grants access, SESSION_SECRET must be
+set (wsgi.py refuses to start without it).
+
+AUCTION_AUTH=off turns the checks off, for benchmarks and local
+experiments.
+"""
+import time
+from functools import wraps
+from flask import current_app, jsonify, redirect, render_template, request, session, url_for
+from flask_login import LoginManager, UserMixin, current_user, login_user, logout_user
+from sqlalchemy import select
+from werkzeug.security import check_password_hash, generate_password_hash
+from models import db, User
+
+ROLES = ('admin', 'owner', 'viewer')
+DEFAULT_SECRET = 'default-secret-key'
+
+DEFAULTS = {
+    'AUCTION_AUTH': 'on',
+    'AUTH_RECHECK_SECONDS': 300,  # how long a session trusts its copy of the role
+}
+
+login_manager = LoginManager()
+
+
+class SessionUser(UserMixin):
+    """The logged-in user as recorded in the session; no database row attached"""
+
+    def __init__(self, record):
+        self.id = record['id']
+        self.username = record['username']
+        self.role = record['role']
+        self.team_id = record['team_id']
+
+    def get_id(self):
+        return str(self.id)
+
+
+def _record(user):
+    return {'id': user.id, 'username': user.username, 'role': user.role or 'viewer',
+            'team_id': user.team_id, 'checked': time.time()}
+
+
+@login_manager.user_loader
+def _load_user(user_id):
+    record = session.get('auth_user')
+    recheck = float(current_app.config['AUTH_RECHECK_SECONDS'])
+    if record is None or str(record['id']) != user_id or time.time() - record['checked'] > recheck:
+        user = db.session.get(User, int(user_id))
+        if user is None:
+            session.pop('auth_user', None)
+            return None
+        record = session['auth_user'] = _record(user)
+    return SessionUser(record)
+
+
+def init_app(app):
+    login_manager.init_app(app)
+    login_manager.login_view = 'login'
+    app.config.setdefault('SESSION_COOKIE_SAMESITE', 'Lax')
+    if enabled(app) and app.secret_key == DEFAULT_SECRET:
+        app.logger.warning('SESSION_SECRET is not set; anyone can forge a login session')
+
+
+def enabled(app=None):
+    app = app or current_app
+    return str(app.config['AUCTION_AUTH']).lower() not in ('0', 'false', 'no', 'off')
+
+
+def authenticate(username, password):
+    """The User with these credentials, or None"""
+    user = db.session.scalars(select(User).where(User.username == username)).first()
+    if user is None or not check_password_hash(user.password_hash, password or ''):
+        return None
+    return user
+
+
+def log_in(user):
+    login_user(SessionUser(_record(user)))
+    session['auth_user'] = _record(user)
+
+
+def log_out():
+    logout_user()
+    session.pop('auth_user', None)
+
+
+def create_user(username, password, role, team_id=None):
+    """Add a user; caller commits"""
+    if role not in ROLES:
+        raise ValueError(f'Unknown role {role!r}; expected one of {list(ROLES)}')
+    if role == 'owner' and team_id is None:
+        raise ValueError('An owner needs a team')
+    user = User(username=username, password_hash=generate_password_hash(password), role=role, team_id=team_id)
+    db.session.add(user)
+    return user
+
+
+def _denied(status, message):
+    if request.path.startswith('/api/'):
+        return jsonify({'error': message}), status
+    if status == 401:
+        return redirect(url_for('login', next=request.full_path))
+    # Not flash(): the pages are cached for everyone and render no flashed
+    # messages, so the reason goes on the login page, where another user
+    # can sign in
+    return render_template('login.html', error=message), status
+
+
+def require(*roles, team=None):
+    """Allow users with one of roles. With team=, a function of the view's
+    arguments returning the team id the request acts on, owners of that team
+    are allowed too. None (no such team) is left to the view to answer."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return view(*args, **kwargs)
+            if not current_user.is_authenticated:
+                return _denied(401, 'Log in to make changes')
+            if current_user.role in roles:
+                return view(*args, **kwargs)
+            if team is not None and current_user.role == 'owner':
+                team_id = team(**kwargs)
+                if team_id is None or team_id == current_user.team_id:
+                    return view(*args, **kwargs)
+                return _denied(403, 'Owners can only change their own team')
+            return _denied(403, 'Your role cannot make this change')
+        return wrapper
+    return decorator
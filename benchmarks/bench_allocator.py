@@ -0,0 +1,69 @@
+"""Per-insert latency of add-player id/number allocation as the pool grows.
+
+Seeds a throwaway SQLite database with N players, then times allocating an id
+and a player number and committing a new Batsman, which is the hot path of
+add_player, for each N. Latency should stay flat from 10 to 10,000 players.
+
+    python benchmarks/bench_allocator.py --sizes 10,100,1000,10000 --inserts 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.gettempdir(), 'ipl_bench_allocator.db')
+os.environ['SUPABASE_DB_URL'] = f'sqlite:///{DB_PATH}'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from models import db, Batsman  # noqa: E402
+import allocator  # noqa: E402
+import importer  # noqa: E402
+
+
+def seed(size):
+    db.drop_all()
+    db.create_all()
+    importer.insert_players([
+        {'id': i, 'name': f'Seed {i}', 'player_name': f'Seed {i}', 'player_number': i,
+         'base_price': 1.0, 'status': 'untouched', 'type': 'batsmen'}
+        for i in range(1, size + 1)
+    ])
+    db.session.commit()
+
+
+def time_inserts(count):
+    timings = []
+    for i in range(count):
+        start = time.perf_counter()
+        number = allocator.next_player_number('batsmen')
+        new_id = allocator.next_player_id()
+        db.session.add(Batsman(id=new_id, name=f'New {i}', player_name=f'New {i}',
+                               player_number=number, base_price=1.0, status='untouched'))
+        db.session.commit()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,100,1000,10000')
+    parser.add_argument('--inserts', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'players':>8} {'mean ms':>9} {'p95 ms':>9}")
+    with app.app_context():
+        for size in (int(s) for s in args.sizes.split(',')):
+            seed(size)
+            # First use seeds the allocator scopes from the table; keep it out of the timing.
+            time_inserts(1)
+            timings = sorted(time_inserts(args.inserts))
+            mean = sum(timings) / len(timings) * 1000
+            p95 = timings[int(len(timings) * 0.95) - 1] * 1000
+            print(f'{size:>8} {mean:>9.3f} {p95:>9.3f}')
+    os.remove(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+"""Spectator page latency at high concurrency: sync gunicorn vs the ASGI app.
+
+Seeds a scratch SQLite database, then serves a copy of it from each of
+
+    sync    gunicorn -k gthread -w W --threads T app:app (the current setup)
+    async   uvicorn asgi:application --workers W
+
+with --slow-ms of latency added to every SQL statement in the server
+processes, standing in for the round trip to the remote Postgres. The sleep
+runs on the thread executing the statement (sqlite3's trace callback), so it
+holds a gunicorn thread but not the event loop, as a network wait would.
+
+For each server, --connections keep-alive clients request /, /players,
+/teams, /team/<name> and /evaluation in a loop for --duration seconds while
+an auctioneer sells a player --sales-per-sec times a second, so pages keep
+dropping out of the cache. Alongside them --sse-clients pages hold the live
+stream (/api/events) open for the whole run, as every open tab does. It
+reports requests per second, p50/p95/p99 latency and errors per server, and
+how many streams opened, were refused or never got an answer, and the
+events they received. Before the load it checks that both servers
+render every page identically, and exits non-zero if they don't.
+
+    python benchmarks/bench_async_reads.py --connections 500 --duration 20 --slow-ms 5
+
+The load generator is a single asyncio process; on a small machine it
+competes with the servers for CPU, so compare the two runs with each other
+rather than with production numbers.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = os.path.join(tempfile.gettempdir(), 'ipl_bench_async_reads')
+SEED_DB = os.path.join(WORKDIR, 'seed.db')
+TEAMS = 10
+
+
+def _slow_statements(dbapi_connection, connection_record):
+    delay = float(os.environ['BENCH_SLOW_MS']) / 1000
+
+    def wait(statement):
+        time.sleep(delay)
+
+    driver_connection = getattr(dbapi_connection, 'driver_connection', dbapi_connection)
+    if driver_connection is dbapi_connection:
+        dbapi_connection.set_trace_callback(wait)
+    else:
+        # aiosqlite runs statements on its own thread; install the callback there
+        from sqlalchemy.util import await_only
+        await_only(driver_connection.set_trace_callback(wait))
+
+
+def __getattr__(name):
+    # The servers load `bench_async_reads:wsgi_app` / `:asgi_app`, so the
+    # latency hook is in place before the app creates its engines
+    if name not in ('wsgi_app', 'asgi_app'):
+        raise AttributeError(name)
+    sys.path.insert(0, ROOT)
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    if float(os.environ.get('BENCH_SLOW_MS') or 0):
+        event.listen(Engine, 'connect', _slow_statements)
+    if name == 'wsgi_app':
+        from app import app
+        return app
+    from asgi import application
+    return application
+
+
+def seed(players):
+    sys.path.insert(0, ROOT)
+    os.environ['SUPABASE_DB_URL'] = f'sqlite:///{SEED_DB}'
+    os.environ['AUCTION_AUTH'] = 'off'  # the servers below inherit it
+    from app import app
+    from models import db, Team
+    from player_data import PLAYER_CLASSES
+    import aggregates
+    import importer
+
+    with app.app_context():
+        db.create_all()
+        db.session.execute(Team.__table__.insert(), [
+            {'id': t, 'name': f'Team {t}', 'purse': 100000.0} for t in range(1, TEAMS + 1)
+        ])
+        categories = list(PLAYER_CLASSES)
+        rows = []
+        for i in range(1, players + 1):
+            category = categories[i % 4]
+            row = {'id': i, 'name': f'Player {i}', 'player_name': f'Player {i}', 'player_number': i,
+                   'base_price': round(0.5 + i % 7 * 0.25, 2), 'status': 'untouched', 'type': category,
+                   'matches': i % 120}
+            if category != 'bowlers':
+                row.update(runs=i * 7 % 900, average=round(20 + i % 30 * 0.7, 2), strike_rate=round(110 + i % 50 * 1.3, 2),
+                           highest_score=i % 150, fifties=i % 9, hundreds=i % 3)
+            if category in ('bowlers', 'allrounders'):
+                row.update(wickets=i % 40, economy=round(6 + i % 20 * 0.3, 2), best_bowling='3/20')
+            rows.append(row)
+        importer.insert_players(rows)
+        db.session.commit()
+        aggregates.backfill()
+        # Sell a third of the players so rosters and evaluations have content
+        for i in range(1, players + 1, 3):
+            response = app.test_client().post(f'/api/player/{i}/action', json={
+                'action': 'sold', 'team': f'Team {i % TEAMS + 1}', 'price': 2.0})
+            assert response.status_code == 200, response.get_json()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start(kind, args):
+    db_path = os.path.join(WORKDIR, f'{kind}.db')
+    shutil.copy(SEED_DB, db_path)
+    port = free_port()
+    env = dict(os.environ, SUPABASE_DB_URL=f'sqlite:///{db_path}', BENCH_SLOW_MS=str(args.slow_ms),
+               SLOW_REQUEST_MS='1e9',  # every request is slow here; keep the log quiet
+               PYTHONPATH=os.pathsep.join([ROOT, os.path.dirname(os.path.abspath(__file__))]))
+    if kind == 'sync':
+        command = [sys.executable, '-m', 'gunicorn', '-k', 'gthread', '-w', str(args.workers),
+                   '--threads', str(args.threads), '--bind', f'127.0.0.1:{port}',
+                   '--log-level', 'warning', 'bench_async_reads:wsgi_app']
+    else:
+        command = [sys.executable, '-m', 'uvicorn', '--workers', str(args.workers), '--port', str(port),
+                   '--log-level', 'warning', '--no-access-log', 'bench_async_reads:asgi_app']
+    server = subprocess.Popen(command, cwd=ROOT, env=env)
+    for _ in range(300):
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/pool/stats', timeout=1)
+            return server, port
+        except OSError:
+            if server.poll() is not None:
+                sys.exit(f'{kind} server exited with {server.returncode}')
+            time.sleep(0.1)
+    server.terminate()
+    sys.exit(f'{kind} server did not start')
+
+
+async def request(reader, writer, method, path, body=b''):
+    head = f'{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+    if body:
+        head += f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+    writer.write(head.encode() + b'\r\n' + body)
+    lines = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = dict(line.lower().split(': ', 1) for line in lines[1:] if line)
+    if 'content-length' not in headers:
+        raise ValueError('response without Content-Length')
+    data = await reader.readexactly(int(headers['content-length']))
+    return status, data, headers.get('connection') == 'close'
+
+
+async def spectator(port, paths, rng, deadline, latencies, errors):
+    connection = None
+    while time.perf_counter() < deadline:
+        path = rng.choice(paths)
+        start = time.perf_counter()
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection('127.0.0.1', port)
+            status, _, close = await asyncio.wait_for(request(*connection, 'GET', path), 30)
+            if status != 200:
+                errors[f'HTTP {status}'] += 1
+            else:
+                latencies.append((time.perf_counter() - start) * 1000)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+            errors[type(e).__name__] += 1
+            close = True
+            await asyncio.sleep(0.05)
+        if close and connection is not None:
+            connection[1].close()
+            connection = None
+
+
+async def listener(port, deadline, streams):
+    """One open tab's /api/events stream, kept until the deadline"""
+    writer = None
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'GET /api/events HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: text/event-stream\r\n\r\n')
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), max(deadline - time.perf_counter(), 0.1))
+        if int(head.split()[1]) != 200:
+            streams['refused'] += 1
+            return
+        streams['open'] += 1
+        while time.perf_counter() < deadline:
+            line = await asyncio.wait_for(reader.readline(), deadline - time.perf_counter())
+            if not line:
+                break
+            if line.startswith(b'data:'):
+                streams['events'] += 1
+    except asyncio.TimeoutError:
+        if not streams['open']:
+            streams['no answer'] += 1
+    except (OSError, asyncio.IncompleteReadError) as e:
+        streams[type(e).__name__] += 1
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def auctioneer(port, rate, players, rng, deadline, errors):
+    connection = await asyncio.open_connection('127.0.0.1', port)
+    while time.perf_counter() < deadline:
+        body = json.dumps({'action': 'sold', 'team': f'Team {rng.randint(1, TEAMS)}',
+                           'price': round(rng.uniform(1, 5), 1)}).encode()
+        status, _, _ = await request(*connection, 'POST', f'/api/player/{rng.randint(1, players)}/action', body)
+        if status != 200:
+            errors[f'sale HTTP {status}'] += 1
+        await asyncio.sleep(1 / rate)
+    connection[1].close()
+
+
+async def load(port, args):
+    paths = ['/', '/players', '/teams', '/evaluation'] + [f'/team/Team%20{t}' for t in range(1, TEAMS + 1)]
+    rng = random.Random(args.seed)
+    latencies, errors, streams = [], collections.Counter(), collections.Counter()
+    deadline = time.perf_counter() + args.duration
+    # Tabs open their streams first, as they do when the page loads
+    listeners = [asyncio.ensure_future(listener(port, deadline, streams)) for _ in range(args.sse_clients)]
+    await asyncio.sleep(0.5)
+    tasks = [spectator(port, paths, random.Random(rng.random()), deadline, latencies, errors)
+             for _ in range(args.connections)]
+    if args.sales_per_sec:
+        tasks.append(auctioneer(port, args.sales_per_sec, args.players, rng, deadline, errors))
+    start = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    await asyncio.gather(*listeners)
+    return latencies, errors, streams, elapsed
+
+
+def pages(port):
+    digests = {}
+    for path in ['/', '/players', '/teams', '/evaluation', '/team/Team%201']:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}') as response:
+            digests[path] = response.read()
+    return digests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connections', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=20, help='seconds of load per server')
+    parser.add_argument('--slow-ms', type=float, default=5, help='added latency per SQL statement')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8, help='gthread threads per sync worker')
+    parser.add_argument('--sse-clients', type=int, default=100, help='open /api/events streams')
+    parser.add_argument('--players', type=int, default=300)
+    parser.add_argument('--sales-per-sec', type=float, default=2)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+    os.makedirs(WORKDIR)
+    seed(args.players)
+
+    results, rendered = {}, {}
+    for kind in ('sync', 'async'):
+        server, port = start(kind, args)
+        try:
+            rendered[kind] = pages(port)
+            results[kind] = asyncio.run(load(port, args))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f'{args.connections} connections and {args.sse_clients} live streams, {args.duration:g}s each, '
+          f'{args.slow_ms:g} ms per statement, {args.workers} workers ({args.threads} threads each for sync)')
+    print(f"{'server':<7} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9}  errors / streams")
+    for kind, (latencies, errors, streams, elapsed) in results.items():
+        ordered = sorted(latencies) or [0]
+        p95, p99 = ordered[int(len(ordered) * 0.95)], ordered[int(len(ordered) * 0.99)]
+        print(f'{kind:<7} {len(latencies) / elapsed:>8.1f} {statistics.median(ordered):>7.1f}ms '
+              f'{p95:>7.1f}ms {p99:>7.1f}ms  {dict(errors) or 0} / {dict(streams) or 0}')
+
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+    differ = [path for path in rendered['sync'] if rendered['sync'][path] != rendered['async'][path]]
+    for path in differ:
+        print(f'FAIL {path} renders differently under the ASGI app')
+    if differ:
+        sys.exit(1)
+    print('Both servers render identical pages.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Per-request cost of the login and role checks.
+
+Seeds a scratch SQLite database with an admin and runs, in a fresh process
+per configuration, --requests requests of each kind through the Flask test
+client:
+
+    anonymous GET /        a spectator reading a cached page
+    admin POST purse       a logged-in write (/api/team/<name>/update-purse)
+
+under
+
+    off          AUCTION_AUTH=off, no checks at all
+    session      the default: role read from the signed session cookie
+    recheck      AUTH_RECHECK_SECONDS=0: the User row is loaded on every
+                 request, as a plain flask-login user_loader would
+
+It reports the median time per request and the User queries per request,
+and exits non-zero if the anonymous read or the session-backed write
+queried the user table.
+
+    python benchmarks/bench_auth.py --requests 2000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGS = {
+    'off': {'AUCTION_AUTH': 'off'},
+    'session': {'AUCTION_AUTH': 'on'},
+    'recheck': {'AUCTION_AUTH': 'on', 'AUTH_RECHECK_SECONDS': '0'},
+}
+
+MEASURE = r'''
+import json, statistics, sys, time
+from sqlalchemy import event
+from app import app
+from models import db, Team
+import auth
+
+requests = int(sys.argv[1])
+with app.app_context():
+    db.create_all()
+    db.session.add(Team(id=1, name='CSK', purse=100.0))
+    auth.create_user('admin', 'pw', 'admin')
+    db.session.commit()
+    engine = db.engine
+
+user_queries = []
+event.listen(engine, 'before_cursor_execute',
+             lambda conn, cursor, statement, *rest: user_queries.append(1) if 'user' in statement.split('FROM')[-1][:10] else None)
+
+def run(client, method, path, **kwargs):
+    client.open(path, method=method, **kwargs)  # warm the page cache and the session
+    user_queries.clear()
+    times = []
+    for i in range(requests):
+        start = time.perf_counter()
+        response = client.open(path, method=method, **kwargs)
+        times.append((time.perf_counter() - start) * 1e6)
+        assert response.status_code == 200, response.status_code
+    return {'us': statistics.median(times), 'user_queries': len(user_queries) / requests}
+
+anonymous = app.test_client()
+admin = app.test_client()
+assert admin.post('/login', json={'username': 'admin', 'password': 'pw'}).status_code == 200
+print(json.dumps({
+    'anonymous GET /': run(anonymous, 'GET', '/'),
+    'admin POST purse': run(admin, 'POST', '/api/team/CSK/update-purse', json={'amount': 50}),
+}))
+'''
+
+
+def measure(config, args):
+    db_path = os.path.join(tempfile.mkdtemp(prefix='ipl_bench_auth_'), 'bench.db')
+    env = dict(os.environ, SUPABASE_DB_URL=f'sqlite:///{db_path}', AUCTION_STATE='database',
+               SESSION_SECRET='bench-auth', SLOW_REQUEST_MS='1e9', **CONFIGS[config])
+    result = subprocess.run([sys.executable, '-c', MEASURE, str(args.requests)],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode:
+        sys.exit(f'{config} failed:\n{result.stderr}')
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    results = {config: measure(config, args) for config in CONFIGS}
+    print(f'median of {args.requests} requests')
+    print(f"{'request':<18} {'auth':<9} {'per request':>12} {'user queries':>13}")
+    for kind in results['off']:
+        for config, result in results.items():
+            row = result[kind]
+            print(f"{kind:<18} {config:<9} {row['us']:>10.0f}us {row['user_queries']:>13.2f}")
+
+    failures = [kind for kind, row in results['session'].items() if row['user_queries']]
+    for kind in failures:
+        print(f'FAIL {kind} queried the user table with a session login')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
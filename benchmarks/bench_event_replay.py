@@ -0,0 +1,130 @@
+"""Point-in-time state from the auction event log: snapshots vs full replay.
+
+Seeds a throwaway SQLite database, then records an auction of --events
+events through settlement.py (sales, re-sales, unsold calls) with a purse
+edit every so often, so the log has exactly the shape the routes produce.
+For each snapshot interval in --every (the first is the one recorded with;
+the others are rebuilt with event_log.rebuild_snapshots) it times, over
+--samples random event ids (median and p95, in ms):
+
+    snapshots     event_log.state_as_of(n), the nearest snapshot plus a short replay
+    full replay   event_log.state_as_of(n, snapshots=False), replaying from event 0
+
+and checks that both give the same state, and that the state after the last
+event matches the live tables. Exits non-zero on any mismatch.
+
+    python benchmarks/bench_event_replay.py --events 10000 --every 100,1000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), 'ipl_bench_event_replay.db')
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    return statistics.median(ordered), ordered[int(len(ordered) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--teams', type=int, default=10)
+    parser.add_argument('--players', type=int, default=500)
+    parser.add_argument('--every', default='100,1000', help='snapshot intervals, comma separated')
+    parser.add_argument('--samples', type=int, default=50, help='event ids to reconstruct per interval')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    intervals = [int(k) for k in args.every.split(',')]
+
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    os.environ['SUPABASE_DB_URL'] = f'sqlite:///{DB_PATH}'
+    os.environ['AUCTION_STATE'] = 'database'
+    os.environ['AUCTION_SNAPSHOT_EVERY'] = str(intervals[0])
+    sys.path.insert(0, ROOT)
+    from app import app
+    from models import db, Team, AuctionEvent, AuctionSnapshot
+    from player_data import PLAYER_CLASSES
+    import aggregates
+    import event_log
+    import importer
+    import settlement
+
+    rng = random.Random(args.seed)
+    failures = []
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(Team.__table__.insert(), [
+            {'id': t, 'name': f'Team {t}', 'purse': 1000000.0} for t in range(1, args.teams + 1)
+        ])
+        categories = list(PLAYER_CLASSES)
+        importer.insert_players([
+            {'id': i, 'name': f'Player {i}', 'player_name': f'Player {i}', 'player_number': i,
+             'base_price': 1.0, 'status': 'untouched', 'type': categories[i % 4], 'matches': i % 120}
+            for i in range(1, args.players + 1)
+        ])
+        db.session.commit()
+        aggregates.backfill()
+        teams = Team.query.order_by(Team.id).all()
+
+        start = time.perf_counter()
+        while (db.session.scalar(db.select(db.func.max(AuctionEvent.id))) or 0) < args.events:
+            roll = rng.random()
+            if roll < 0.02:
+                team = rng.choice(teams)
+                before = event_log.team_state(team)
+                team.purse = round(team.purse + rng.uniform(-5, 5), 2)
+                event_log.record('purse_set', teams={team.id: (before, event_log.team_state(team))})
+                db.session.commit()
+            elif roll < 0.12:
+                settlement.release(rng.randint(1, args.players), 'unsold')
+            else:
+                settlement.sell(rng.randint(1, args.players), rng.choice(teams), round(rng.uniform(1, 8), 1))
+        last = db.session.scalar(db.select(db.func.max(AuctionEvent.id)))
+        print(f'recorded {last} events in {time.perf_counter() - start:.1f}s')
+
+        now = event_log.state_as_of()
+        if {k: now[k] for k in ('players', 'teams')} != event_log.current_state(db.session):
+            failures.append('state after the last event differs from the live tables')
+
+        targets = [rng.randint(1, last) for _ in range(args.samples)]
+        print(f"{'every':>6} {'stored':>10} {'snap p50':>9} {'p95':>9}   {'full p50':>9} {'p95':>9}  {'replayed':>8}")
+        for n, every in enumerate(intervals):
+            if n:
+                event_log.rebuild_snapshots(every)
+                db.session.commit()
+            fast, full, replayed = [], [], []
+            for event_id in targets:
+                db.session.expire_all()
+                t0 = time.perf_counter()
+                a = event_log.state_as_of(event_id)
+                t1 = time.perf_counter()
+                b = event_log.state_as_of(event_id, snapshots=False)
+                t2 = time.perf_counter()
+                fast.append((t1 - t0) * 1000)
+                full.append((t2 - t1) * 1000)
+                replayed.append(a['replayed'])
+                if {k: a[k] for k in ('players', 'teams')} != {k: b[k] for k in ('players', 'teams')}:
+                    failures.append(f'every={every}: event {event_id} differs between snapshot and full replay')
+            count = AuctionSnapshot.query.count()
+            print(f'{every:>6} {count:>10} {percentiles(fast)[0]:>7.2f}ms {percentiles(fast)[1]:>7.2f}ms'
+                  f'   {percentiles(full)[0]:>7.2f}ms {percentiles(full)[1]:>7.2f}ms  {max(replayed):>8}')
+
+    os.remove(DB_PATH)
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures:
+        sys.exit(1)
+    print('Snapshot reconstruction matches a full replay of the log.')
+
+
+if __name__ == '__main__':
+    main()
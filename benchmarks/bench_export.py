@@ -0,0 +1,149 @@
+"""Peak memory and time of the auction export as the player count grows.
+
+For each --players count, seeds a scratch SQLite database (a tenth of the
+players sold) and, in a fresh process per run, writes the ledger with
+export.stream() in every format, discarding the chunks. It reports wall
+time and peak Python heap (tracemalloc; for Parquet plus pyarrow's own
+allocator peak). For comparison, the `orm` row builds the same CSV the
+way a naive export would, from load_players() and to_dict().
+
+It fails (exit 1) if the CSV or Parquet peak at the largest count is more
+than --max-growth times its peak at the smallest: memory must not follow
+the player count. XLSX is reported but not checked, since openpyxl keeps
+the workbook's shared strings (every distinct name) in memory even in
+write-only mode.
+
+    python benchmarks/bench_export.py --players 10000 50000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEAMS = 10
+
+SEED = r'''
+import sys
+from app import app
+from models import db, Team
+from player_data import PLAYER_CLASSES
+import importer
+players = int(sys.argv[1])
+with app.app_context():
+    db.create_all()
+    db.session.execute(Team.__table__.insert(), [
+        {'id': t, 'name': f'Team {t}', 'purse': 100000.0} for t in range(1, %(teams)d + 1)])
+    categories = list(PLAYER_CLASSES)
+    rows = []
+    for i in range(1, players + 1):
+        category = categories[i %% 4]
+        sold = i %% 10 == 0
+        row = {'id': i, 'name': f'Player {i}', 'player_name': f'Player {i}', 'player_number': i,
+               'base_price': round(0.5 + i %% 7 * 0.25, 2), 'type': category, 'matches': i %% 120,
+               'status': 'sold' if sold else 'untouched', 'team_id': i %% %(teams)d + 1 if sold else None,
+               'selling_price': 2.0 if sold else None}
+        if category != 'bowlers':
+            row.update(runs=i * 7 %% 900, average=round(20 + i %% 30 * 0.7, 2), strike_rate=round(110 + i %% 50 * 1.3, 2),
+                       highest_score=i %% 150, fifties=i %% 9, hundreds=i %% 3)
+        if category in ('bowlers', 'allrounders'):
+            row.update(wickets=i %% 40, economy=round(6 + i %% 20 * 0.3, 2), best_bowling='3/20')
+        rows.append(row)
+        if len(rows) == 5000:
+            importer.insert_players(rows)
+            rows = []
+    importer.insert_players(rows)
+    db.session.commit()
+''' % {'teams': TEAMS}
+
+MEASURE = r'''
+import csv, io, json, sys, time, tracemalloc
+fmt = sys.argv[1]
+from app import app
+import export
+from loaders import load_players
+with app.app_context():
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = 0
+    if fmt == 'orm':
+        rows = [player.to_dict() for player in load_players()]
+        text = io.StringIO()
+        writer = csv.DictWriter(text, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+        size = len(text.getvalue().encode())
+    else:
+        for chunk in export.stream(fmt):
+            size += len(chunk)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    if fmt == 'parquet':
+        import pyarrow
+        peak += pyarrow.default_memory_pool().max_memory()
+print(json.dumps({'seconds': elapsed, 'peak': peak, 'bytes': size}))
+'''
+
+FORMATS = ['csv', 'xlsx', 'parquet', 'orm']
+FLAT = ['csv', 'parquet']
+
+
+def run(script, db_path, *args):
+    env = dict(os.environ, SUPABASE_DB_URL=f'sqlite:///{db_path}', AUCTION_STATE='database',
+               AUCTION_AUTH='off', SLOW_REQUEST_MS='1e9')
+    result = subprocess.run([sys.executable, '-c', script, *map(str, args)],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode:
+        sys.exit(f'failed:\n{result.stderr}')
+    return result.stdout
+
+
+def available(fmt):
+    if fmt != 'parquet':
+        return True
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, nargs='+', default=[10000, 50000])
+    parser.add_argument('--max-growth', type=float, default=1.5)
+    args = parser.parse_args()
+
+    formats = [fmt for fmt in FORMATS if available(fmt)]
+    if 'parquet' not in formats:
+        print('pyarrow is not installed; skipping parquet')
+    results = {}
+    for players in args.players:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='ipl_bench_export_'), 'bench.db')
+        run(SEED, db_path, players)
+        for fmt in formats:
+            results[fmt, players] = json.loads(run(MEASURE, db_path, fmt).splitlines()[-1])
+
+    print(f"{'format':<8} {'players':>8} {'time':>9} {'peak memory':>12} {'output':>12}")
+    for (fmt, players), row in results.items():
+        print(f"{fmt:<8} {players:>8} {row['seconds']:>8.2f}s {row['peak'] / 2**20:>10.1f}MB "
+              f"{row['bytes'] / 2**20:>10.1f}MB")
+
+    smallest, largest = min(args.players), max(args.players)
+    failures = []
+    for fmt in formats:
+        if fmt not in FLAT or smallest == largest:
+            continue
+        growth = results[fmt, largest]['peak'] / results[fmt, smallest]['peak']
+        if growth > args.max_growth:
+            failures.append(f'{fmt} peak grew {growth:.1f}x from {smallest} to {largest} players')
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
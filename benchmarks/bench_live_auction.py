@@ -0,0 +1,300 @@
+"""Replay a simulated live auction and report per-route latency and throughput.
+
+Seeds a scratch database with --teams teams and --players players spread
+over the four player types, then runs two kinds of load at once:
+
+- one auctioneer thread replays a seeded trace: bursts of sales (with
+  occasional unsold calls and re-sales) on /api/player/<id>/action, plus the
+  odd /api/update-player and /api/remove-player
+- --readers threads hammer GET /, /teams, /evaluation and /team/<name>
+  until the trace is done
+
+Per route it reports count, errors, p50/p95/p99 latency and throughput. The
+results are written to JSON (default benchmarks/results/live_auction-<commit>.json).
+Pass --compare with an older file to print the p95 change per route.
+
+Everything runs offline: the default target is the Flask test client. To
+measure a real server, start gunicorn on the same database and pass its URL:
+
+    python benchmarks/bench_live_auction.py
+    SUPABASE_DB_URL=sqlite:////tmp/ipl_live.db AUCTION_AUTH=off gunicorn -k gthread -w 4 app:app &
+    python benchmarks/bench_live_auction.py --db-url sqlite:////tmp/ipl_live.db \\
+        --base-url http://127.0.0.1:8000 --compare benchmarks/results/live_auction-abc1234.json
+
+The database is wiped, so point --db-url at a scratch database.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), 'ipl_bench_live_auction.db')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db-url', default=f'sqlite:///{DB_PATH}')
+    parser.add_argument('--base-url', help='benchmark a running server instead of the test client')
+    parser.add_argument('--teams', type=int, default=10)
+    parser.add_argument('--players', type=int, default=400)
+    parser.add_argument('--lots', type=int, default=300, help='actions in the auctioneer trace')
+    parser.add_argument('--burst', type=int, default=5, help='sales per burst')
+    parser.add_argument('--pause-ms', type=float, default=20, help='gap between bursts')
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='JSON results path')
+    parser.add_argument('--compare', help='earlier JSON results to diff against')
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ['SUPABASE_DB_URL'] = args.db_url
+os.environ['AUCTION_AUTH'] = 'off'  # writes go through the routes without a login
+sys.path.insert(0, ROOT)
+
+from app import app  # noqa: E402
+from models import db, Team  # noqa: E402
+from player_data import PLAYER_CLASSES  # noqa: E402
+import aggregates  # noqa: E402
+import importer  # noqa: E402
+
+CATEGORIES = list(PLAYER_CLASSES)
+READ_ROUTES = [('GET /', 5), ('GET /teams', 2), ('GET /evaluation', 2), ('GET /team/<name>', 1)]
+
+
+def seed(rng):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(Team.__table__.insert(), [
+        {'id': t, 'name': f'Team {t}', 'owner_name': f'Owner {t}', 'purse': 10000.0}
+        for t in range(1, args.teams + 1)
+    ])
+    players = []
+    for i in range(1, args.players + 1):
+        category = CATEGORIES[i % 4]
+        row = {'id': i, 'name': f'Player {i}', 'player_name': f'Player {i}', 'player_number': i,
+               'base_price': 2.0, 'status': 'untouched', 'type': category,
+               'matches': rng.randint(5, 200)}
+        if category != 'bowlers':
+            row.update(runs=rng.randint(100, 6000), average=round(rng.uniform(15, 55), 2),
+                         strike_rate=round(rng.uniform(100, 180), 2), highest_score=rng.randint(30, 180),
+                         fifties=rng.randint(0, 40), hundreds=rng.randint(0, 8))
+        if category in ('bowlers', 'allrounders'):
+            row.update(wickets=rng.randint(0, 250), economy=round(rng.uniform(6, 10), 2),
+                         best_bowling=f'{rng.randint(1, 6)}/{rng.randint(10, 40)}')
+        players.append(row)
+    importer.insert_players(players)
+    db.session.commit()
+    aggregates.backfill()
+
+
+def build_trace(rng):
+    """Auctioneer actions as (route, method, url, body) in replay order"""
+    trace = []
+    owners = {}  # player id -> team name, as the trace expects it to be
+    unsold_pool = list(range(1, args.players + 1))
+    rng.shuffle(unsold_pool)
+    for lot in range(args.lots):
+        roll = rng.random()
+        if owners and roll < 0.05:
+            player_id = rng.choice(sorted(owners))
+            category = CATEGORIES[player_id % 4]
+            trace.append(('POST /api/update-player', 'POST', '/api/update-player', {
+                'category': category, 'original_name': f'Player {player_id}',
+                'updates': {'stats': {'matches': rng.randint(5, 200)}}}))
+        elif owners and roll < 0.08:
+            player_id = rng.choice(sorted(owners))
+            trace.append(('POST /api/remove-player', 'POST', '/api/remove-player', {
+                'category': CATEGORIES[player_id % 4], 'player': f'Player {player_id}',
+                'team': owners.pop(player_id)}))
+        else:
+            # Mostly fresh lots; some re-sales and some lots go unsold
+            if owners and roll < 0.15:
+                player_id = rng.choice(sorted(owners))
+            else:
+                player_id = unsold_pool[lot % len(unsold_pool)]
+            if rng.random() < 0.1:
+                owners.pop(player_id, None)
+                body = {'action': 'unsold'}
+            else:
+                team = f'Team {rng.randint(1, args.teams)}'
+                owners[player_id] = team
+                body = {'action': 'sold', 'team': team, 'price': float(rng.randint(2, 20))}
+            trace.append(('POST /api/player/<id>/action', 'POST', f'/api/player/{player_id}/action', body))
+    return trace
+
+
+class TestClientTarget:
+    def __init__(self):
+        self.client = app.test_client()
+
+    def request(self, method, url, body=None):
+        response = self.client.open(url, method=method, json=body)
+        response.close()
+        return response.status_code
+
+
+class HttpTarget:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, url, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + urllib.parse.quote(url, safe='/?=&'),
+                                     data=data, method=method,
+                                     headers={'Content-Type': 'application/json'} if data else {})
+        try:
+            with urllib.request.urlopen(req) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def make_target():
+    return HttpTarget(args.base_url) if args.base_url else TestClientTarget()
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}  # route -> [(seconds, status)]
+
+    def timed(self, target, route, method, url, body=None):
+        start = time.perf_counter()
+        status = target.request(method, url, body)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.samples.setdefault(route, []).append((elapsed, status))
+
+
+def auctioneer(recorder, trace, done):
+    target = make_target()
+    try:
+        for i, (route, method, url, body) in enumerate(trace):
+            recorder.timed(target, route, method, url, body)
+            if (i + 1) % args.burst == 0:
+                time.sleep(args.pause_ms / 1000)
+    finally:
+        done.set()
+
+
+def reader(recorder, index, done):
+    rng = random.Random(args.seed * 1000 + index)
+    routes = [route for route, weight in READ_ROUTES for _ in range(weight)]
+    target = make_target()
+    while not done.is_set():
+        route = rng.choice(routes)
+        url = route.split(' ', 1)[1].replace('<name>', f'Team {rng.randint(1, args.teams)}')
+        recorder.timed(target, route, 'GET', url)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(recorder, wall):
+    results = {}
+    for route, samples in sorted(recorder.samples.items()):
+        timings = sorted(seconds for seconds, _ in samples)
+        results[route] = {
+            'count': len(samples),
+            'errors': sum(1 for _, status in samples if status >= 500),
+            'rejected': sum(1 for _, status in samples if 400 <= status < 500),
+            'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+            'throughput_rps': round(len(samples) / wall, 2),
+        }
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results):
+    print(f"{'route':<32} {'count':>7} {'err':>5} {'4xx':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+    for route, r in results.items():
+        print(f"{route:<32} {r['count']:>7} {r['errors']:>5} {r['rejected']:>5} {r['p50_ms']:>9.2f} "
+              f"{r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['throughput_rps']:>9.1f}")
+
+
+def print_comparison(results, path):
+    with open(path) as f:
+        before = json.load(f)
+    print(f"\np95 vs {before.get('commit') or path}:")
+    for route, r in results.items():
+        old = before['routes'].get(route)
+        if not old:
+            print(f'  {route:<32} new')
+            continue
+        change = (r['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0
+        print(f"  {route:<32} {old['p95_ms']:>9.2f} -> {r['p95_ms']:>9.2f} ms ({change:+.1f}%)")
+
+
+def main():
+    rng = random.Random(args.seed)
+    with app.app_context():
+        seed(rng)
+    trace = build_trace(rng)
+
+    recorder = Recorder()
+    done = threading.Event()
+    threads = [threading.Thread(target=reader, args=(recorder, i, done)) for i in range(args.readers)]
+    threads.append(threading.Thread(target=auctioneer, args=(recorder, trace, done)))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    results = summarize(recorder, wall)
+    commit = git_commit()
+    print(f'{len(trace)} auctioneer actions, {args.readers} readers, {wall:.2f}s '
+          f"({'HTTP ' + args.base_url if args.base_url else 'test client'})\n")
+    print_table(results)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"live_auction-{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'commit': commit,
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'target': args.base_url or 'test-client',
+            'database': args.db_url.split('@')[-1],
+            'config': {k: v for k, v in vars(args).items() if k not in ('output', 'compare', 'db_url')},
+            'wall_seconds': round(wall, 3),
+            'routes': results,
+        }, f, indent=2)
+    print(f'\nSaved {output}')
+
+    if args.compare:
+        print_comparison(results, args.compare)
+    if args.db_url == f'sqlite:///{DB_PATH}' and os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""Render time and HTML size of the player pages, optionally against an earlier revision.
+
+Seeds a scratch SQLite database with --players players (a tenth of them
+sold) and renders /, /players and /team/Team 1 through the Flask test
+client. For each page it reports, as the median of --samples renders:
+
+    cold        every cache emptied first: all rows and player JSON rebuilt
+    after sale  one sale just before: the version moved, so the page and its
+                row fragments are rebuilt, but unchanged players' JSON is not
+    bytes       size of the HTML, and gzipped
+
+With --baseline REV, the same measurement also runs on that git revision
+(exported to a temporary directory), so the numbers before and after a
+change come from one command:
+
+    python benchmarks/bench_player_payloads.py --players 1000 --baseline HEAD~1
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ['/', '/players', '/team/Team%201']
+TEAMS = 10
+
+# Runs inside the tree being measured, so it only uses what every revision has
+MEASURE = r'''
+import gzip, json, os, statistics, sys, time
+players, samples = int(sys.argv[1]), int(sys.argv[2])
+pages = json.loads(sys.argv[3])
+from app import app
+from models import db, Team
+from player_data import PLAYER_CLASSES
+import aggregates, cache, importer
+
+with app.app_context():
+    db.create_all()
+    db.session.execute(Team.__table__.insert(), [
+        {'id': t, 'name': f'Team {t}', 'purse': 100000.0} for t in range(1, %(teams)d + 1)])
+    categories = list(PLAYER_CLASSES)
+    rows = []
+    for i in range(1, players + 1):
+        category = categories[i %% 4]
+        row = {'id': i, 'name': f'Player {i}', 'player_name': f'Player {i}', 'player_number': i,
+               'base_price': round(0.5 + i %% 7 * 0.25, 2), 'status': 'untouched', 'type': category,
+               'matches': i %% 120}
+        if category != 'bowlers':
+            row.update(runs=i * 7 %% 900, average=round(20 + i %% 30 * 0.7, 2), strike_rate=round(110 + i %% 50 * 1.3, 2),
+                       highest_score=i %% 150, fifties=i %% 9, hundreds=i %% 3)
+        if category in ('bowlers', 'allrounders'):
+            row.update(wickets=i %% 40, economy=round(6 + i %% 20 * 0.3, 2), best_bowling='3/20')
+        rows.append(row)
+    importer.insert_players(rows)
+    db.session.commit()
+    aggregates.backfill()
+
+client = app.test_client()
+sales = iter(range(1, players + 1))
+
+def sell():
+    player = next(sales)
+    response = client.post(f'/api/player/{player}/action', json={
+        'action': 'sold', 'team': f'Team {player %% %(teams)d + 1}', 'price': 2.0})
+    assert response.status_code == 200, response.get_json()
+
+for _ in range(players // 10):
+    sell()
+
+def render(path):
+    start = time.perf_counter()
+    response = client.get(path)
+    elapsed = (time.perf_counter() - start) * 1000
+    assert response.status_code == 200, path
+    return elapsed, response.data
+
+result = {}
+for path in pages:
+    render(path)  # compile templates, fill the connection pool
+    cold, after_sale = [], []
+    for _ in range(samples):
+        with app.app_context():
+            cache.store().clear()
+        cold.append(render(path)[0])
+    for _ in range(samples):
+        sell()
+        elapsed, body = render(path)
+        after_sale.append(elapsed)
+    result[path] = {'cold': statistics.median(cold), 'after_sale': statistics.median(after_sale),
+                    'bytes': len(body), 'gzip': len(gzip.compress(body))}
+print(json.dumps(result))
+''' % {'teams': TEAMS}
+
+
+def measure(tree, args):
+    db_path = os.path.join(tempfile.mkdtemp(prefix='ipl_bench_payloads_'), 'bench.db')
+    env = dict(os.environ, SUPABASE_DB_URL=f'sqlite:///{db_path}', AUCTION_STATE='database', AUCTION_AUTH='off',
+               SLOW_REQUEST_MS='1e9')
+    result = subprocess.run([sys.executable, '-c', MEASURE, str(args.players), str(args.samples), json.dumps(PAGES)],
+                            cwd=tree, env=env, capture_output=True, text=True)
+    if result.returncode:
+        sys.exit(f'measurement failed in {tree}:\n{result.stderr}')
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def export(revision):
+    tree = tempfile.mkdtemp(prefix='ipl_bench_baseline_')
+    archive = subprocess.run(['git', 'archive', revision], cwd=ROOT, capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', tree], input=archive, check=True)
+    return tree
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=1000)
+    parser.add_argument('--samples', type=int, default=10)
+    parser.add_argument('--baseline', help='git revision to compare with, e.g. HEAD~1')
+    args = parser.parse_args()
+
+    runs = {}
+    if args.baseline:
+        runs[args.baseline] = measure(export(args.baseline), args)
+    runs['working tree'] = measure(ROOT, args)
+
+    print(f'{args.players} players, median of {args.samples} renders')
+    print(f"{'page':<16} {'tree':<14} {'cold':>9} {'after sale':>11} {'bytes':>10} {'gzip':>9}")
+    for path in PAGES:
+        for name, result in runs.items():
+            row = result[path]
+            print(f"{path:<16} {name:<14} {row['cold']:>7.1f}ms {row['after_sale']:>9.1f}ms "
+                  f"{row['bytes']:>10} {row['gzip']:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Full /players page vs. one /api/players page as the pool grows.
+
+Seeds a throwaway SQLite database with N players spread over categories,
+statuses, teams and prices, then times (median of --repeat runs):
+
+    full page     GET /players with the page cache cleared (whole pool rendered)
+    api first     GET /api/players?limit=50
+    api deep      the page halfway through the pool, reached by its cursor
+    api filtered  category + status filter
+    api prefix    name prefix filter
+    deep no-idx   the deep page again with the Player indexes dropped
+
+    python benchmarks/bench_player_search.py --sizes 500,5000,50000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.gettempdir(), 'ipl_bench_player_search.db')
+os.environ['SUPABASE_DB_URL'] = f'sqlite:///{DB_PATH}'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from models import db, Team, Player  # noqa: E402
+from player_data import PLAYER_CLASSES  # noqa: E402
+import cache  # noqa: E402
+import importer  # noqa: E402
+
+PAGE = 50
+TEAMS = ['CSK', 'MI', 'RCB', 'KKR', 'DC', 'SRH', 'RR', 'PBKS', 'LSG', 'GT']
+
+
+def seed(size):
+    db.drop_all()
+    db.create_all()
+    rng = random.Random(size)
+    db.session.execute(Team.__table__.insert(), [
+        {'id': i, 'name': name, 'purse': 100.0} for i, name in enumerate(TEAMS, start=1)
+    ])
+    categories = list(PLAYER_CLASSES)
+    players = []
+    for i in range(1, size + 1):
+        category = categories[i % 4]
+        status = rng.choice(['untouched', 'untouched', 'sold', 'unsold'])
+        team_id = rng.randint(1, len(TEAMS)) if status == 'sold' else None
+        players.append({
+            'id': i, 'name': f'Player {rng.randint(0, 99999):05d}', 'player_number': i,
+            'base_price': round(rng.uniform(0.2, 2.0), 1), 'status': status,
+            'selling_price': 2.0 if team_id else None, 'team_id': team_id, 'type': category,
+            'matches': rng.randint(0, 200),
+        })
+    importer.insert_players(players)
+    db.session.commit()
+
+
+def median_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def get(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, response.data[:500]
+    return response
+
+
+def full_page(client):
+    cache.store().clear()
+    return get(client, '/players')
+
+
+def cursor_at(client, position):
+    cursor = None
+    for _ in range(position // PAGE):
+        cursor = get(client, f'/api/players?limit={PAGE}' + (f'&cursor={cursor}' if cursor else '')).get_json()['next_cursor']
+    return cursor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='500,5000,50000')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--page-repeat', type=int, default=3,
+                        help='runs of the full page, which is slow at large sizes')
+    args = parser.parse_args()
+
+    print(f"{'players':>8} {'full ms':>9} {'full KB':>9} {'first ms':>9} {'deep ms':>9} "
+          f"{'filter ms':>9} {'prefix ms':>9} {'no-idx ms':>9} {'page KB':>8}")
+    client = app.test_client()
+    with app.app_context():
+        for size in (int(s) for s in args.sizes.split(',')):
+            seed(size)
+            full = median_ms(lambda: full_page(client), args.page_repeat)
+            full_kb = len(full_page(client).data) / 1024
+
+            first_url = f'/api/players?limit={PAGE}'
+            deep_url = f'{first_url}&cursor={cursor_at(client, size // 2)}'
+            filter_url = f'{first_url}&category=bowlers&status=untouched'
+            prefix_url = f'{first_url}&name=Player%201'
+            first = median_ms(lambda: get(client, first_url), args.repeat)
+            deep = median_ms(lambda: get(client, deep_url), args.repeat)
+            filtered = median_ms(lambda: get(client, filter_url), args.repeat)
+            prefix = median_ms(lambda: get(client, prefix_url), args.repeat)
+            page_kb = len(get(client, first_url).data) / 1024
+
+            for index in Player.__table__.indexes:
+                index.drop(db.engine)
+            no_index = median_ms(lambda: get(client, deep_url), args.repeat)
+
+            print(f'{size:>8} {full:>9.1f} {full_kb:>9.0f} {first:>9.2f} {deep:>9.2f} '
+                  f'{filtered:>9.2f} {prefix:>9.2f} {no_index:>9.2f} {page_kb:>8.1f}')
+    os.remove(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
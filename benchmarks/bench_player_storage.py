@@ -0,0 +1,195 @@
+"""Read and write latency of the joined vs single player storage layouts.
+
+For each size, seeds a throwaway SQLite database in the joined layout and
+times (median of --repeat runs, in ms):
+
+    load all      loaders.load_players(), the polymorphic read behind / and /players
+    get one       db.session.get(Player, id).to_dict(), the per-action lookup
+    /players      GET /players with the page cache cleared
+    api page      GET /api/players?limit=50
+    update        POST /api/update-player changing one rostered player's stats
+    sell          POST /api/player/<id>/action selling one player
+    add           POST /add-player
+
+Then converts the database to the single layout with player_storage.migrate,
+times the same operations, and converts it back. Fingerprints of every
+player's to_dict() are compared across both conversions, so the script exits
+non-zero if a migration loses or changes data.
+
+Each layout runs in its own process because models.py maps the layout picked
+by PLAYER_STORAGE at import.
+
+    python benchmarks/bench_player_storage.py --sizes 5000,20000
+"""
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.gettempdir(), 'ipl_bench_player_storage.db')
+TEAMS = 10
+OPERATIONS = ['load all', 'get one', '/players', 'api page', 'update', 'sell', 'add']
+
+
+def child(step, layout, *extra):
+    """Run one step in a fresh process mapped for layout; returns its JSON result"""
+    env = dict(os.environ, PLAYER_STORAGE=layout, SUPABASE_DB_URL=f'sqlite:///{DB_PATH}', AUCTION_AUTH='off')
+    result = subprocess.run([sys.executable, __file__, '--step', step, *extra],
+                            env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f'{step} ({layout}) failed:\n{result.stderr}')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_step(step, size, repeat):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app import app
+    from models import db, Team, Player
+    from loaders import load_players
+    from player_data import PLAYER_CLASSES
+    import aggregates
+    import cache
+    import importer
+    import player_storage
+
+    def fingerprint():
+        players = sorted((p.to_dict() for p in load_players()), key=lambda d: d['id'])
+        db.session.remove()
+        return hashlib.sha256(json.dumps(players, sort_keys=True).encode()).hexdigest()[:16]
+
+    def seed():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(Team.__table__.insert(), [
+            {'id': t, 'name': f'Team {t}', 'purse': 10000.0} for t in range(1, TEAMS + 1)
+        ])
+        categories = list(PLAYER_CLASSES)
+        rows = []
+        for i in range(1, size + 1):
+            category = categories[i % 4]
+            team_id = i % TEAMS + 1 if i % 3 == 0 else None
+            row = {'id': i, 'name': f'Player {i}', 'player_name': f'Player {i}', 'player_number': i,
+                   'base_price': 1.0, 'status': 'sold' if team_id else 'untouched',
+                   'selling_price': 2.0 if team_id else None, 'team_id': team_id,
+                   'team_name': f'Team {team_id}' if team_id else None, 'type': category,
+                   'matches': i % 200}
+            if category != 'bowlers':
+                row.update(runs=i % 5000, average=30.5, strike_rate=130.0, highest_score=i % 150,
+                           fifties=i % 30, hundreds=i % 5)
+            if category in ('bowlers', 'allrounders'):
+                row.update(wickets=i % 250, economy=7.5, best_bowling='3/20')
+            rows.append(row)
+        importer.insert_players(rows)
+        db.session.commit()
+        aggregates.backfill()
+
+    def measure():
+        client = app.test_client()
+        sold_id = 3  # an allrounder on a team in the seed
+        counter = iter(range(10 ** 6))
+
+        def timed(fn):
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn()
+                timings.append(time.perf_counter() - start)
+                db.session.remove()
+            return round(statistics.median(timings) * 1000, 3)
+
+        def request(method, url, **kwargs):
+            response = client.open(url, method=method, **kwargs)
+            assert response.status_code in (200, 302), response.data[:500]
+
+        def full_page():
+            cache.store().clear()
+            request('GET', '/players')
+
+        def update():
+            request('POST', '/api/update-player', json={
+                'category': 'allrounders', 'original_name': f'Player {sold_id}',
+                'updates': {'stats': {'matches': next(counter) % 200}}})
+
+        def sell():
+            n = next(counter)
+            request('POST', f'/api/player/{size - n % 50}/action',
+                    json={'action': 'sold', 'team': f'Team {n % TEAMS + 1}', 'price': 2.0})
+
+        def add():
+            request('POST', '/add-player', data={
+                'category': 'allrounders', 'name': f'New {next(counter)}', 'base_price': '1',
+                'matches': '10', 'runs': '200', 'wickets': '5'})
+
+        with app.test_request_context():
+            before = fingerprint()
+            timings = dict(zip(OPERATIONS, [
+                timed(load_players),
+                timed(lambda: db.session.get(Player, size // 2).to_dict()),
+                timed(full_page),
+                timed(lambda: request('GET', '/api/players?limit=50')),
+                timed(update),
+                timed(sell),
+                timed(add),
+            ]))
+            return {'before': before, 'timings': timings, 'after': fingerprint()}
+
+    with app.app_context():
+        if step == 'seed':
+            seed()
+            return {'fingerprint': fingerprint()}
+        if step == 'measure':
+            return measure()
+        if step == 'fingerprint':
+            return {'fingerprint': fingerprint()}
+        start = time.perf_counter()
+        player_storage.migrate(db.engine, step.split(':')[1])
+        return {'ms': round((time.perf_counter() - start) * 1000, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='5000,20000')
+    parser.add_argument('--repeat', type=int, default=15)
+    parser.add_argument('--step', help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.step:
+        print(json.dumps(run_step(args.step, args.size, args.repeat)))
+        return
+
+    failures = []
+    print(f"{'players':>8} {'layout':<7} " + ' '.join(f'{name:>10}' for name in OPERATIONS))
+    for size in (int(s) for s in args.sizes.split(',')):
+        common = ['--size', str(size), '--repeat', str(args.repeat)]
+        child('seed', 'joined', *common)
+        joined = child('measure', 'joined', *common)
+        to_single = child('migrate:single', 'joined', *common)
+        single = child('measure', 'single', *common)
+        to_joined = child('migrate:joined', 'single', *common)
+        restored = child('fingerprint', 'joined', *common)
+
+        for layout, result in [('joined', joined), ('single', single)]:
+            print(f'{size:>8} {layout:<7} ' +
+                  ' '.join(f"{result['timings'][name]:>10.2f}" for name in OPERATIONS))
+        print(f"{'':>8} migrate to single {to_single['ms']:.0f} ms, back to joined {to_joined['ms']:.0f} ms")
+
+        if single['before'] != joined['after']:
+            failures.append(f'{size}: data changed migrating to single')
+        if restored['fingerprint'] != single['after']:
+            failures.append(f'{size}: data changed migrating back to joined')
+
+    os.remove(DB_PATH)
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""SQL statement count and latency of whole-roster team operations.
+
+For each roster size, seeds a throwaway SQLite database with 10 teams whose
+players are all sold, then counts the statements issued by rename, reset and
+delete of one team and by resetting the whole auction (an executemany counts
+once per row). The counts must not depend on roster size; the script exits
+non-zero if they do, or if the rosters, purses or aggregates are wrong
+afterwards.
+
+    python benchmarks/bench_roster_statements.py --sizes 10,100,1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.gettempdir(), 'ipl_bench_roster.db')
+os.environ['SUPABASE_DB_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['AUCTION_AUTH'] = 'off'  # writes go through the routes without a login
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+from app import app  # noqa: E402
+from models import db, Team, Player  # noqa: E402
+import aggregates  # noqa: E402
+import importer  # noqa: E402
+
+TEAMS = 10
+
+
+def seed(roster):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(Team.__table__.insert(), [
+        {'id': t, 'name': f'Team {t}', 'purse': 100.0 - roster * 0.01} for t in range(1, TEAMS + 1)
+    ])
+    players = [
+        {'id': i, 'name': f'Player {i}', 'player_number': i, 'base_price': 0.01,
+         'selling_price': 0.01, 'status': 'sold', 'team_id': (i - 1) // roster + 1,
+         'team_name': f'Team {(i - 1) // roster + 1}', 'type': 'batsmen', 'runs': 10}
+        for i in range(1, TEAMS * roster + 1)
+    ]
+    importer.insert_players(players)
+    db.session.commit()
+    aggregates.backfill()
+    db.session.remove()
+
+
+def measure(client, method, url, json=None):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        # An executemany runs the statement once per parameter set
+        statements.extend([statement] * (len(parameters) if executemany else 1))
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    start = time.perf_counter()
+    response = client.open(url, method=method, json=json)
+    elapsed = (time.perf_counter() - start) * 1000
+    event.remove(db.engine, 'before_cursor_execute', count)
+    assert response.status_code == 200, response.get_json()
+    return len(statements), elapsed
+
+
+def verify(roster):
+    failures = []
+    if Player.query.filter_by(team_name='Team 1').count():
+        failures.append('renamed team still has players under its old name')
+    if Player.query.filter(Player.team_id.isnot(None)).count():
+        failures.append('players still on a team after auction reset')
+    if any(team.purse != 100.0 for team in Team.query.all()):
+        failures.append('purse not restored')
+    if db.session.get(Team, 3) is not None:
+        failures.append('deleted team still present')
+    failures.extend(f"aggregate drift {d['team']} {d['field']}" for d in aggregates.check())
+    return [f'roster {roster}: {failure}' for failure in failures]
+
+
+OPERATIONS = [
+    ('rename', 'POST', '/api/team/Team 1/update', {'name': 'Renamed', 'owner_name': 'x'}),
+    ('reset team', 'POST', '/api/team/Team 2/reset', None),
+    ('delete team', 'POST', '/api/team/Team 3/delete', None),
+    ('reset auction', 'POST', '/api/auction/reset', None),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,100,1000')
+    args = parser.parse_args()
+
+    client = app.test_client()
+    counts = {}
+    failures = []
+    print(f"{'roster':>7} " + ' '.join(f'{name:>20}' for name, *_ in OPERATIONS))
+    with app.app_context():
+        for roster in (int(s) for s in args.sizes.split(',')):
+            seed(roster)
+            cells = []
+            for name, method, url, body in OPERATIONS:
+                statements, elapsed = measure(client, method, url, body)
+                counts.setdefault(name, set()).add(statements)
+                cells.append(f'{statements:>3} stmts {elapsed:>7.1f} ms')
+            print(f'{roster:>7} ' + ' '.join(f'{cell:>20}' for cell in cells))
+            failures.extend(verify(roster))
+
+    failures.extend(f'{name}: statement count varies with roster size {sorted(seen)}'
+                    for name, seen in counts.items() if len(seen) > 1)
+    os.remove(DB_PATH)
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
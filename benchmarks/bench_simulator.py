@@ -0,0 +1,101 @@
+"""Throughput of the Monte Carlo auction simulator.
+
+Seeds a scratch SQLite database with --teams teams (purse 100) and
+--players unsold players, then simulates --runs auctions with
+simulator.simulate() for each --workers count, half the teams bidding
+with the 'score' strategy (the most expensive) and half with 'needs'. It
+reports auctions per minute.
+
+It fails (exit 1) if the best rate is below --target auctions a minute, or
+if the same seed gives different results with different worker counts.
+
+    python benchmarks/bench_simulator.py --runs 10000 --workers 1 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEASURE = r'''
+import json, sys
+teams, players, runs = int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3])
+workers = [int(w) for w in sys.argv[4].split(',')]
+from app import app
+from models import db, Team
+from player_data import PLAYER_CLASSES
+import importer, simulator
+
+with app.app_context():
+    db.create_all()
+    db.session.execute(Team.__table__.insert(), [
+        {'id': t, 'name': f'Team {t}', 'purse': 100.0} for t in range(1, teams + 1)])
+    categories = list(PLAYER_CLASSES)
+    rows = []
+    for i in range(1, players + 1):
+        category = categories[i % 4]
+        row = {'id': i, 'name': f'Player {i}', 'player_name': f'Player {i}', 'player_number': i,
+               'base_price': [0.2, 0.5, 1.0, 1.5, 2.0, 3.0][i % 6], 'status': 'untouched', 'type': category,
+               'matches': 20 + i % 100}
+        if category != 'bowlers':
+            row.update(runs=200 + i * 37 % 1500, average=round(15 + i % 30, 2), strike_rate=round(100 + i % 60, 2),
+                       highest_score=i % 150, fifties=i % 9, hundreds=i % 3)
+        if category in ('bowlers', 'allrounders'):
+            row.update(wickets=5 + i % 40, economy=round(6 + i % 12 * 0.5, 2), best_bowling='3/20')
+        rows.append(row)
+    importer.insert_players(rows)
+    db.session.commit()
+    setup = simulator.load()
+
+strategies = {team: ('score' if i % 2 else 'needs') for i, team in enumerate(setup['teams'])}
+reports = {}
+for count in workers:
+    reports[count] = simulator.simulate(setup, strategies, runs, workers=count, seed=7)
+print(json.dumps(reports))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--teams', type=int, default=10)
+    parser.add_argument('--players', type=int, default=250)
+    parser.add_argument('--runs', type=int, default=10000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--target', type=float, default=10000, help='auctions a minute')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='ipl_bench_simulator_'), 'bench.db')
+    env = dict(os.environ, SUPABASE_DB_URL=f'sqlite:///{db_path}', AUCTION_STATE='database', AUCTION_AUTH='off')
+    workers = sorted(set(args.workers))
+    result = subprocess.run([sys.executable, '-c', MEASURE, str(args.teams), str(args.players), str(args.runs),
+                             ','.join(map(str, workers))], cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode:
+        sys.exit(f'simulation failed:\n{result.stderr}')
+    reports = json.loads(result.stdout.splitlines()[-1])
+
+    print(f'{args.runs} auctions, {args.teams} teams, {args.players} players')
+    print(f"{'workers':>7} {'seconds':>9} {'auctions/min':>13}")
+    for count, report in reports.items():
+        print(f"{count:>7} {report['seconds']:>9.2f} {report['per_minute']:>13.0f}")
+    first = next(iter(reports.values()))
+    for team, summary in first['teams'].items():
+        grades = ', '.join(f'{grade} {share:.0%}' for grade, share in summary['grades'].items())
+        print(f"  {team} ({summary['strategy']}): mean score {summary['score']['mean']:.1f}; {grades}")
+
+    failures = []
+    best = max(report['per_minute'] for report in reports.values())
+    if best < args.target:
+        failures.append(f'{best:.0f} auctions/min is below the target of {args.target:g}')
+    if any(report['teams'] != first['teams'] for report in reports.values()):
+        failures.append('the same seed gave different results with different worker counts')
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Response time of the squad recommendation as the auction goes on.
+
+Seeds a scratch SQLite database with --teams teams and --players available
+players with varied stats and prices, then, through the Flask test client,
+times GET /api/team/Team 1/recommend:
+
+    cold        the solver's cache emptied first: every category solved
+    after sale  one player just sold to another team; only that player's
+                category is solved again (the incremental re-solve)
+
+for both pricings, over --samples sales, and checks each answer: the
+recommended squad fits the purse and scores at least the current score.
+It fails (exit 1) if the slowest answer takes longer than --budget-ms or a
+check fails.
+
+    python benchmarks/bench_squad_solver.py --players 500 --budget-ms 200
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEASURE = r'''
+import json, random, statistics, sys, time
+teams, players, samples = int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3])
+from app import app
+from models import db, Team
+from player_data import PLAYER_CLASSES
+import importer, squad_solver
+
+random.seed(5)
+with app.app_context():
+    db.create_all()
+    db.session.execute(Team.__table__.insert(), [
+        {'id': t, 'name': f'Team {t}', 'purse': 100.0} for t in range(1, teams + 1)])
+    categories = list(PLAYER_CLASSES)
+    rows = []
+    for i in range(1, players + 1):
+        category = categories[i % 4]
+        row = {'id': i, 'name': f'Player {i}', 'player_name': f'Player {i}', 'player_number': i,
+               'base_price': random.choice([0.2, 0.5, 1, 2, 3, 5, 8]), 'status': 'untouched', 'type': category,
+               'matches': random.randint(5, 200)}
+        if category != 'bowlers':
+            row.update(runs=random.randint(50, 4000), average=round(random.uniform(10, 50), 2),
+                       strike_rate=round(random.uniform(95, 175), 2), highest_score=random.randint(20, 150),
+                       fifties=random.randint(0, 30), hundreds=random.randint(0, 5))
+        if category in ('bowlers', 'allrounders'):
+            row.update(wickets=random.randint(0, 180), economy=round(random.uniform(6, 11), 2), best_bowling='3/20')
+        rows.append(row)
+    importer.insert_players(rows)
+    db.session.commit()
+
+client = app.test_client()
+sold = iter(range(1, players + 1))
+
+def recommend(pricing):
+    start = time.perf_counter()
+    response = client.get(f'/api/team/Team%201/recommend?pricing={pricing}')
+    elapsed = (time.perf_counter() - start) * 1000
+    data = response.get_json()
+    assert response.status_code == 200, data
+    assert data['feasible'] and data['cost'] <= data['purse'] + 1e-9, data
+    assert data['recommended_score'] >= data['score'], data
+    return elapsed, data
+
+def sell():
+    player = next(sold)
+    response = client.post(f'/api/player/{player}/action', json={'action': 'sold', 'team': 'Team 2', 'price': 2})
+    assert response.status_code == 200, response.get_json()
+
+result = {}
+for pricing in squad_solver.PRICING:
+    cold, after_sale = [], []
+    for _ in range(samples):
+        squad_solver._plans.clear()
+        elapsed, data = recommend(pricing)
+        cold.append(elapsed)
+        sell()
+        after_sale.append(recommend(pricing)[0])
+    result[pricing] = {'cold': cold, 'after_sale': after_sale, 'score': data['score'],
+                       'recommended_score': data['recommended_score'], 'signings': len(data['players']),
+                       'cost': data['cost'], 'optimal': data['optimal']}
+print(json.dumps(result))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--teams', type=int, default=10)
+    parser.add_argument('--players', type=int, default=500)
+    parser.add_argument('--samples', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=200)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='ipl_bench_solver_'), 'bench.db')
+    env = dict(os.environ, SUPABASE_DB_URL=f'sqlite:///{db_path}', AUCTION_STATE='database',
+               AUCTION_AUTH='off', SLOW_REQUEST_MS='1e9')
+    result = subprocess.run([sys.executable, '-c', MEASURE, str(args.teams), str(args.players), str(args.samples)],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode:
+        sys.exit(f'measurement failed:\n{result.stderr}')
+    results = json.loads(result.stdout.splitlines()[-1])
+
+    print(f'{args.players} available players, {args.samples} samples')
+    print(f"{'pricing':<9} {'cold p50':>9} {'cold max':>9} {'sale p50':>9} {'sale max':>9}  plan")
+    slowest = 0
+    for pricing, row in results.items():
+        cold, after_sale = sorted(row['cold']), sorted(row['after_sale'])
+        slowest = max(slowest, cold[-1], after_sale[-1])
+        print(f"{pricing:<9} {cold[len(cold) // 2]:>7.1f}ms {cold[-1]:>7.1f}ms "
+              f"{after_sale[len(after_sale) // 2]:>7.1f}ms {after_sale[-1]:>7.1f}ms  "
+              f"{row['score']} -> {row['recommended_score']} with {row['signings']} signings "
+              f"for {row['cost']}Cr{'' if row['optimal'] else ' (node limit hit)'}")
+    if slowest > args.budget_ms:
+        print(f'FAIL slowest answer took {slowest:.0f} ms, over the {args.budget_ms:g} ms budget')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""Sale and page latency of AUCTION_STATE=memory vs database, plus crash recovery.
+
+Seeds a scratch SQLite database once, then replays the same seeded trace of
+sales, re-sales, unsold calls and purse edits (with a few --slow-ms of simulated network
+latency added to every database statement, since the target is a remote
+Postgres) in three fresh processes:
+
+    database   the default mode: every action is a settlement.py transaction
+    memory     actions settle in memory and are flushed write-behind
+    crash      memory mode that dies with os._exit() before its journal is
+               flushed; a fourth process starts on the same journal, replays
+               it and flushes
+
+For each mode it prints the median and p95 latency of an action and of an
+uncached page render (/, /teams, /evaluation). It then checks that the
+database ends up identical in all three (players, purses, aggregate rows,
+bids and auction events), that every history snapshot matches a full event
+replay, and that memory mode renders the same pages. Exits non-zero
+otherwise.
+
+    python benchmarks/bench_state_engine.py --lots 500 --slow-ms 2
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = os.path.join(tempfile.gettempdir(), 'ipl_bench_state_engine')
+SEED_DB = os.path.join(WORKDIR, 'seed.db')
+PAGES = ['/', '/teams', '/evaluation']
+
+
+def child(step, env_extra, args):
+    env = dict(os.environ, **env_extra)
+    command = [sys.executable, __file__, '--step', step, '--teams', str(args.teams),
+               '--players', str(args.players), '--lots', str(args.lots),
+               '--slow-ms', str(args.slow_ms), '--seed', str(args.seed)]
+    result = subprocess.run(command, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f'{step} failed:\n{result.stderr}')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def environment(mode, name, flush_interval=0.2):
+    db_path = os.path.join(WORKDIR, f'{name}.db')
+    return {
+        'SUPABASE_DB_URL': f'sqlite:///{db_path}',
+        'AUCTION_AUTH': 'off',
+        'AUCTION_STATE': mode,
+        'AUCTION_JOURNAL_PATH': os.path.join(WORKDIR, f'{name}.journal'),
+        'AUCTION_FLUSH_INTERVAL': str(flush_interval),
+        'AUCTION_FLUSH_BATCH': '1000000' if flush_interval > 60 else '200',
+    }
+
+
+def trace(rng, teams, players, lots):
+    """(player_id, action, team, price) tuples.
+
+    About 2% are purse edits ('purse', amount), which go through the
+    write-through path and leave the team short for the next few sales.
+    """
+    actions = []
+    for _ in range(lots):
+        roll = rng.random()
+        player_id = rng.randint(1, players)
+        if roll < 0.02:
+            actions.append((None, 'purse', f'Team {rng.randint(1, teams)}', rng.choice([5, 12, 500])))
+        elif roll < 0.12:
+            actions.append((player_id, 'unsold', None, 0))
+        else:
+            actions.append((player_id, 'sold', f'Team {rng.randint(1, teams)}', round(rng.uniform(2, 6), 1)))
+    return actions
+
+
+def run_step(step, args):
+    sys.path.insert(0, ROOT)
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from app import app
+    from models import db, Team, TeamAggregate, BidHistory, Player, AuctionEvent, AuctionSnapshot
+    from player_data import PLAYER_CLASSES
+    import aggregates
+    import cache
+    import event_log
+    import importer
+    import state_engine
+
+    if args.slow_ms:
+        @event.listens_for(Engine, 'before_cursor_execute')
+        def _network(*_):
+            time.sleep(args.slow_ms / 1000)
+
+    def seed():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(Team.__table__.insert(), [
+            {'id': t, 'name': f'Team {t}', 'purse': 1000.0} for t in range(1, args.teams + 1)
+        ])
+        categories = list(PLAYER_CLASSES)
+        rows = []
+        for i in range(1, args.players + 1):
+            category = categories[i % 4]
+            row = {'id': i, 'name': f'Player {i}', 'player_name': f'Player {i}', 'player_number': i,
+                   'base_price': round(0.5 + i % 7 * 0.25, 2), 'status': 'untouched', 'type': category,
+                   'matches': i % 120}
+            if category != 'bowlers':
+                row.update(runs=i * 7 % 900, average=round(20 + i % 30 * 0.7, 2), strike_rate=round(110 + i % 50 * 1.3, 2),
+                           highest_score=i % 150, fifties=i % 9, hundreds=i % 3)
+            if category in ('bowlers', 'allrounders'):
+                row.update(wickets=i % 40, economy=round(6 + i % 20 * 0.3, 2), best_bowling='3/20')
+            rows.append(row)
+        importer.insert_players(rows)
+        db.session.commit()
+        aggregates.backfill()
+
+    def fingerprint():
+        db.session.remove()
+        players = [(p.id, p.status, p.selling_price, p.team_id, p.team_name)
+                   for p in Player.query.order_by(Player.id)]
+        teams = [(t.id, t.purse) for t in Team.query.order_by(Team.id)]
+        totals = [aggregates.totals(a) for a in TeamAggregate.query.order_by(TeamAggregate.team_id)]
+        bids = [(b.player_id, b.team_id, b.amount) for b in BidHistory.query.order_by(BidHistory.id)]
+        events = [(e.id, e.type, e.changes) for e in AuctionEvent.query.order_by(AuctionEvent.id)]
+        data = json.dumps([players, teams, totals, bids, events], sort_keys=True)
+        return hashlib.sha256(data.encode()).hexdigest()[:16]
+
+    def history_ok():
+        # Snapshots land wherever a flush batch ends, so they are checked
+        # against a full replay rather than compared across modes
+        snapshots = AuctionSnapshot.query.order_by(AuctionSnapshot.event_id).all()
+        for snapshot in snapshots[1:]:
+            replayed = event_log.state_as_of(snapshot.event_id, snapshots=False)
+            if {k: replayed[k] for k in ('players', 'teams')} != snapshot.state:
+                return False
+        now = event_log.state_as_of()
+        return {k: now[k] for k in ('players', 'teams')} == event_log.current_state(db.session)
+
+    def pages(client):
+        digests = {}
+        for path in PAGES:
+            response = client.get(path)
+            assert response.status_code == 200, response.data[:300]
+            digests[path] = hashlib.sha256(response.data).hexdigest()[:16]
+        return digests
+
+    with app.app_context():
+        if step == 'seed':
+            seed()
+            return {}
+        if step == 'recover':
+            client = app.test_client()
+            # First use loads the database and replays the journal
+            replayed = client.get('/api/state/stats').get_json()['pending']
+            state_engine.current().close()
+            return {'fingerprint': fingerprint(), 'history': history_ok(), 'pages': pages(client),
+                    'replayed': replayed}
+
+    client = app.test_client()
+    actions = trace(random.Random(args.seed), args.teams, args.players, args.lots)
+    action_ms, page_ms, rejected = [], [], 0
+    for n, (player_id, action, team, price) in enumerate(actions):
+        if action == 'purse':
+            response = client.post(f'/api/team/{team}/update-purse', json={'amount': price})
+            assert response.status_code == 200, response.get_json()
+            continue
+        start = time.perf_counter()
+        response = client.post(f'/api/player/{player_id}/action',
+                               json={'action': action, 'team': team, 'price': price})
+        action_ms.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            rejected += 1
+        if n % 10 == 0:
+            with app.app_context():
+                cache.store().clear()
+            path = PAGES[n // 10 % len(PAGES)]
+            start = time.perf_counter()
+            assert client.get(path).status_code == 200
+            page_ms.append((time.perf_counter() - start) * 1000)
+
+    result = {
+        'action': [statistics.median(action_ms), sorted(action_ms)[int(len(action_ms) * 0.95)]],
+        'page': [statistics.median(page_ms), sorted(page_ms)[int(len(page_ms) * 0.95)]],
+        'rejected': rejected,
+    }
+    if step == 'crash':
+        print(json.dumps(result))
+        sys.stdout.flush()
+        os._exit(0)  # no atexit: the journal is all that survives
+
+    with app.app_context():
+        if state_engine.enabled():
+            state_engine.current().close()
+        result.update(fingerprint=fingerprint(), history=history_ok(), pages=pages(client))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--teams', type=int, default=10)
+    parser.add_argument('--players', type=int, default=300)
+    parser.add_argument('--lots', type=int, default=500, help='actions in the trace')
+    parser.add_argument('--slow-ms', type=float, default=2, help='added latency per SQL statement')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--step', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.step:
+        print(json.dumps(run_step(args.step, args)))
+        return
+
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+    os.makedirs(WORKDIR)
+    child('seed', dict(environment('database', 'seed'), SUPABASE_DB_URL=f'sqlite:///{SEED_DB}'),
+          argparse.Namespace(**dict(vars(args), slow_ms=0)))
+
+    results = {}
+    for name, mode in [('database', 'database'), ('memory', 'memory')]:
+        shutil.copy(SEED_DB, os.path.join(WORKDIR, f'{name}.db'))
+        results[name] = child('run', environment(mode, name), args)
+    # Never flushes on its own, so recovery has to replay the whole trace
+    shutil.copy(SEED_DB, os.path.join(WORKDIR, 'crash.db'))
+    results['crash'] = child('crash', environment('memory', 'crash', flush_interval=3600), args)
+    results['recovered'] = child('recover', environment('memory', 'crash'), args)
+
+    print(f"{'mode':<10} {'action p50':>11} {'p95':>8} {'page p50':>10} {'p95':>8}  rejected")
+    for name in ('database', 'memory', 'crash'):
+        r = results[name]
+        print(f"{name:<10} {r['action'][0]:>9.2f}ms {r['action'][1]:>6.2f}ms "
+              f"{r['page'][0]:>8.2f}ms {r['page'][1]:>6.2f}ms  {r['rejected']}")
+
+    print(f"recovery replayed {results['recovered']['replayed']} journaled actions")
+
+    failures = []
+    expected = results['database']
+    for name in ('database', 'memory', 'recovered'):
+        if not results[name]['history']:
+            failures.append(f'{name}: history snapshots disagree with a full event replay')
+    for name in ('memory', 'recovered'):
+        if results[name]['fingerprint'] != expected['fingerprint']:
+            failures.append(f'{name}: database contents differ from database mode')
+        for path, digest in results[name]['pages'].items():
+            if digest != expected['pages'][path]:
+                failures.append(f'{name}: {path} renders differently from database mode')
+    if results['crash']['rejected'] != expected['rejected'] or results['memory']['rejected'] != expected['rejected']:
+        failures.append('modes rejected different actions')
+
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures:
+        sys.exit(1)
+    print('Memory mode and journal recovery leave the database identical to database mode.')
+
+
+if __name__ == '__main__':
+    main()
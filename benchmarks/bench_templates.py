@@ -0,0 +1,188 @@
+"""Template load and render time of the auction board and team page, optionally against an earlier revision.
+
+Seeds a scratch SQLite database with --players players and --teams teams
+of --squad players each, then measures in fresh interpreters:
+
+    load        compiling every template (TEMPLATE_CACHE_DIR=off), and
+                loading them from a warm bytecode cache
+    cold        / and /team/Team 1 with every cache emptied first
+    after sale  the same pages just after a sale to Team 1, which moves the
+                version: the pages are rebuilt around whatever fragments
+                the sale did not touch
+    bytes       size of the HTML
+
+Each page rendered after a sale is also rendered again with the caches
+emptied; the run fails (exit 1) if the two differ, i.e. a cached fragment
+outlived what it shows. With --baseline REV the same measurement also runs
+on that git revision (exported to a temporary directory):
+
+    python benchmarks/bench_templates.py --players 1000 --teams 10 --squad 25 --baseline HEAD~1
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ['/', '/team/Team%201']
+
+LOAD = r'''
+import json, time
+start = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+for name in app.jinja_env.list_templates():
+    app.jinja_env.get_template(name)
+print(json.dumps((time.perf_counter() - imported) * 1000))
+'''
+
+# Runs inside the tree being measured, so it only uses what every revision has
+MEASURE = r'''
+import json, statistics, sys, time
+players, teams, squad, samples = map(int, sys.argv[1:5])
+pages = json.loads(sys.argv[5])
+from app import app
+from models import db, Team
+from player_data import PLAYER_CLASSES
+import aggregates, cache, importer
+
+categories = list(PLAYER_CLASSES)
+with app.app_context():
+    db.create_all()
+    db.session.execute(Team.__table__.insert(), [
+        {'id': t, 'name': f'Team {t}', 'purse': 100000.0} for t in range(1, teams + 1)])
+    rows = []
+    for i in range(1, players + 1):
+        category = categories[i % 4]
+        row = {'id': i, 'name': f'Player {i}', 'player_name': f'Player {i}', 'player_number': i,
+               'base_price': round(0.5 + i % 7 * 0.25, 2), 'status': 'untouched', 'type': category,
+               'matches': i % 120}
+        if category != 'bowlers':
+            row.update(runs=i * 7 % 900, average=round(20 + i % 30 * 0.7, 2), strike_rate=round(110 + i % 50 * 1.3, 2),
+                       highest_score=i % 150, fifties=i % 9, hundreds=i % 3)
+        if category in ('bowlers', 'allrounders'):
+            row.update(wickets=i % 40, economy=round(6 + i % 20 * 0.3, 2), best_bowling='3/20')
+        rows.append(row)
+    importer.insert_players(rows)
+    db.session.commit()
+    aggregates.backfill()
+
+client = app.test_client()
+sales = iter(range(1, players + 1))
+
+def sell(team):
+    player = next(sales)
+    response = client.post(f'/api/player/{player}/action', json={
+        'action': 'sold', 'team': f'Team {team}', 'price': 2.0})
+    assert response.status_code == 200, response.get_json()
+
+for team in range(1, teams + 1):
+    for _ in range(squad):
+        sell(team)
+
+def render(path):
+    start = time.perf_counter()
+    response = client.get(path)
+    elapsed = (time.perf_counter() - start) * 1000
+    assert response.status_code == 200, path
+    return elapsed, response.data
+
+def clear():
+    with app.app_context():
+        cache.store().clear()
+
+result, stale = {}, []
+for path in pages:
+    render(path)  # fill the connection pool
+    cold, after_sale = [], []
+    for _ in range(samples):
+        clear()
+        cold.append(render(path)[0])
+    for _ in range(samples):
+        sell(1)
+        elapsed, body = render(path)
+        after_sale.append(elapsed)
+        clear()
+        if render(path)[1] != body:  # also warms the fragments for the next sample
+            stale.append(path)
+    result[path] = {'cold': statistics.median(cold), 'after_sale': statistics.median(after_sale),
+                    'bytes': len(body)}
+print(json.dumps({'pages': result, 'stale': sorted(set(stale))}))
+'''
+
+
+def environment(tree, **extra):
+    db_path = os.path.join(tempfile.mkdtemp(prefix='ipl_bench_templates_'), 'bench.db')
+    return dict(os.environ, SUPABASE_DB_URL=f'sqlite:///{db_path}', AUCTION_STATE='database', AUCTION_AUTH='off',
+                SLOW_REQUEST_MS='1e9', **extra)
+
+
+def run(tree, code, env, *args):
+    result = subprocess.run([sys.executable, '-c', code, *map(str, args)], cwd=tree, env=env,
+                            capture_output=True, text=True)
+    if result.returncode:
+        sys.exit(f'measurement failed in {tree}:\n{result.stderr}')
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def load_times(tree, runs):
+    """Median ms to load every template: compiled, then from a warm bytecode cache"""
+    compiled = sorted(run(tree, LOAD, environment(tree, TEMPLATE_CACHE_DIR='off')) for _ in range(runs))
+    env = environment(tree, TEMPLATE_CACHE_DIR=tempfile.mkdtemp(prefix='ipl_bench_bytecode_'))
+    run(tree, LOAD, env)  # fill the cache
+    cached = sorted(run(tree, LOAD, env) for _ in range(runs))
+    return compiled[runs // 2], cached[runs // 2]
+
+
+def measure(tree, args):
+    result = run(tree, MEASURE, environment(tree), args.players, args.teams, args.squad, args.samples,
+                 json.dumps(PAGES))
+    result['load'] = load_times(tree, args.runs)
+    return result
+
+
+def export(revision):
+    tree = tempfile.mkdtemp(prefix='ipl_bench_baseline_')
+    archive = subprocess.run(['git', 'archive', revision], cwd=ROOT, capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', tree], input=archive, check=True)
+    return tree
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=1000)
+    parser.add_argument('--teams', type=int, default=10)
+    parser.add_argument('--squad', type=int, default=25, help='players sold to each team')
+    parser.add_argument('--samples', type=int, default=10)
+    parser.add_argument('--runs', type=int, default=3, help='interpreters per template load time')
+    parser.add_argument('--baseline', help='git revision to compare with, e.g. HEAD~1')
+    args = parser.parse_args()
+    if args.players < args.teams * args.squad + args.samples:
+        parser.error('--players must cover the squads and the sales sampled')
+
+    runs = {}
+    if args.baseline:
+        runs[args.baseline] = measure(export(args.baseline), args)
+    runs['working tree'] = measure(ROOT, args)
+
+    print(f'{args.players} players, {args.teams} teams of {args.squad}, median of {args.samples} renders')
+    print(f"{'templates':<16} {'tree':<14} {'compile':>9} {'bytecode':>11}")
+    for name, result in runs.items():
+        compiled, cached = result['load']
+        print(f"{'load all':<16} {name:<14} {compiled:>7.1f}ms {cached:>9.1f}ms")
+    print(f"{'page':<16} {'tree':<14} {'cold':>9} {'after sale':>11} {'bytes':>10}")
+    for path in PAGES:
+        for name, result in runs.items():
+            row = result['pages'][path]
+            print(f"{path:<16} {name:<14} {row['cold']:>7.1f}ms {row['after_sale']:>9.1f}ms {row['bytes']:>10}")
+
+    stale = runs['working tree']['stale']
+    if stale:
+        print(f"FAIL cached fragments outlived their content on {', '.join(stale)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
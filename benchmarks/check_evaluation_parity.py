@@ -0,0 +1,390 @@
+"""Parity and speed of app.evaluate_team and scoring.py against the roster walk.
+
+roster_evaluation() below is evaluate_team as it was before TeamAggregate:
+it walks team.all_players and sums every stat itself. It is kept here
+unchanged so a regression in the aggregates, the ladders or the NumPy
+grading shows up as a difference.
+
+Seeds a throwaway SQLite database with --teams teams whose rosters vary in
+size and quality, so every grading tier is reached. It then checks that:
+
+- evaluate_team() equals roster_evaluation() for every team: score and
+  grade exactly, stats of the same type and equal up to float summation
+  order, strengths and weaknesses word for word except the 2-decimal means
+  (a mean such as 12.785 prints as .78 or .79 depending on summation order;
+  the stats check covers their values)
+- scoring.score() over the teams' totals gives the same scores and grades
+- for --signings random what-if candidates, the predicted score and grade
+  equal roster_evaluation() after really selling the player at that price
+  (the sale is undone afterwards)
+
+Then it times the roster walk, evaluate_team and scoring.score() over every
+team, and one what-if request over the whole available pool.
+
+    python benchmarks/check_evaluation_parity.py --teams 200 --pool 2000
+
+Exits non-zero on any mismatch.
+"""
+import argparse
+import math
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+DECIMAL = re.compile(r'\d+\.\d\d')
+DB_PATH = os.path.join(tempfile.gettempdir(), 'ipl_check_evaluation.db')
+os.environ['SUPABASE_DB_URL'] = f'sqlite:///{DB_PATH}'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, evaluate_team  # noqa: E402
+from models import db, Team  # noqa: E402
+from player_data import PLAYER_CLASSES  # noqa: E402
+import aggregates  # noqa: E402
+import scoring  # noqa: E402
+import importer  # noqa: E402
+import settlement  # noqa: E402
+
+
+def roster_evaluation(team):
+    """app.evaluate_team as it was before TeamAggregate: a walk over the roster"""
+    score = 0
+    strengths = []
+    weaknesses = []
+
+    # Initialize stats for evaluation
+    total_runs_batsmen = 0
+    total_runs_allrounders = 0
+    total_runs_wicketkeepers = 0
+    total_wickets_bowlers = 0
+    total_wickets_allrounders = 0
+    total_matches = 0
+    total_average_batsmen = 0
+    total_average_allrounders = 0
+    total_average_wicketkeepers = 0
+    total_strike_rate_batsmen = 0
+    total_strike_rate_allrounders = 0
+    total_strike_rate_wicketkeepers = 0
+    total_economy_bowlers = 0
+    total_economy_allrounders = 0
+    total_fifties_batsmen = 0
+    total_fifties_allrounders = 0
+    total_fifties_wicketkeepers = 0
+    total_hundreds_batsmen = 0
+    total_hundreds_allrounders = 0
+    total_hundreds_wicketkeepers = 0
+
+    batsmen_count = 0
+    bowlers_count = 0
+    allrounders_count = 0
+    wicketkeepers_count = 0
+
+    # Calculate stats for each category
+    # Iterate through team.all_players relationship
+    for player in team.all_players:
+        # category is stored in type column but available as attribute if needed,
+        # or we check instance type. Polymorphic query returns specific instances!
+
+        # However, for simplicity and compatibility with existing logic:
+        category = player.type # 'batsmen', 'bowlers' etc.
+
+        total_matches += getattr(player, 'matches', 0) or 0
+
+        if category == 'batsmen':
+            total_runs_batsmen += getattr(player, 'runs', 0) or 0
+            total_average_batsmen += getattr(player, 'average', 0) or 0
+            total_strike_rate_batsmen += getattr(player, 'strike_rate', 0) or 0
+            total_fifties_batsmen += getattr(player, 'fifties', 0) or 0
+            total_hundreds_batsmen += getattr(player, 'hundreds', 0) or 0
+            batsmen_count += 1
+        elif category == 'wicketkeepers':
+            total_runs_wicketkeepers += getattr(player, 'runs', 0) or 0
+            total_average_wicketkeepers += getattr(player, 'average', 0) or 0
+            total_strike_rate_wicketkeepers += getattr(player, 'strike_rate', 0) or 0
+            total_fifties_wicketkeepers += getattr(player, 'fifties', 0) or 0
+            total_hundreds_wicketkeepers += getattr(player, 'hundreds', 0) or 0
+            wicketkeepers_count += 1
+        elif category == 'allrounders':
+            total_runs_allrounders += getattr(player, 'runs', 0) or 0
+            total_average_allrounders += getattr(player, 'average', 0) or 0
+            total_strike_rate_allrounders += getattr(player, 'strike_rate', 0) or 0
+            total_fifties_allrounders += getattr(player, 'fifties', 0) or 0
+            total_hundreds_allrounders += getattr(player, 'hundreds', 0) or 0
+            total_wickets_allrounders += getattr(player, 'wickets', 0) or 0
+            total_economy_allrounders += getattr(player, 'economy', 0) or 0
+            allrounders_count += 1
+        elif category == 'bowlers':
+            total_wickets_bowlers += getattr(player, 'wickets', 0) or 0
+            total_economy_bowlers += getattr(player, 'economy', 0) or 0
+            bowlers_count += 1
+
+    # Calculate averages
+    avg_runs_batsmen = total_runs_batsmen / batsmen_count if batsmen_count > 0 else 0
+    avg_runs_wicketkeepers = total_runs_wicketkeepers / wicketkeepers_count if wicketkeepers_count > 0 else 0
+    avg_runs_allrounders = total_runs_allrounders / allrounders_count if allrounders_count > 0 else 0
+    avg_average_batsmen = total_average_batsmen / batsmen_count if batsmen_count > 0 else 0
+    avg_average_wicketkeepers = total_average_wicketkeepers / wicketkeepers_count if wicketkeepers_count > 0 else 0
+    avg_average_allrounders = total_average_allrounders / allrounders_count if allrounders_count > 0 else 0
+    avg_strike_rate_batsmen = total_strike_rate_batsmen / batsmen_count if batsmen_count > 0 else 0
+    avg_strike_rate_wicketkeepers = total_strike_rate_wicketkeepers / wicketkeepers_count if wicketkeepers_count > 0 else 0
+    avg_strike_rate_allrounders = total_strike_rate_allrounders / allrounders_count if allrounders_count > 0 else 0
+    avg_economy_bowlers = total_economy_bowlers / bowlers_count if bowlers_count > 0 else 0
+    avg_economy_allrounders = total_economy_allrounders / allrounders_count if allrounders_count > 0 else 0
+
+    # Evaluate batting strength (batsmen only)
+    if batsmen_count >= 7 and avg_average_batsmen > 35 and avg_strike_rate_batsmen > 140 and total_runs_batsmen > 2000:
+        score += 25
+        strengths.append(f"Strong batting lineup with {batsmen_count} batsmen, average of {avg_average_batsmen:.2f}, strike rate of {avg_strike_rate_batsmen:.2f}, and {total_runs_batsmen} runs")
+    elif batsmen_count >= 5 and avg_average_batsmen > 25 and avg_strike_rate_batsmen > 130 and total_runs_batsmen > 1500:
+        score += 15
+        strengths.append(f"Decent batting lineup with {batsmen_count} batsmen, average of {avg_average_batsmen:.2f}, strike rate of {avg_strike_rate_batsmen:.2f}, and {total_runs_batsmen} runs")
+    elif batsmen_count >= 3 and avg_average_batsmen > 15 and avg_strike_rate_batsmen > 100 and total_runs_batsmen > 500:
+        score += 10
+        strengths.append(f"Average batting lineup with {batsmen_count} batsmen, average of {avg_average_batsmen:.2f}, strike rate of {avg_strike_rate_batsmen:.2f}, and {total_runs_batsmen} runs")
+    else:
+        weaknesses.append(f"Batting lineup needs improvement: {batsmen_count} batsmen, average of {avg_average_batsmen:.2f}, strike rate of {avg_strike_rate_batsmen:.2f}, and {total_runs_batsmen} runs")
+
+    # Evaluate bowling strength (bowlers only)
+    if bowlers_count >= 7 and avg_economy_bowlers < 8 and total_wickets_bowlers > 100:
+        score += 25
+        strengths.append(f"Excellent bowling attack with {bowlers_count} bowlers, economy of {avg_economy_bowlers:.2f}, and {total_wickets_bowlers} wickets")
+    elif bowlers_count >= 5 and avg_economy_bowlers < 10 and total_wickets_bowlers > 50:
+        score += 15
+        strengths.append(f"Good bowling attack with {bowlers_count} bowlers, economy of {avg_economy_bowlers:.2f}, and {total_wickets_bowlers} wickets")
+    elif bowlers_count >= 3 and avg_economy_bowlers < 12 and total_wickets_bowlers > 20:
+        score += 10
+        strengths.append(f"Average bowling attack with {bowlers_count} bowlers, economy of {avg_economy_bowlers:.2f}, and {total_wickets_bowlers} wickets")
+    else:
+        weaknesses.append(f"Bowling attack needs improvement: {bowlers_count} bowlers, economy of {avg_economy_bowlers:.2f}, and {total_wickets_bowlers} wickets")
+
+    # Evaluate all-rounders
+    if allrounders_count >= 7 and avg_average_allrounders > 25 and avg_economy_allrounders < 9 and avg_strike_rate_allrounders > 120 and total_wickets_allrounders > 50:
+        score += 20
+        strengths.append(f"Good balance with {allrounders_count} all-rounders, average of {avg_average_allrounders:.2f}, economy of {avg_economy_allrounders:.2f}, and {total_wickets_allrounders} wickets with {avg_strike_rate_allrounders:.2f} strike rate")
+    elif allrounders_count >= 5 and avg_average_allrounders > 15 and avg_economy_allrounders < 12 and avg_strike_rate_allrounders > 110 and total_wickets_allrounders > 20:
+        score += 15
+        strengths.append(f"Decent balance with {allrounders_count} all-rounders, average of {avg_average_allrounders:.2f}, economy of {avg_economy_allrounders:.2f}, and {total_wickets_allrounders} wickets with {avg_strike_rate_allrounders:.2f} strike rate")
+    elif allrounders_count >= 3 and avg_average_allrounders > 10 and avg_economy_allrounders < 15 and avg_strike_rate_allrounders > 100 and total_wickets_allrounders > 10:
+        score += 5
+        strengths.append(f"Average balance with {allrounders_count} all-rounders, average of {avg_average_allrounders:.2f}, economy of {avg_economy_allrounders:.2f}, and {total_wickets_allrounders} wickets with {avg_strike_rate_allrounders:.2f} strike rate")
+    else:
+        weaknesses.append(f"Need more all-rounders for team balance: {allrounders_count} all-rounders, average of {avg_average_allrounders:.2f}, economy of {avg_economy_allrounders:.2f}, and {total_wickets_allrounders} wickets and {avg_strike_rate_allrounders:.2f} strike rate")
+
+    # Evaluate wicketkeepers
+    if wicketkeepers_count >= 3 and avg_average_wicketkeepers > 30 and avg_strike_rate_wicketkeepers > 130:
+        score += 10
+        strengths.append(f"Has {wicketkeepers_count} dedicated wicketkeeper(s) with an average of {avg_average_wicketkeepers:.2f} and strike rate of {avg_strike_rate_wicketkeepers:.2f}")
+    elif wicketkeepers_count >= 2 and avg_average_wicketkeepers > 15 and avg_strike_rate_wicketkeepers > 100:
+        score += 5
+        strengths.append(f"Has {wicketkeepers_count} dedicated wicketkeeper(s) with an average of {avg_average_wicketkeepers:.2f} and strike rate of {avg_strike_rate_wicketkeepers:.2f}")
+    else:
+        weaknesses.append(f"Missing specialist wicketkeepers or wicketkeeper stats need improvement because of an average of {avg_average_wicketkeepers:.2f} and strike rate of {avg_strike_rate_wicketkeepers:.2f}")
+
+    # Evaluate team composition
+    if batsmen_count >= 5:
+        score += 5
+        strengths.append(f"Strong batting lineup with {batsmen_count} batsmen")
+    else:
+        weaknesses.append(f"Need more specialist batsmen (currently {batsmen_count})")
+
+    if bowlers_count >= 5:
+        score += 5
+        strengths.append(f"Well-rounded bowling attack with {bowlers_count} bowlers")
+    else:
+        weaknesses.append(f"Bowling attack needs strengthening (currently {bowlers_count})")
+
+    if wicketkeepers_count >= 3:
+        score += 5
+        strengths.append(f"Has {wicketkeepers_count} dedicated wicketkeeper(s)")
+    else:
+        weaknesses.append("Missing specialist wicketkeeper")
+
+    if allrounders_count >= 5:
+        score += 5
+        strengths.append(f"Good balance with {allrounders_count} all-rounders")
+    else:
+        weaknesses.append(f"Need more specialist all-rounders (currently {allrounders_count})")
+
+    # Cap the score at 100
+    score = min(score, 100)
+
+    # Return structure matching original format stats
+    return {
+        'score': score,
+        'grade': 'A+' if score >= 90 else 'A' if score >= 80 else 'B+' if score >= 70 else 'B' if score >= 60 else 'C' if score >= 50 else 'C+' if score >= 40 else 'D',
+        'strengths': strengths,
+        'weaknesses': weaknesses,
+        'stats': {
+            'batsmen_count': batsmen_count,
+            'bowlers_count': bowlers_count,
+            'wicketkeepers_count': wicketkeepers_count,
+            'allrounders_count': allrounders_count,
+            'avg_runs_batsmen': avg_runs_batsmen,
+            'avg_runs_wicketkeepers': avg_runs_wicketkeepers,
+            'avg_runs_allrounders': avg_runs_allrounders,
+            'avg_average_batsmen': avg_average_batsmen,
+            'avg_average_wicketkeepers': avg_average_wicketkeepers,
+            'avg_average_allrounders': avg_average_allrounders,
+            'avg_strike_rate_batsmen': avg_strike_rate_batsmen,
+            'avg_strike_rate_wicketkeepers': avg_strike_rate_wicketkeepers,
+            'avg_strike_rate_allrounders': avg_strike_rate_allrounders,
+            'avg_economy_bowlers': avg_economy_bowlers,
+            'avg_economy_allrounders': avg_economy_allrounders,
+            'total_runs_batsmen': total_runs_batsmen,
+            'total_runs_wicketkeepers': total_runs_wicketkeepers,
+            'total_runs_allrounders': total_runs_allrounders,
+            'total_wickets_bowlers': total_wickets_bowlers,
+            'total_wickets_allrounders': total_wickets_allrounders,
+            'total_fifties_batsmen': total_fifties_batsmen,
+            'total_fifties_wicketkeepers': total_fifties_wicketkeepers,
+            'total_fifties_allrounders': total_fifties_allrounders,
+            'total_hundreds_batsmen': total_hundreds_batsmen,
+            'total_hundreds_wicketkeepers': total_hundreds_wicketkeepers,
+            'total_hundreds_allrounders': total_hundreds_allrounders,
+            'total_matches': total_matches
+        }
+    }
+
+
+def _text(lines):
+    return [DECIMAL.sub('#', line) for line in lines]
+
+
+def differences(actual, expected):
+    """Keys of an evaluation that differ from the reference"""
+    keys = [key for key in ('score', 'grade') if actual[key] != expected[key]]
+    keys += [key for key in ('strengths', 'weaknesses') if _text(actual[key]) != _text(expected[key])]
+    for key, value in expected['stats'].items():
+        got = actual['stats'].get(key)
+        if type(got) is not type(value) or not math.isclose(got, value, rel_tol=1e-9, abs_tol=1e-9):
+            keys.append(key)
+    return keys
+
+
+def player_row(rng, player_id, category, quality):
+    row = {'id': player_id, 'name': f'Player {player_id}', 'player_name': f'Player {player_id}',
+           'player_number': player_id, 'base_price': round(rng.uniform(0.2, 2.0), 1),
+           'status': 'untouched', 'type': category, 'matches': rng.randint(5, 150)}
+    if category != 'bowlers':
+        row.update(runs=int(rng.uniform(50, 900) * quality), average=round(rng.uniform(8, 50) * quality, 2),
+                   strike_rate=round(rng.uniform(90, 170) * quality, 2), highest_score=rng.randint(20, 150),
+                   fifties=rng.randint(0, 12), hundreds=rng.randint(0, 3))
+    if category in ('bowlers', 'allrounders'):
+        row.update(wickets=int(rng.uniform(2, 40) * quality), economy=round(rng.uniform(5.5, 14) / quality, 2),
+                   best_bowling='3/20')
+    return row
+
+
+def seed(rng, teams, pool):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(Team.__table__.insert(), [
+        {'id': t, 'name': f'Team {t}', 'purse': 1000.0} for t in range(1, teams + 1)
+    ])
+    categories = list(PLAYER_CLASSES)
+    rows = []
+    for team_id in range(1, teams + 1):
+        quality = rng.uniform(0.6, 1.3)
+        for category in categories:
+            for _ in range(rng.choice([0, 1, 2, 3, 4, 5, 6, 7, 8, 9])):
+                row = player_row(rng, len(rows) + 1, category, quality)
+                row.update(status='sold', team_id=team_id, team_name=f'Team {team_id}',
+                           selling_price=row['base_price'])
+                rows.append(row)
+    for _ in range(pool):
+        rows.append(player_row(rng, len(rows) + 1, rng.choice(categories), rng.uniform(0.6, 1.3)))
+    # One INSERT per category and table: rows of a category must share keys
+    for category in categories:
+        keys = set().union(*(row.keys() for row in rows if row['type'] == category))
+        for row in rows:
+            if row['type'] == category:
+                for key in keys - row.keys():
+                    row[key] = None
+    importer.insert_players(rows)
+    db.session.commit()
+    aggregates.backfill()
+
+
+def median_ms(fn, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--teams', type=int, default=200)
+    parser.add_argument('--pool', type=int, default=2000, help='available players')
+    parser.add_argument('--signings', type=int, default=100, help='what-if predictions to verify')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    failures = []
+    with app.app_context():
+        seed(rng, args.teams, args.pool)
+        teams = Team.query.all()
+
+        scores = set()
+        predicted = scoring.score(scoring.team_matrix(teams))
+        for team, score, grade in zip(teams, *(column.tolist() for column in predicted)):
+            expected = roster_evaluation(team)
+            scores.add(expected['score'])
+            wrong = differences(evaluate_team(team), expected)
+            if wrong:
+                failures.append(f"{team.name}: evaluate_team differs from the roster walk in {', '.join(wrong)}")
+            if (int(score), grade) != (expected['score'], expected['grade']):
+                failures.append(f"{team.name}: scoring.score() {int(score)} {grade}, "
+                                f"roster walk {expected['score']} {expected['grade']}")
+        print(f'{len(teams)} teams compared, {len(scores)} distinct scores')
+
+        pool = scoring.candidates()['id']
+        for _ in range(args.signings):
+            team = rng.choice(teams)
+            player_id = rng.choice(pool)
+            price = round(rng.uniform(0.2, 5.0), 1)
+            predicted = scoring.what_if(team, scoring.candidates(player_ids=[player_id]), price)['candidates'][0]
+            settlement.sell(player_id, team, price)
+            db.session.expire_all()
+            actual = roster_evaluation(team)
+            if (predicted['score'], predicted['grade']) != (actual['score'], actual['grade']):
+                failures.append(f"{team.name} + player {player_id}: what-if {predicted['score']} "
+                                f"{predicted['grade']}, actual {actual['score']} {actual['grade']}")
+            settlement.release(player_id, 'untouched')
+            db.session.expire_all()
+        print(f'{args.signings} what-if predictions checked against real sales')
+        failures.extend(f"aggregate drift {d['team']} {d['field']}" for d in aggregates.check())
+
+        teams = Team.query.all()
+        walk = median_ms(lambda: [roster_evaluation(team) for team in teams])
+        scalar = median_ms(lambda: [evaluate_team(team) for team in teams])
+        vector = median_ms(lambda: scoring.score(scoring.team_matrix(teams)))
+        print(f'score {len(teams)} teams: roster walk {walk:.2f} ms, evaluate_team {scalar:.2f} ms, '
+              f'scoring.score {vector:.2f} ms (no text)')
+
+    client = app.test_client()
+
+    def what_if_request():
+        response = client.get('/api/team/Team 1/what-if')
+        assert response.status_code == 200, response.get_json()
+        assert len(response.get_json()['candidates']) == len(pool)
+
+    what_if = median_ms(what_if_request)
+    print(f'what-if over {len(pool)} available players: {what_if:.2f} ms per request')
+
+    os.remove(DB_PATH)
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures:
+        sys.exit(1)
+    print('evaluate_team, scoring.score() and what-if match the roster walk.')
+
+
+if __name__ == '__main__':
+    main()
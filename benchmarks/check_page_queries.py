@@ -0,0 +1,110 @@
+"""SQL statement count of the auction pages at different roster sizes.
+
+For each roster size, seeds a throwaway SQLite database with 10 teams and
+that many players per team in every category, half of them sold, then
+counts the statements issued by rendering /, /players, /teams,
+/team/<name> and /evaluation with the page cache empty. The loaders fetch
+each page in a fixed number of queries, so the counts must not depend on
+roster size; the script exits non-zero if they do (an N+1 lazy load is
+back) or if a page does not render.
+
+    python benchmarks/check_page_queries.py --sizes 10,100
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+DB_PATH = os.path.join(tempfile.gettempdir(), 'ipl_check_page_queries.db')
+os.environ['SUPABASE_DB_URL'] = f'sqlite:///{DB_PATH}'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+from app import app  # noqa: E402
+from models import db, Team  # noqa: E402
+from player_data import STAT_FIELDS  # noqa: E402
+import aggregates  # noqa: E402
+import cache  # noqa: E402
+import importer  # noqa: E402
+
+TEAMS = 10
+
+PAGES = [
+    ('index', '/'),
+    ('players', '/players'),
+    ('teams', '/teams'),
+    ('team', '/team/Team 1'),
+    ('evaluation', '/evaluation'),
+]
+
+
+def seed(roster):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(Team.__table__.insert(), [
+        {'id': t, 'name': f'Team {t}', 'purse': 100.0} for t in range(1, TEAMS + 1)
+    ])
+    players = []
+    for category, fields in STAT_FIELDS.items():
+        for _ in range(TEAMS * roster):
+            i = len(players) + 1
+            team = i % TEAMS + 1 if i % 2 else None
+            players.append(dict(
+                {field: parse(None) for field, parse in fields},
+                id=i, name=f'Player {i}', player_number=i, base_price=0.01, type=category,
+                selling_price=0.01 if team else None, status='sold' if team else 'available',
+                team_id=team, team_name=f'Team {team}' if team else None,
+            ))
+    importer.insert_players(players)
+    db.session.commit()
+    aggregates.backfill()
+    db.session.commit()
+    db.session.remove()
+
+
+def measure(client, url):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.extend([statement] * (len(parameters) if executemany else 1))
+
+    # Render from scratch: no cached page or fragment
+    cache.store().clear()
+    event.listen(db.engine, 'before_cursor_execute', count)
+    response = client.get(url)
+    event.remove(db.engine, 'before_cursor_execute', count)
+    assert response.status_code == 200, (url, response.status_code)
+    return len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,100')
+    args = parser.parse_args()
+
+    client = app.test_client()
+    counts = {}
+    print(f"{'roster':>7} " + ' '.join(f'{name:>11}' for name, _ in PAGES))
+    with app.app_context():
+        for roster in (int(s) for s in args.sizes.split(',')):
+            seed(roster)
+            for _, url in PAGES:
+                measure(client, url)  # first render compiles templates
+            cells = []
+            for name, url in PAGES:
+                statements = measure(client, url)
+                counts.setdefault(name, set()).add(statements)
+                cells.append(f'{statements:>5} stmts')
+            print(f'{roster:>7} ' + ' '.join(f'{cell:>11}' for cell in cells))
+
+    failures = [f'{name}: statement count varies with roster size {sorted(seen)}'
+                for name, seen in counts.items() if len(seen) > 1]
+    os.remove(DB_PATH)
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
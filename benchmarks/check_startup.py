@@ -0,0 +1,138 @@
+"""Startup time of the production entry point, checked against a budget.
+
+Creates a scratch SQLite database with `flask init-db`, then measures, in
+fresh interpreters (median of --runs):
+
+    import      `import app`
+    create_app  wsgi.create_app(): the schema check and template compilation
+    first 200   `gunicorn -c gunicorn.conf.py` from exec to the first 200 on /
+
+It fails (exit 1) if the first 200 takes longer than --budget-ms, if an
+optional heavy dependency (openpyxl, pandas, redis, the async stack, ...)
+is imported at boot, or if gunicorn starts against an empty database
+instead of refusing with the schema error.
+
+    python benchmarks/check_startup.py --runs 5 --budget-ms 3000
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = os.path.join(tempfile.gettempdir(), 'ipl_check_startup')
+
+# Needed only by the routes or modes that use them; importing them at boot
+# costs every worker their import time and memory
+LAZY_MODULES = ['openpyxl', 'pandas', 'pyarrow', 'twilio', 'trafilatura', 'redis',
+                'asyncpg', 'aiosqlite', 'a2wsgi', 'uvicorn']
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+import wsgi
+wsgi.create_app()
+created = time.perf_counter()
+print(json.dumps({"import": (imported - start) * 1000, "create_app": (created - imported) * 1000,
+                  "loaded": [m for m in %r if m in sys.modules]}))
+''' % (LAZY_MODULES,)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def environment(db_path, **extra):
+    return dict(os.environ, SUPABASE_DB_URL=f'sqlite:///{db_path}', FLASK_APP='app',
+                AUCTION_STATE='database', WEB_CONCURRENCY='2', SESSION_SECRET='check-startup', **extra)
+
+
+def probe(env):
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def first_response(env, timeout=30):
+    """ms from exec to the first 200 on /, or exits with gunicorn's output"""
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--log-level', 'warning'],
+                              cwd=ROOT, env=dict(env, PORT=str(port)),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=5) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                if server.poll() is not None:
+                    sys.exit(f'gunicorn exited with {server.returncode}:\n{server.stderr.read()}')
+                time.sleep(0.01)
+        sys.exit('gunicorn did not answer within %ds' % timeout)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def refuses_empty_database(env):
+    """gunicorn must exit non-zero, naming `flask init-db`, on a database without tables"""
+    result = subprocess.run([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+                            cwd=ROOT, env=dict(env, PORT=str(free_port())), capture_output=True, text=True, timeout=60)
+    return result.returncode != 0 and 'flask init-db' in result.stderr
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=3000, help='limit for the first 200')
+    args = parser.parse_args()
+
+    os.makedirs(WORKDIR, exist_ok=True)
+    db_path = os.path.join(WORKDIR, 'startup.db')
+    empty_path = os.path.join(WORKDIR, 'empty.db')
+    for path in (db_path, empty_path):
+        if os.path.exists(path):
+            os.remove(path)
+    subprocess.run([sys.executable, '-m', 'flask', 'init-db'], cwd=ROOT, env=environment(db_path),
+                   check=True, stdout=subprocess.DEVNULL)
+
+    env = environment(db_path)
+    probes = [probe(env) for _ in range(args.runs)]
+    responses = [first_response(env) for _ in range(args.runs)]
+    refused = refuses_empty_database(environment(empty_path))
+
+    print(f'median of {args.runs} runs')
+    print(f"import       {statistics.median(p['import'] for p in probes):>8.1f} ms")
+    print(f"create_app   {statistics.median(p['create_app'] for p in probes):>8.1f} ms")
+    first = statistics.median(responses)
+    print(f'first 200    {first:>8.1f} ms  (budget {args.budget_ms:g} ms)')
+
+    failures = []
+    if first > args.budget_ms:
+        failures.append(f'first response took {first:.0f} ms, over the {args.budget_ms:g} ms budget')
+    loaded = sorted({m for p in probes for m in p['loaded']})
+    if loaded:
+        failures.append(f"imported at boot: {', '.join(loaded)}")
+    if not refused:
+        failures.append('gunicorn started against an empty database')
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures:
+        sys.exit(1)
+    print('Startup is within budget.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Concurrent sell/unsold stress test for settlement.py.
+
+Worker threads hammer POST /api/player/<id>/action with random sales
+(re-sales included) and unsold calls across a few teams, then the harness
+checks that nothing was lost or double-spent:
+
+- every purse equals its starting purse minus what its current players cost
+- no purse is negative, and ownership matches status
+- one BidHistory row exists per successful sale
+- the TeamAggregate rows match the rosters
+
+    python benchmarks/stress_settlement.py --threads 16 --sales 4000
+    python benchmarks/stress_settlement.py --db-url postgresql://localhost/ipl_stress
+
+The target database is wiped, so point --db-url at a scratch database.
+Exits non-zero if any check fails.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+DB_PATH = os.path.join(tempfile.gettempdir(), 'ipl_stress_settlement.db')
+RESULTS_LOCK = threading.Lock()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db-url', default=f'sqlite:///{DB_PATH}')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--sales', type=int, default=2000, help='total actions across all threads')
+    parser.add_argument('--teams', type=int, default=4)
+    parser.add_argument('--players', type=int, default=100)
+    parser.add_argument('--purse', type=float, default=100.0)
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args()
+
+
+args = parse_args()
+os.environ['SUPABASE_DB_URL'] = args.db_url
+os.environ['AUCTION_AUTH'] = 'off'  # writes go through the routes without a login
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from models import db, Team, Player, BidHistory  # noqa: E402
+import aggregates  # noqa: E402
+import importer  # noqa: E402
+import settlement  # noqa: E402
+
+
+def seed():
+    db.drop_all()
+    db.create_all()
+    db.session.execute(Team.__table__.insert(), [
+        {'id': i, 'name': f'Team {i}', 'purse': args.purse} for i in range(1, args.teams + 1)
+    ])
+    importer.insert_players([
+        {'id': i, 'name': f'Player {i}', 'player_name': f'Player {i}', 'player_number': i,
+         'base_price': 2.0, 'status': 'untouched', 'type': 'batsmen', 'matches': 10, 'runs': 300}
+        for i in range(1, args.players + 1)
+    ])
+    db.session.commit()
+    aggregates.backfill()
+
+
+def worker(index, count, outcomes, errors):
+    rng = random.Random(args.seed * 1000 + index)
+    client = app.test_client()
+    for _ in range(count):
+        player_id = rng.randint(1, args.players)
+        if rng.random() < 0.1:
+            body = {'action': 'unsold'}
+        else:
+            body = {'action': 'sold', 'team': f'Team {rng.randint(1, args.teams)}',
+                    'price': float(rng.randint(2, 8))}
+        response = client.post(f'/api/player/{player_id}/action', json=body)
+        with RESULTS_LOCK:
+            outcomes[(body['action'], response.status_code)] += 1
+            if response.status_code >= 500:
+                errors.append(response.get_json())
+
+
+def check(sales):
+    failures = []
+    owned = Counter()
+    for player in Player.query.all():
+        if player.team_id:
+            owned[player.team_id] += settlement.paid(player)
+            if player.status != 'sold':
+                failures.append(f'{player.name} is on team {player.team_id} but {player.status}')
+        elif player.status == 'sold':
+            failures.append(f'{player.name} is sold without a team')
+
+    for team in Team.query.all():
+        expected = args.purse - owned[team.id]
+        if abs(team.purse - expected) > 1e-6:
+            failures.append(f'{team.name}: purse {team.purse} != {expected}')
+        if team.purse < 0:
+            failures.append(f'{team.name}: negative purse {team.purse}')
+
+    bids = BidHistory.query.count()
+    if bids != sales:
+        failures.append(f'{bids} BidHistory rows for {sales} sales')
+
+    failures.extend(f"aggregate drift {d['team']} {d['field']}" for d in aggregates.check())
+    return failures
+
+
+def main():
+    with app.app_context():
+        seed()
+
+    outcomes = Counter()
+    errors = []
+    per_thread = args.sales // args.threads
+    threads = [threading.Thread(target=worker, args=(i, per_thread, outcomes, errors))
+               for i in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = per_thread * args.threads
+    print(f'{total} actions on {args.threads} threads in {elapsed:.2f}s ({total / elapsed:.0f}/s)')
+    for (action, status), count in sorted(outcomes.items()):
+        print(f'  {action:<7} {status}: {count}')
+    for error in errors[:10]:
+        print(f'  error: {error}')
+
+    with app.app_context():
+        failures = check(outcomes[('sold', 200)])
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures or errors:
+        sys.exit(1)
+    print('Purses, ownership, bid history and aggregates are consistent.')
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""Read-through cache for rendered pages, template fragments and player JSON.
+
+Everything is keyed on the auction state version, a counter kept in the
+database (AuctionState) and bumped in the same transaction as any commit
+that touches players, teams, aggregates or bids. Writes never invalidate
+entries explicitly: once the version moves, old keys are simply never asked
+for again and age out of the LRU. Because the counter lives in the database,
+every worker sees every other worker's writes. The bump is the last
+statement of its transaction, so the row lock it takes is held only until
+the COMMIT right after it, not while the write does its work. In memory
+mode the version is the state engine's counter, which starts over with
+every process; it is prefixed with a per-boot id so an ETag handed out
+before a restart cannot match a page rendered after it.
+
+- @cached_page(name) serves a whole GET page from the cache, with an ETag
+  derived from the version so unchanged pages answer 304.
+- {% call cached('team-card', team.id) %}...{% endcall %} caches a fragment.
+- {% call cached_for('team-roster', team.id, category, players=players) %}
+  caches a fragment on what it shows instead of the version: its parts and
+  everything to_dict() reads from its players. A sale then re-renders only
+  the fragments showing the player sold, even though the page around them
+  is rebuilt.
+- {{ player_island(players) }} writes the page's players as one JSON
+  <script> (read by static/js/live.js). Each player's JSON is cached on the
+  values it is built from rather than on the version, so a sale only
+  re-serializes the player it sold.
+
+Sizing: AUCTION_CACHE_MAX_BYTES bounds the LRU; /api/cache/stats reports
+hits, misses and evictions.
+
+Compiled templates are kept as bytecode in TEMPLATE_CACHE_DIR (by default
+Jinja's per-user directory under the system temp dir; 'off' disables it),
+so a fresh process loads them instead of compiling them again. Entries are
+keyed on the template source, so editing a template is picked up as usual.
+"""
+import hashlib
+import os
+import secrets
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, current_app, g, has_app_context, request
+from jinja2 import FileSystemBytecodeCache
+from jinja2.utils import htmlsafe_json_dumps
+from markupsafe import Markup
+from sqlalchemy import event, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import db, AuctionState, Player, Team, TeamAggregate, BidHistory
+from player_data import STAT_FIELDS
+import state_engine
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_TEMPLATE_CACHE_DIR = ''  # Jinja's default directory
+
+# Commits touching these models change what the pages show
+TRACKED_MODELS = (Player, Team, TeamAggregate, BidHistory)
+TRACKED_TABLES = {table.name for model in TRACKED_MODELS
+                  for mapper in model.__mapper__.self_and_descendants for table in mapper.tables}
+
+
+# Distinguishes this process's memory-mode versions from an earlier boot's
+BOOT_ID = secrets.token_hex(4)
+
+
+class LRUCache:
+    """Thread-safe LRU of string values, bounded by their total length"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        cost = len(value)
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._data[key] = value
+            self.size += cost
+            while self.size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+def init_app(app):
+    app.extensions['auction_cache'] = LRUCache(
+        app.config.get('AUCTION_CACHE_MAX_BYTES') or DEFAULT_MAX_BYTES)
+    app.jinja_env.globals.update(cached=fragment, cached_for=content_fragment, player_island=player_island)
+    directory = app.config.get('TEMPLATE_CACHE_DIR', DEFAULT_TEMPLATE_CACHE_DIR)
+    if directory != 'off':
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory or None)
+
+
+def store():
+    return current_app.extensions['auction_cache']
+
+
+def state_version():
+    """Current auction state version, read once per request"""
+    if state_engine.enabled():
+        # In memory mode the database lags behind; the state engine counts changes
+        return f'{BOOT_ID}.{state_engine.version()}'
+    if 'auction_state_version' not in g:
+        version = db.session.scalar(select(AuctionState.version).where(AuctionState.id == 1))
+        g.auction_state_version = version or 0
+    return g.auction_state_version
+
+
+def _key(*parts):
+    return ':'.join(str(part) for part in (state_version(),) + parts)
+
+
+def cached_page(name):
+    """Serve a GET view's rendered HTML from the cache, keyed on path and query string"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with state_engine.locked():
+                return _serve(view, name, args, kwargs)
+        return wrapper
+    return decorator
+
+
+def page_key(name):
+    """Cache key and ETag of the current request's page"""
+    key = _key('page', name, request.full_path)
+    return key, hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def page_response(body, etag):
+    """The page's response, or 304 Not Modified when body is None"""
+    response = Response(status=304) if body is None else Response(body, mimetype='text/html')
+    response.set_etag(etag)
+    # Let browsers keep the page but revalidate it every time
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _serve(view, name, args, kwargs):
+    # Held under the state engine's lock in memory mode, so a page is never
+    # rendered from a half-applied sale and cached under the wrong version
+    key, etag = page_key(name)
+    if request.if_none_match.contains(etag):
+        return page_response(None, etag)
+    body = store().get(key)
+    if body is None:
+        result = view(*args, **kwargs)
+        if not isinstance(result, str):
+            return result  # redirects and errors are not cached
+        body = result
+        store().set(key, body)
+    return page_response(body, etag)
+
+
+def fragment(name, *parts, caller):
+    """Jinja call block: {% call cached('team-card', team.id) %}...{% endcall %}"""
+    key = _key('fragment', name, *parts)
+    html = store().get(key)
+    if html is None:
+        html = str(caller())
+        store().set(key, html)
+    return Markup(html)
+
+
+def content_fragment(name, *parts, players=(), caller):
+    """Jinja call block cached on parts and its players' payload, not the version"""
+    state = repr((parts, [_payload_key(player) for player in players]))
+    key = f"content:{name}:{hashlib.sha1(state.encode()).hexdigest()}"
+    html = store().get(key)
+    if html is None:
+        html = str(caller())
+        store().set(key, html)
+    return Markup(html)
+
+
+def _payload_key(player):
+    # Pages ask for it twice per player (fragment keys and the JSON island),
+    # and only read, so it is built once per request
+    if not has_app_context():
+        return _build_payload_key(player)
+    keys = g.setdefault('payload_keys', {})
+    entry = keys.get(id(player))
+    if entry is None or entry[0] is not player:
+        entry = keys[id(player)] = (player, _build_payload_key(player))
+    return entry[1]
+
+
+def _build_payload_key(player):
+    # Everything to_dict() reads, so an entry is stale exactly when the payload would change
+    return ('player', player.id, player.name, player.type, player.player_number, player.base_price,
+            player.status, player.selling_price, player.team.name if player.team else None,
+            *[getattr(player, field) for field, _ in STAT_FIELDS.get(player.type, ())])
+
+
+def player_json(player, lru=None):
+    """player.to_dict() as JSON that is safe inside a <script> element"""
+    lru = lru or store()
+    key = _payload_key(player)
+    payload = lru.get(key)
+    if payload is None:
+        payload = str(htmlsafe_json_dumps(player.to_dict(), dumps=current_app.json.dumps))
+        lru.set(key, payload)
+    return payload
+
+
+def player_island(grouped):
+    """<script id="player-data"> mapping id -> to_dict() for a category -> players dict"""
+    lru = store()
+    entries = [f'"{player.id}":{player_json(player, lru)}' for players in grouped.values() for player in players]
+    return Markup('<script type="application/json" id="player-data">{%s}</script>' % ','.join(entries))
+
+
+def ensure_version_row():
+    """Create the AuctionState row (flask init-db), so bump() is a single UPDATE"""
+    if db.session.get(AuctionState, 1) is None:
+        db.session.add(AuctionState(id=1, version=0))
+        db.session.commit()
+
+
+def bump(session):
+    """Advance the state version inside the session's current transaction"""
+    result = session.execute(
+        update(AuctionState).where(AuctionState.id == 1)
+        .values(version=AuctionState.version + 1)
+    )
+    if result.rowcount == 0:
+        try:
+            with session.begin_nested():
+                session.add(AuctionState(id=1, version=1))
+        except IntegrityError:
+            # Another writer created the row first
+            bump(session)
+
+
+def _tracked(obj):
+    return isinstance(obj, TRACKED_MODELS)
+
+
+@event.listens_for(Session, 'before_flush')
+def _note_flush(session, flush_context, instances):
+    if any(_tracked(obj) for obj in list(session.new) + list(session.dirty) + list(session.deleted)):
+        session.info['auction_state_changed'] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _note_statement(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if getattr(table, 'name', None) in TRACKED_TABLES:
+            orm_execute_state.session.info['auction_state_changed'] = True
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_on_commit(session):
+    # Flush the transaction's own writes first: the version row is locked
+    # from the bump to the COMMIT that follows it, and nothing else runs then
+    session.flush()
+    if session.info.pop('auction_state_changed', False):
+        bump(session)
+
+
+@event.listens_for(Session, 'after_commit')
+def _forget_version(session):
+    if has_app_context():
+        g.pop('auction_state_version', None)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_changes(session, previous_transaction):
+    # Savepoint rollbacks (allocator, aggregates.ensure) keep the outer changes
+    if previous_transaction.parent is None:
+        session.info.pop('auction_state_changed', None)
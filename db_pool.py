@@ -0,0 +1,247 @@
+"""Engine and connection pool profile for the remote (Supabase) Postgres.
+
+Each gunicorn worker has its own pool, so DB_POOL_SIZE + DB_MAX_OVERFLOW
+per worker times the number of workers must fit the database's (or
+PgBouncer's) connection limit. All settings come from the environment
+(DEFAULTS below). They only apply to PostgreSQL URLs; SQLite keeps
+SQLAlchemy's defaults.
+
+- pool_pre_ping tests each connection on checkout and replaces it if the
+  server or a NAT dropped it while idle between auction rounds.
+  pool_recycle retires connections before typical idle cutoffs, and a LIFO
+  queue lets surplus connections go idle and be recycled.
+- Server connections get TCP keepalives, a connect timeout and
+  statement_timeout, so a stuck query fails the request instead of holding
+  the connection forever.
+- PgBouncer transaction mode (DB_PGBOUNCER=transaction; also assumed on
+  Supabase's pooler port 6543) rejects the `options` startup parameter and
+  breaks server-side prepared statements. statement_timeout is then sent as
+  SET LOCAL at the start of each transaction. Prepared statements are
+  switched off for psycopg 3 and asyncpg; psycopg2 never uses them.
+- The async read path (asgi.py) gets the same profile through asyncpg, with
+  its own pool of DB_POOL_SIZE + DB_MAX_OVERFLOW per worker.
+- DB_POOL_WARMUP opens that many connections when the app starts, so the
+  first requests after a deploy don't all connect at once.
+
+MeteredQueuePool records how long each checkout waited, how often the pool
+was exhausted, timeouts, new connections and invalidations. /metrics
+exports them and /api/pool/stats shows them as JSON.
+"""
+import threading
+import time
+import uuid
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+import metrics
+
+DEFAULTS = {
+    'DB_POOL_SIZE': 5,
+    'DB_MAX_OVERFLOW': 5,
+    'DB_POOL_TIMEOUT': 10,        # seconds to wait for a free connection
+    'DB_POOL_RECYCLE': 600,       # seconds before a connection is replaced
+    'DB_POOL_PRE_PING': 'true',
+    'DB_CONNECT_TIMEOUT': 10,     # seconds
+    'DB_STATEMENT_TIMEOUT_MS': 15000,  # 0 disables
+    'DB_PGBOUNCER': '',           # 'transaction' (or 'session'); '' = auto by port
+    'DB_POOL_WARMUP': 0,          # connections to open at startup
+}
+
+# Supabase's transaction-mode pooler listens here
+PGBOUNCER_TRANSACTION_PORT = 6543
+
+# Checkout waits are normally sub-millisecond; exhaustion shows in the tail
+WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+
+def _flag(value):
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def pgbouncer_mode(config, url):
+    mode = (config.get('DB_PGBOUNCER') or '').strip().lower()
+    if not mode and url.port == PGBOUNCER_TRANSACTION_PORT:
+        return 'transaction'
+    return mode or None
+
+
+def _statement_name():
+    return f'__asyncpg_{uuid.uuid4()}__'
+
+
+def engine_options(config, uri=None, asynchronous=False):
+    """Engine options for the configured database URL (or uri).
+
+    The result is SQLALCHEMY_ENGINE_OPTIONS for the app; with asynchronous=True
+    it suits create_async_engine (asgi.py), whose pool is not metered.
+    """
+    uri = uri or config.get('SQLALCHEMY_DATABASE_URI')
+    if not uri:
+        return {}
+    url = make_url(uri)
+    if url.get_backend_name() != 'postgresql':
+        return {}
+
+    driver = url.get_driver_name()
+    if driver == 'asyncpg':
+        connect_args = {'timeout': int(config['DB_CONNECT_TIMEOUT'])}
+    else:
+        connect_args = {'connect_timeout': int(config['DB_CONNECT_TIMEOUT'])}
+    if driver == 'psycopg2':
+        connect_args.update(keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=5)
+
+    timeout = int(config['DB_STATEMENT_TIMEOUT_MS'])
+    if pgbouncer_mode(config, url) == 'transaction':
+        if driver == 'psycopg':
+            connect_args['prepare_threshold'] = None
+        elif driver == 'asyncpg':
+            # asyncpg prepares every statement; unique names keep them from
+            # colliding on server connections PgBouncer shares between clients
+            connect_args.update(statement_cache_size=0, prepared_statement_name_func=_statement_name)
+    elif timeout:
+        if driver == 'asyncpg':
+            connect_args['server_settings'] = {'statement_timeout': str(timeout)}
+        else:
+            connect_args['options'] = f'-c statement_timeout={timeout}'
+
+    return {
+        'poolclass': AsyncAdaptedQueuePool if asynchronous else MeteredQueuePool,
+        'pool_size': int(config['DB_POOL_SIZE']),
+        'max_overflow': int(config['DB_MAX_OVERFLOW']),
+        'pool_timeout': float(config['DB_POOL_TIMEOUT']),
+        'pool_recycle': int(config['DB_POOL_RECYCLE']),
+        'pool_pre_ping': _flag(config['DB_POOL_PRE_PING']),
+        'pool_use_lifo': True,
+        'connect_args': connect_args,
+    }
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.wait = metrics.Histogram(WAIT_BUCKETS)
+        self.exhausted = 0     # checkouts that found no idle connection and no overflow left
+        self.timeouts = 0
+        self.connects = 0      # new server connections
+        self.invalidated = 0   # connections found dead (pre-ping) or broken mid-use
+
+    def observe(self, seconds, exhausted):
+        with self._lock:
+            self.wait.observe(seconds)
+            self.exhausted += exhausted
+
+    def count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that times every checkout and counts exhaustion and timeouts"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+        event.listen(self, 'connect', lambda *a: self.stats.count('connects'))
+        event.listen(self, 'invalidate', lambda *a: self.stats.count('invalidated'))
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        exhausted = self._max_overflow > -1 and self.checkedin() == 0 and self.overflow() >= self._max_overflow
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.stats.count('timeouts')
+            raise
+        finally:
+            self.stats.observe(time.perf_counter() - start, exhausted)
+
+
+def snapshot(engine):
+    """Pool gauges and counters as a dict, or None if the pool is not metered"""
+    pool = engine.pool
+    if not isinstance(pool, MeteredQueuePool):
+        return None
+    stats = pool.stats
+    with stats._lock:
+        return {
+            'size': pool.size(),
+            'max_overflow': pool._max_overflow,
+            'checked_out': pool.checkedout(),
+            'idle': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'checkouts': stats.wait.count,
+            'wait_seconds_total': round(stats.wait.sum, 6),
+            'exhausted': stats.exhausted,
+            'timeouts': stats.timeouts,
+            'connects': stats.connects,
+            'invalidated': stats.invalidated,
+        }
+
+
+def render(engine):
+    """Prometheus lines for the pool, in the format of metrics.Registry.render"""
+    state = snapshot(engine)
+    if state is None:
+        return []
+    lines = []
+    for name, key, kind, help_text in [
+        ('auction_db_pool_size', 'size', 'gauge', 'Connections kept open by the pool'),
+        ('auction_db_pool_checked_out', 'checked_out', 'gauge', 'Connections in use'),
+        ('auction_db_pool_idle', 'idle', 'gauge', 'Open connections waiting in the pool'),
+        ('auction_db_pool_overflow', 'overflow', 'gauge', 'Connections open beyond the pool size'),
+        ('auction_db_pool_exhausted_total', 'exhausted', 'counter', 'Checkouts that had to wait for a connection to be returned'),
+        ('auction_db_pool_timeouts_total', 'timeouts', 'counter', 'Checkouts that gave up after DB_POOL_TIMEOUT'),
+        ('auction_db_pool_connects_total', 'connects', 'counter', 'New server connections opened'),
+        ('auction_db_pool_invalidated_total', 'invalidated', 'counter', 'Connections discarded as dead'),
+    ]:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {state[key]}']
+    with engine.pool.stats._lock:
+        lines += metrics.histogram_lines('auction_db_pool_wait_seconds', 'Time spent waiting for a pooled connection',
+                                         [({}, engine.pool.stats.wait)])
+    return lines
+
+
+def warm_up(engine, count):
+    """Open up to count pooled connections now; returns how many were opened"""
+    connections = []
+    try:
+        for _ in range(min(count, engine.pool.size() if isinstance(engine.pool, QueuePool) else count)):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+def init_app(app, db):
+    with app.app_context():
+        engine = db.engine
+        url = engine.url
+        timeout = int(app.config['DB_STATEMENT_TIMEOUT_MS'])
+        if (url.get_backend_name() == 'postgresql' and timeout
+                and pgbouncer_mode(app.config, url) == 'transaction'):
+            @event.listens_for(engine, 'begin')
+            def _statement_timeout(conn):
+                # Startup options don't survive PgBouncer; SET LOCAL ends with the transaction
+                conn.exec_driver_sql(f'SET LOCAL statement_timeout = {timeout}')
+
+        app.extensions['request_metrics'].collectors.append(lambda: render(engine))
+
+        count = int(app.config['DB_POOL_WARMUP'])
+        if count:
+            try:
+                opened = warm_up(engine, count)
+                app.logger.info('Opened %d database connections at startup', opened)
+            except Exception as e:
+                # Requests will connect on demand; don't fail the boot over it
+                app.logger.warning('Database warm-up failed: %s', e)
+
+
+def stats():
+    from models import db
+    return snapshot(db.engine) or {'pool': type(db.engine.pool).__name__, 'metered': False}
@@ -0,0 +1,336 @@
+"""Append-only auction event log with undo and point-in-time state.
+
+Every change to players or teams is recorded as an AuctionEvent in the
+transaction that makes it. `changes` holds only the fields that moved, as
+{'players': {id: [before, after]}, 'teams': {id: [before, after]}}:
+
+    sold, unsold, released   a player's ownership plus the purses it moved
+    team_reset               every released player plus the restored purse
+    purse_set, team_updated  a team's fields (renames include its players' team_name)
+    player_edited            a player's name and stats
+
+Changes too large to describe per row (adding, importing or deleting
+players, adding or deleting teams, resetting the auction) are recorded as
+barrier events without changes. They force a snapshot and cannot be undone.
+
+Snapshots: with the first event (event 0, the state before it), after every
+barrier, and whenever an event id crosses a multiple of
+AUCTION_SNAPSHOT_EVERY, the full player/team state is stored as an
+AuctionSnapshot. state_as_of(N) starts from the nearest snapshot at or
+before N and replays at most that many events. On SQLite and Postgres the
+snapshot is one INSERT ... SELECT that builds the JSON in the database, so
+a barrier adds one statement and loads no rows, however many players there
+are; other databases build it from the ORM.
+
+undo() reverts the latest event that is not an undo and has not been undone
+yet. It locks the event's rows (SELECT ... FOR UPDATE), applies the event's
+`before` values (and keeps TeamAggregate in step) only if the rows still
+hold its `after` values, and records an 'undo' event pointing at it, so two
+concurrent undos cannot both apply it. Repeated calls walk further back.
+
+BidHistory stays the ledger of accepted bids: an undone sale keeps its bid.
+"""
+import copy
+from datetime import datetime
+from flask import current_app, has_app_context
+from sqlalchemy import JSON, Float, String, case, cast, func, insert, literal, literal_column, select, update
+from models import db, Team, Player, AuctionEvent, AuctionSnapshot
+from player_data import PLAYER_CLASSES, STAT_FIELDS
+import aggregates
+import loaders
+
+DEFAULT_SNAPSHOT_EVERY = 100
+
+PLAYER_FIELDS = ['name', 'type', 'player_number', 'base_price',
+                 'status', 'selling_price', 'team_id', 'team_name']
+TEAM_FIELDS = ['name', 'owner_name', 'purse']
+OWNERSHIP = ['status', 'selling_price', 'team_id', 'team_name']
+
+UNDOABLE = {'sold', 'unsold', 'released', 'team_reset', 'purse_set', 'team_updated', 'player_edited'}
+BARRIERS = {'player_added', 'players_imported', 'player_deleted', 'team_added', 'team_deleted', 'auction_reset'}
+
+
+class UndoRefused(RuntimeError):
+    """The latest event cannot be undone (a barrier, or its rows changed since)"""
+
+
+def snapshot_every():
+    if has_app_context():
+        return int(current_app.config.get('AUCTION_SNAPSHOT_EVERY') or DEFAULT_SNAPSHOT_EVERY)
+    return DEFAULT_SNAPSHOT_EVERY
+
+
+def player_state(player):
+    """A player's logged fields: the base columns plus its type's stats"""
+    state = {field: getattr(player, field) for field in PLAYER_FIELDS}
+    for field, _ in STAT_FIELDS.get(player.type, []):
+        state[field] = getattr(player, field, None)
+    return state
+
+
+def team_state(team):
+    return {field: getattr(team, field) for field in TEAM_FIELDS}
+
+
+def diff(before, after):
+    """[changed before, changed after] of two states, or None if nothing changed"""
+    if before is None or after is None:
+        return [before, after]
+    changed = [field for field in after if before.get(field) != after[field]]
+    if not changed:
+        return None
+    return [{field: before.get(field) for field in changed}, {field: after[field] for field in changed}]
+
+
+def changes_of(players=None, teams=None):
+    """Build an event's changes from {id: (before, after)} full states"""
+    changes = {}
+    for kind, entities in (('players', players), ('teams', teams)):
+        for entity_id, (before, after) in (entities or {}).items():
+            pair = diff(before, after)
+            if pair is not None:
+                changes.setdefault(kind, {})[str(entity_id)] = pair
+    return changes
+
+
+def record(event_type, players=None, teams=None, reverts=None):
+    """Add an event to the current transaction; the caller commits"""
+    changes = changes_of(players, teams)
+    event = AuctionEvent(type=event_type, changes=changes, reverts=reverts)
+    db.session.add(event)
+    db.session.flush()
+    write_snapshots(db.session, event.id, event.id, [changes], snapshot_every())
+    return event
+
+
+def barrier(event_type):
+    """Record a change without per-row detail; the snapshot after it stands in"""
+    event = AuctionEvent(type=event_type, changes={})
+    db.session.add(event)
+    db.session.flush()
+    write_snapshots(db.session, event.id, event.id, [{}], snapshot_every(), force=True)
+    return event
+
+
+def current_state(session):
+    """Every player and team as {'players': {id: state}, 'teams': {id: state}}"""
+    return {
+        'players': {str(p.id): player_state(p) for p in session.query(loaders.polymorphic_player())},
+        'teams': {str(t.id): team_state(t) for t in session.query(Team)},
+    }
+
+
+# JSON construction per dialect: (object, object aggregate, as JSON value)
+_JSON_FUNCTIONS = {
+    'sqlite': (func.json_object, func.json_group_object, func.json),
+    'postgresql': (func.json_build_object, func.json_object_agg, lambda value: value),
+}
+
+
+def _state_sql(dialect):
+    """current_state() as a SQL expression, or None if the dialect has no JSON functions"""
+    if dialect not in _JSON_FUNCTIONS:
+        return None
+    json_object, json_agg, as_json = _JSON_FUNCTIONS[dialect]
+
+    def value(column):
+        # SQLite writes REALs with 15 significant digits; 17 round-trip
+        if dialect == 'sqlite' and isinstance(column.type, Float):
+            return case((column.is_(None), None), else_=func.json(func.printf('%!.17g', column)))
+        return column
+
+    def obj(columns):
+        return json_object(*[part for key, column in columns
+                             for part in (literal_column(f"'{key}'"), value(column))])
+
+    def agg(key, value, from_):
+        # An empty table aggregates to NULL on Postgres
+        return func.coalesce(select(json_agg(cast(key, String), value)).select_from(from_).scalar_subquery(),
+                             as_json(cast(literal('{}'), JSON)) if dialect == 'postgresql' else func.json('{}'))
+
+    poly = loaders.polymorphic_player()
+    base = [(field, getattr(poly, field)) for field in PLAYER_FIELDS]
+    player = case(*[
+        (poly.type == category,
+         obj(base + [(field, getattr(getattr(poly, PLAYER_CLASSES[category].__name__), field))
+                     for field, _ in fields]))
+        for category, fields in STAT_FIELDS.items()
+    ], else_=obj(base))
+    team = obj([(field, getattr(Team, field)) for field in TEAM_FIELDS])
+    return obj([('players', as_json(agg(poly.id, as_json(player), poly))),
+                ('teams', as_json(agg(Team.id, team, Team)))])
+
+
+def _insert_snapshot(session, event_id):
+    state = _state_sql(session.get_bind().dialect.name)
+    if state is None:
+        session.execute(insert(AuctionSnapshot.__table__).values(event_id=event_id, state=current_state(session)))
+        return
+    session.execute(insert(AuctionSnapshot.__table__).from_select(
+        ['event_id', 'created_at', 'state'], select(literal(event_id), literal(datetime.utcnow()), state)))
+
+
+def write_snapshots(session, first_id, last_id, changes, every, force=False):
+    """Store the snapshots due after events first_id..last_id (with their changes) were recorded"""
+    due = force or last_id // every > (first_id - 1) // every
+    if first_id == 1 and not session.get(AuctionSnapshot, 0):
+        # The state before the log began, so history reaches back to event 1:
+        # the current state with the first events' changes taken back out
+        _insert_snapshot(session, 0)
+        if any(changes):
+            baseline = session.scalar(select(AuctionSnapshot.state).where(AuctionSnapshot.event_id == 0))
+            for event_changes in reversed(changes):
+                apply_changes(baseline, event_changes, 0)
+            session.execute(update(AuctionSnapshot.__table__).where(AuctionSnapshot.event_id == 0)
+                            .values(state=baseline))
+    if due:
+        _insert_snapshot(session, last_id)
+
+
+def apply_changes(state, changes, side):
+    """Apply an event's after (side=1) or before (side=0) values to a state dict"""
+    for kind, entities in changes.items():
+        rows = state[kind]
+        for key, pair in entities.items():
+            values = pair[side]
+            if values is None:
+                rows.pop(key, None)
+            else:
+                rows.setdefault(key, {}).update(values)
+
+
+def state_as_of(event_id=None, at=None, snapshots=True):
+    """Player and team state right after event_id (or the last event at or before `at`).
+
+    With snapshots=False only the baseline and barrier snapshots are used,
+    i.e. everything since the last barrier is replayed (for benchmarking).
+    Raises LookupError if the log does not reach that far.
+    """
+    if at is not None:
+        event_id = db.session.scalar(select(func.max(AuctionEvent.id)).where(AuctionEvent.created_at <= at))
+        if event_id is None:
+            raise LookupError(f'No events at or before {at.isoformat()}')
+    elif event_id is None:
+        event_id = db.session.scalar(select(func.max(AuctionEvent.id))) or 0
+
+    query = select(AuctionSnapshot).where(AuctionSnapshot.event_id <= event_id)
+    if not snapshots:
+        barriers = select(AuctionEvent.id).where(AuctionEvent.type.in_(BARRIERS))
+        query = query.where((AuctionSnapshot.event_id == 0) | AuctionSnapshot.event_id.in_(barriers))
+    snapshot = db.session.scalar(query.order_by(AuctionSnapshot.event_id.desc()).limit(1))
+    if snapshot is None:
+        raise LookupError(f'No snapshot at or before event {event_id}')
+
+    state = copy.deepcopy(snapshot.state)
+    replayed = db.session.execute(
+        select(AuctionEvent.changes)
+        .where(AuctionEvent.id > snapshot.event_id, AuctionEvent.id <= event_id)
+        .order_by(AuctionEvent.id)
+    ).scalars().all()
+    for changes in replayed:
+        apply_changes(state, changes, 1)
+    state.update(event_id=event_id, snapshot_event_id=snapshot.event_id, replayed=len(replayed))
+    return state
+
+
+def rebuild_snapshots(every):
+    """Replace the periodic snapshots with one every `every` events, replayed from the log.
+
+    The baseline and barrier snapshots are kept: barriers carry no changes to
+    replay. The caller commits. Returns the number of snapshots written.
+    """
+    kept = {s.event_id: s for s in AuctionSnapshot.query.filter(
+        (AuctionSnapshot.event_id == 0) |
+        AuctionSnapshot.event_id.in_(select(AuctionEvent.id).where(AuctionEvent.type.in_(BARRIERS))))}
+    if 0 not in kept:
+        raise LookupError('No baseline snapshot to replay from')
+    AuctionSnapshot.query.filter(AuctionSnapshot.event_id.not_in(list(kept))).delete(synchronize_session=False)
+
+    state = copy.deepcopy(kept[0].state)
+    rows = []
+    for event_id, changes in db.session.execute(
+            select(AuctionEvent.id, AuctionEvent.changes).order_by(AuctionEvent.id)):
+        if event_id in kept:
+            state = copy.deepcopy(kept[event_id].state)
+            continue
+        apply_changes(state, changes, 1)
+        if event_id % every == 0:
+            rows.append({'event_id': event_id, 'state': copy.deepcopy(state)})
+    if rows:
+        db.session.execute(insert(AuctionSnapshot.__table__), rows)
+    return len(rows)
+
+
+def to_dict(event):
+    return {
+        'id': event.id,
+        'type': event.type,
+        'changes': event.changes,
+        'reverts': event.reverts,
+        'created_at': event.created_at.isoformat(),
+    }
+
+
+def events(after=0, limit=100):
+    return (AuctionEvent.query.filter(AuctionEvent.id > after)
+            .order_by(AuctionEvent.id).limit(limit).all())
+
+
+def _restore_player(player, values):
+    # Take the player's contribution out of its team and put the restored one back
+    if player.team_id:
+        aggregates.apply(player.team_id, player, -1)
+    for field, value in values.items():
+        setattr(player, field, value)
+        if field == 'name' and hasattr(player, 'player_name'):
+            player.player_name = value
+    if player.team_id:
+        aggregates.apply(player.team_id, player, 1)
+
+
+def undo():
+    """Revert the latest not-yet-undone event; the caller commits. Returns (undone, undo event)."""
+    undone = select(AuctionEvent.reverts).where(AuctionEvent.reverts.isnot(None))
+    target = (AuctionEvent.query
+              .filter(AuctionEvent.type != 'undo', AuctionEvent.id.not_in(undone))
+              .order_by(AuctionEvent.id.desc()).first())
+    if target is None:
+        raise LookupError('Nothing to undo')
+    if target.type not in UNDOABLE:
+        raise UndoRefused(f'Cannot undo {target.type} (event {target.id})')
+
+    players = target.changes.get('players', {})
+    teams = target.changes.get('teams', {})
+    rows = {'players': {}, 'teams': {}}
+    # Locked until commit, players first as settlement.py takes them, so a
+    # concurrent undo (or sale) waits here and then sees the new values
+    if players:
+        poly = loaders.polymorphic_player()
+        for player in (db.session.query(poly).filter(poly.id.in_([int(key) for key in players]))
+                       .with_for_update(of=Player).populate_existing()):
+            rows['players'][str(player.id)] = player
+    if teams:
+        for team in (Team.query.filter(Team.id.in_([int(key) for key in teams]))
+                     .with_for_update().populate_existing()):
+            rows['teams'][str(team.id)] = team
+
+    for kind, entities in (('players', players), ('teams', teams)):
+        for key, (_, after) in entities.items():
+            row = rows[kind].get(key)
+            if row is None or any(getattr(row, field) != value for field, value in after.items()):
+                raise UndoRefused(f'Cannot undo {target.type} (event {target.id}): '
+                                  f'{kind[:-1]} {key} has changed since')
+
+    for key, (before, _) in teams.items():
+        for field, value in before.items():
+            setattr(rows['teams'][key], field, value)
+    for key, (before, _) in players.items():
+        _restore_player(rows['players'][key], before)
+
+    reverse = {kind: {key: [after, before] for key, (before, after) in entities.items()}
+               for kind, entities in target.changes.items()}
+    event = AuctionEvent(type='undo', changes=reverse, reverts=target.id)
+    db.session.add(event)
+    db.session.flush()
+    write_snapshots(db.session, event.id, event.id, [reverse], snapshot_every())
+    return target, event
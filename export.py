@@ -0,0 +1,199 @@
+"""Streaming export of the auction results as CSV, XLSX or Parquet.
+
+Two tables:
+
+    ledger  one row per player: team, status, prices and stats. Sold
+            players come grouped by team, followed by the unsold and
+            untouched ones
+    teams   one row per team: purse left, squad size and the money spent
+            per category and overall, as on the team page
+
+Ledger rows are read through a server-side cursor (yield_per, batch_size
+rows at a time) as column tuples, never ORM objects, and each batch is
+written out before the next is fetched, so memory stays flat however many
+players there are. CSV and Parquet (one row group per batch) chunks are
+yielded as each batch is written. An XLSX workbook only makes sense once
+complete, so it is built in openpyxl's write-only mode (rows go to
+temporary files; only the table of distinct strings stays in memory),
+saved to a temporary file and streamed from there. XLSX holds both tables
+as sheets; CSV and Parquet hold one.
+
+Parquet needs `pip install pyarrow`. Used by GET /api/export and
+`flask export-auction`.
+"""
+import csv
+import io
+import os
+import tempfile
+from sqlalchemy import select
+from models import db, Team
+from loaders import polymorphic_player, stat_column, load_team_summaries, PLAYER_CATEGORIES
+import aggregates
+
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', '.csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', '.xlsx'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+}
+DEFAULT_BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+
+STATS = [('matches', int), ('runs', int), ('average', float), ('strike_rate', float),
+         ('highest_score', int), ('fifties', int), ('hundreds', int), ('wickets', int),
+         ('economy', float), ('best_bowling', str)]
+
+LEDGER_COLUMNS = [('team', str), ('status', str), ('player_id', int), ('player_number', int),
+                  ('name', str), ('type', str), ('base_price', float), ('selling_price', float),
+                  *STATS]
+
+TEAM_COLUMNS = [('team', str), ('owner_name', str), ('purse', float), ('players', int),
+                *[(f'{cat}_count', int) for cat in PLAYER_CATEGORIES],
+                *[(f'spent_{cat}', float) for cat in PLAYER_CATEGORIES],
+                ('spent_overall', float)]
+
+
+def detect_format(filename):
+    ext = os.path.splitext(filename or '')[1].lower()
+    for fmt, (_, extension) in FORMATS.items():
+        if ext == extension:
+            return fmt
+    raise ValueError(f'Unsupported file type: {filename!r} (expected .csv, .xlsx or .parquet)')
+
+
+def ledger_statement():
+    poly = polymorphic_player()
+    return (
+        select(Team.name, poly.status, poly.id, poly.player_number, poly.name, poly.type,
+               poly.base_price, poly.selling_price,
+               *[stat_column(poly, stat).label(stat) for stat, _ in STATS])
+        .select_from(poly)
+        .outerjoin(Team, poly.team_id == Team.id)
+        .order_by(Team.name.asc().nulls_last(), poly.status, poly.player_number, poly.id)
+    )
+
+
+def ledger_batches(batch_size=DEFAULT_BATCH_SIZE):
+    """Lists of ledger row tuples, at most batch_size each"""
+    result = db.session.execute(ledger_statement().execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield [tuple(row) for row in partition]
+
+
+def team_batches(batch_size=DEFAULT_BATCH_SIZE):
+    """Team totals rows; there are few teams, so a single batch"""
+    teams = sorted(load_team_summaries(), key=lambda team: team.name)
+    rows = []
+    for team in teams:
+        totals = aggregates.totals(team.aggregate)
+        counts = [totals[f'{cat}_count'] for cat in PLAYER_CATEGORIES]
+        spent = aggregates.spent(totals)
+        rows.append((team.name, team.owner_name, team.purse, sum(counts), *counts,
+                     *[spent[cat] for cat in PLAYER_CATEGORIES], spent['overall']))
+    yield rows
+
+
+TABLES = {
+    'ledger': (LEDGER_COLUMNS, ledger_batches),
+    'teams': (TEAM_COLUMNS, team_batches),
+}
+
+
+class _Chunks:
+    """Write-only file for pyarrow that hands back what was written since the last drain()"""
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _csv(table, batch_size):
+    columns, batches = TABLES[table]
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow([name for name, _ in columns])
+    for batch in batches(batch_size):
+        writer.writerows(batch)
+        yield text.getvalue().encode()
+        text.seek(0)
+        text.truncate()
+
+
+def _parquet(table, batch_size):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {int: pa.int64(), float: pa.float64(), str: pa.string()}
+    columns, batches = TABLES[table]
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    sink = _Chunks()
+    writer = pq.ParquetWriter(sink, schema)
+    for batch in batches(batch_size):
+        if batch:
+            arrays = [pa.array(values, field.type) for values, field in zip(zip(*batch), schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def _xlsx(tables, batch_size):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for table in tables:
+        columns, batches = TABLES[table]
+        sheet = workbook.create_sheet(table.capitalize())
+        sheet.append([name for name, _ in columns])
+        for batch in batches(batch_size):
+            for row in batch:
+                sheet.append(row)
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        while chunk := f.read(CHUNK_SIZE):
+            yield chunk
+
+
+def stream(fmt, table=None, batch_size=DEFAULT_BATCH_SIZE):
+    """The export as an iterator of byte chunks.
+
+    table is 'ledger' (the default for CSV and Parquet) or 'teams'; XLSX
+    without a table holds both. Raises ValueError for an unknown format or
+    table, and ImportError for Parquet without pyarrow, before anything is
+    read.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'Invalid format {fmt!r} (expected one of {", ".join(FORMATS)})')
+    if table is not None and table not in TABLES:
+        raise ValueError(f'Invalid table {table!r} (expected one of {", ".join(TABLES)})')
+    if fmt == 'xlsx':
+        return _xlsx([table] if table else list(TABLES), batch_size)
+    if fmt == 'parquet':
+        import pyarrow.parquet  # noqa: F401 -- fail before the response starts
+        return _parquet(table or 'ledger', batch_size)
+    return _csv(table or 'ledger', batch_size)
+
+
+def filename(fmt, table=None):
+    return f"auction-{table or ('results' if fmt == 'xlsx' else 'ledger')}{FORMATS[fmt][1]}"
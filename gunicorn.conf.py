@@ -0,0 +1,72 @@
+"""gunicorn settings for production: `gunicorn -c gunicorn.conf.py`
+
+The app is loaded once in the master and the workers are forked from it
+(see wsgi.py). Workers and threads follow the machine unless set:
+
+- WEB_CONCURRENCY workers, default 2 per usable core + 1, capped so that
+  every worker's pool (DB_POOL_SIZE + DB_MAX_OVERFLOW) fits in
+  DB_MAX_CONNECTIONS when that is set. AUCTION_STATE=memory always runs
+  one worker, since only one process may own the state.
+- GUNICORN_THREADS threads per gthread worker. Every open page holds a
+  thread for its live stream (live.py), so the default is REQUEST_THREADS
+  (8) for page loads, bids and API calls plus AUCTION_SCREENS for streams:
+  16 in memory mode, where the one worker serves every franchise screen and
+  the projector, else 4 per worker. AUCTION_EVENTS_MAX_CLIENTS defaults to
+  the threads beyond REQUEST_THREADS (at least half of them), so extra
+  screens are refused (and retry) instead of freezing the writes. For hundreds of spectators serve
+  asgi.py, which holds streams without threads.
+- PORT to listen on (default 8000).
+"""
+import os
+import db_pool
+import wsgi
+
+
+REQUEST_THREADS = 8
+
+
+def _setting(key):
+    return int(os.environ.get(key) or db_pool.DEFAULTS[key])
+
+
+def _memory():
+    return (os.environ.get('AUCTION_STATE') or 'database') == 'memory'
+
+
+def _workers():
+    if _memory():
+        return 1
+    count = int(os.environ.get('WEB_CONCURRENCY') or len(os.sched_getaffinity(0)) * 2 + 1)
+    if os.environ.get('DB_MAX_CONNECTIONS'):
+        per_worker = _setting('DB_POOL_SIZE') + _setting('DB_MAX_OVERFLOW')
+        count = min(count, int(os.environ['DB_MAX_CONNECTIONS']) // per_worker)
+    return max(count, 1)
+
+
+wsgi_app = 'wsgi:create_app()'
+preload_app = True
+worker_class = 'gthread'
+workers = _workers()
+threads = int(os.environ.get('GUNICORN_THREADS')
+              or REQUEST_THREADS + int(os.environ.get('AUCTION_SCREENS') or (16 if _memory() else 4)))
+bind = f"0.0.0.0:{os.environ.get('PORT') or 8000}"
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+accesslog = '-'
+
+# Warm each worker's pool after the fork, not the master's (which is closed before forking)
+_warm_up = _setting('DB_POOL_WARMUP')
+os.environ['DB_POOL_WARMUP'] = '0'
+
+
+def pre_fork(server, worker):
+    wsgi.before_fork()
+
+
+def post_fork(server, worker):
+    # The final thread count, after any --threads on the command line
+    streams = None
+    if not os.environ.get('AUCTION_EVENTS_MAX_CLIENTS'):
+        streams = max(server.cfg.threads - REQUEST_THREADS, server.cfg.threads // 2)
+    wsgi.after_fork(_warm_up, max_streams=streams)
@@ -0,0 +1,142 @@
+"""Bulk player import from CSV or XLSX for pre-auction roster loading.
+
+Rows are streamed from the file (csv reader / openpyxl read-only mode), run
+through the same validation as /add-player, and inserted in batches: one
+allocator call per category for ids and numbers, then one executemany INSERT
+per category into each table the player type is stored in (`player`, plus
+its subclass table in the joined layout), committed once per batch.
+
+Used by the `flask import-players` command and POST /api/players/bulk.
+"""
+import csv
+import io
+import os
+from sqlalchemy import insert
+from models import db
+from player_data import parse_player, PLAYER_CLASSES
+import allocator
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def detect_format(filename):
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext in ('.xlsx', '.xlsm'):
+        return 'xlsx'
+    if ext == '.csv':
+        return 'csv'
+    raise ValueError(f'Unsupported file type: {filename!r} (expected .csv or .xlsx)')
+
+
+def _normalize(row):
+    # Header names are matched case-insensitively; cells are stripped
+    clean = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+        clean[str(key).strip().lower()] = value
+    return clean
+
+
+def iter_csv_rows(stream):
+    """Yield (row_number, row) from a binary or text CSV stream"""
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, _normalize(row)
+
+
+def iter_xlsx_rows(stream):
+    """Yield (row_number, row) from the first sheet of a workbook"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        for row_number, values in enumerate(rows, start=2):
+            if all(value is None for value in values):
+                continue
+            yield row_number, _normalize(dict(zip(header, values)))
+    finally:
+        workbook.close()
+
+
+def iter_rows(stream, fmt):
+    if fmt == 'xlsx':
+        return iter_xlsx_rows(stream)
+    return iter_csv_rows(stream)
+
+
+def insert_players(rows):
+    """Executemany INSERT of full player rows (base columns, stats and 'type').
+
+    Each category's rows go to every table its model is mapped to, so this
+    works for both storage layouts (see models.PLAYER_STORAGE). Rows of one
+    category must share the same keys. Does not commit.
+    """
+    by_category = {}
+    for row in rows:
+        by_category.setdefault(row['type'], []).append(row)
+
+    for category, category_rows in by_category.items():
+        for table in PLAYER_CLASSES[category].__mapper__.tables:
+            columns = set(table.c.keys())
+            db.session.execute(insert(table), [
+                {k: v for k, v in row.items() if k in columns} for row in category_rows
+            ])
+
+
+def _insert_batch(batch):
+    """Allocate and insert one batch of validated rows in a single transaction"""
+    by_category = {}
+    for category, fields in batch:
+        by_category.setdefault(category, []).append(fields)
+
+    ids = iter(allocator.next_player_ids(len(batch)))
+    rows = []
+    for category, category_rows in by_category.items():
+        numbers = allocator.next_player_numbers(category, len(category_rows))
+        for fields, number in zip(category_rows, numbers):
+            rows.append(dict(fields, id=next(ids), player_number=number, type=category))
+
+    insert_players(rows)
+    db.session.commit()
+
+
+def import_players(rows, batch_size=DEFAULT_BATCH_SIZE):
+    """Validate and insert (row_number, row) pairs; returns a per-row report.
+
+    Invalid rows are reported and skipped. If a batch fails to insert, every
+    row in it is reported with the database error and later batches still run.
+    """
+    report = {'created': 0, 'errors': []}
+    batch = []
+    batch_rows = []
+
+    def flush():
+        try:
+            _insert_batch(batch)
+            report['created'] += len(batch)
+        except Exception as e:
+            db.session.rollback()
+            report['errors'].extend({'row': n, 'error': str(e)} for n in batch_rows)
+        batch.clear()
+        batch_rows.clear()
+
+    for row_number, row in rows:
+        try:
+            batch.append(parse_player(row))
+            batch_rows.append(row_number)
+        except ValueError as e:
+            report['errors'].append({'row': row_number, 'error': str(e)})
+            continue
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+    return report
@@ -0,0 +1,245 @@
+"""Server-Sent Events feed of auction changes.
+
+Write endpoints call publish() once their transaction has committed. Every
+open page keeps an EventSource on /api/events and patches its DOM from the
+delta (static/js/live.js) instead of calling location.reload().
+
+Messages travel through a pluggable fan-out backend so clients attached to
+any gunicorn worker see writes made on any other:
+
+- LocalBackend delivers in-process. It is used for the dev server, a single
+  worker, and as the stand-in when testing without Redis.
+- RedisBackend relays through Redis pub/sub (AUCTION_EVENTS_BACKEND=redis,
+  AUCTION_EVENTS_URL=redis://...). It needs the optional `redis` package.
+
+Scaling spectators: under a WSGI server a stream holds one server thread for
+as long as its page is open, so every open screen costs a thread, and writes
+and JSON requests only get the threads left over. gunicorn.conf.py sizes the
+gthread pool for the expected screens. For hundreds of spectators serve the
+app through asgi.py, where streams wait on the event loop (astream()) and
+hold no thread. AUCTION_EVENTS_MAX_CLIENTS caps the streams per process
+(0 = no cap); past it /api/events answers 503 and the page stays as rendered,
+retrying every RETRY_REFUSED_SECONDS, instead of a stream taking the thread a
+bid needs.
+"""
+import asyncio
+import json
+import queue
+import threading
+from flask import Response, current_app
+import aggregates
+
+
+class LocalBackend:
+    """Fan-out within this process only"""
+
+    def __init__(self, url=None):
+        self._callbacks = []
+
+    def subscribe(self, callback):
+        self._callbacks.append(callback)
+
+    def publish(self, message):
+        for callback in list(self._callbacks):
+            callback(message)
+
+
+class RedisBackend:
+    """Fan-out across workers and hosts through a Redis pub/sub channel"""
+
+    def __init__(self, url, channel='ipl-auction-events'):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._channel = channel
+
+    def subscribe(self, callback):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self._channel)
+
+        def relay():
+            for item in pubsub.listen():
+                data = item['data']
+                callback(data.decode() if isinstance(data, bytes) else data)
+
+        threading.Thread(target=relay, name='auction-events-redis', daemon=True).start()
+
+    def publish(self, message):
+        self._redis.publish(self._channel, message)
+
+
+BACKENDS = {'local': LocalBackend, 'redis': RedisBackend}
+
+# Sent to a client whose queue overflowed: it missed deltas and must re-render
+RESYNC = json.dumps({'type': 'resync', 'reload': True})
+RETRY_REFUSED_SECONDS = 30
+
+
+class TooManyClients(Exception):
+    """The broker already streams to max_clients pages"""
+
+
+def _offer(client, message):
+    try:
+        client.put_nowait(message)
+    except queue.Full:
+        with client.mutex:
+            client.queue.clear()
+        client.put_nowait(RESYNC)
+
+
+def _offer_async(client, message):
+    try:
+        client.put_nowait(message)
+    except asyncio.QueueFull:
+        while not client.empty():
+            client.get_nowait()
+        client.put_nowait(RESYNC)
+
+
+class Broker:
+    """Per-process hub that feeds every connected SSE client from the backend"""
+
+    def __init__(self, backend=None, queue_size=256, keepalive=15, max_clients=0):
+        self.backend = backend or LocalBackend()
+        self.queue_size = queue_size
+        self.keepalive = keepalive
+        self.max_clients = max_clients
+        self.refused = 0
+        self._clients = set()  # one delivery callable per client
+        self._lock = threading.Lock()
+        self.backend.subscribe(self._dispatch)
+
+    @property
+    def client_count(self):
+        return len(self._clients)
+
+    def _dispatch(self, message):
+        with self._lock:
+            clients = list(self._clients)
+        for deliver in clients:
+            deliver(message)
+
+    def _admit(self):
+        # Checked before the stream starts; a burst of connects can overshoot
+        # by a few, but a refused client never registers anything to clean up
+        if self.max_clients and len(self._clients) >= self.max_clients:
+            self.refused += 1
+            raise TooManyClients()
+
+    def publish(self, event_type, **payload):
+        self.backend.publish(json.dumps({'type': event_type, **payload}))
+
+    def stream(self):
+        """SSE frames for one client on a server thread; raises TooManyClients when full"""
+        self._admit()
+        return self._frames()
+
+    def _frames(self):
+        client = queue.Queue(self.queue_size)
+
+        def deliver(message):
+            _offer(client, message)
+
+        with self._lock:
+            self._clients.add(deliver)
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    message = client.get(timeout=self.keepalive)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f'data: {message}\n\n'
+        finally:
+            with self._lock:
+                self._clients.discard(deliver)
+
+    def astream(self):
+        """The same frames for a client on an event loop (asgi.py), holding no thread"""
+        self._admit()
+        return self._aframes(asyncio.get_running_loop())
+
+    async def _aframes(self, loop):
+        client = asyncio.Queue(self.queue_size)
+
+        def deliver(message):
+            # Called on whichever thread published; hand the message to the loop
+            try:
+                loop.call_soon_threadsafe(_offer_async, client, message)
+            except RuntimeError:
+                pass  # the loop has shut down
+
+        with self._lock:
+            self._clients.add(deliver)
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    message = await asyncio.wait_for(client.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f'data: {message}\n\n'
+        finally:
+            with self._lock:
+                self._clients.discard(deliver)
+
+
+def init_app(app):
+    name = app.config.get('AUCTION_EVENTS_BACKEND') or 'local'
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown AUCTION_EVENTS_BACKEND {name!r}; expected one of {sorted(BACKENDS)}')
+    backend = BACKENDS[name](app.config.get('AUCTION_EVENTS_URL'))
+    app.extensions['auction_live'] = Broker(backend, max_clients=int(app.config.get('AUCTION_EVENTS_MAX_CLIENTS') or 0))
+
+
+def broker():
+    return current_app.extensions['auction_live']
+
+
+def publish(event_type, **payload):
+    """Send a delta to every open page. Call only after the write has committed."""
+    try:
+        broker().publish(event_type, **payload)
+    except Exception:
+        # The write itself succeeded; a lost event only costs clients a refresh.
+        current_app.logger.exception('Failed to publish %s event', event_type)
+
+
+HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no', # don't let nginx buffer the stream
+}
+
+
+def refused_response():
+    return Response('Too many live clients\n', 503, mimetype='text/plain',
+                    headers={'Retry-After': str(RETRY_REFUSED_SECONDS)})
+
+
+def response():
+    try:
+        frames = broker().stream()
+    except TooManyClients:
+        return refused_response()
+    return Response(frames, mimetype='text/event-stream', headers=HEADERS)
+
+
+def player_payload(player):
+    data = player.to_dict()
+    data['team_id'] = player.team_id
+    return data
+
+
+def team_payload(team):
+    spent = aggregates.spent(aggregates.totals(team.aggregate))
+    return {
+        'id': team.id,
+        'name': team.name,
+        'owner_name': team.owner_name,
+        'purse': team.purse,
+        'stats': team.stats,
+        'spent': spent,
+    }
@@ -0,0 +1,84 @@
+"""Eager-loading queries used by the auction pages.
+
+Player rows are fetched together with every subclass table (a single LEFT
+OUTER JOIN across Batsman/Bowler/WicketKeeper/AllRounder) and their team, so
+templates calling player.to_dict(), player.stats or player.team.name never
+fall back to per-row lazy loads.
+"""
+from sqlalchemy import func, select
+from sqlalchemy.orm import with_polymorphic, joinedload, selectinload
+from models import db, Team, Player, Batsman, Bowler, WicketKeeper, AllRounder
+from player_data import PLAYER_CLASSES
+
+PLAYER_CATEGORIES = ['batsmen', 'bowlers', 'wicketkeepers', 'allrounders']
+
+
+def polymorphic_player():
+    """Player entity that loads all subclass columns in the same SELECT"""
+    return with_polymorphic(Player, [Batsman, Bowler, WicketKeeper, AllRounder])
+
+
+def stat_column(poly, stat):
+    """A stat of a polymorphic_player(), for column-only SELECTs"""
+    # A stat lives on several subclass tables in the joined layout
+    columns = [getattr(getattr(poly, model.__name__), stat)
+               for model in PLAYER_CLASSES.values() if hasattr(model, stat)]
+    return func.coalesce(*columns) if len(columns) > 1 else columns[0]
+
+
+# The statements below are shared with the async read path (asgi.py), so both
+# serve the pages from exactly the same queries
+
+def players_statement():
+    poly = polymorphic_player()
+    return select(poly).options(joinedload(poly.team))
+
+
+def teams_statement():
+    # selectin keeps it at one extra query for the whole roster, and the
+    # players' many-to-one back to team resolves from the identity map.
+    poly = polymorphic_player()
+    return select(Team).options(
+        selectinload(Team.all_players.of_type(poly)),
+        joinedload(Team.aggregate)
+    )
+
+
+def team_summaries_statement():
+    return select(Team).options(joinedload(Team.aggregate))
+
+
+def team_statement(team_name):
+    return teams_statement().filter_by(name=team_name).limit(1)
+
+
+def load_players():
+    """All players with subclass columns and team, in one query"""
+    return db.session.scalars(players_statement()).unique().all()
+
+
+def group_by_category(players):
+    """Group players into the category dict the templates expect, sorted by number"""
+    grouped = {cat: [] for cat in PLAYER_CATEGORIES}
+    for player in players:
+        if player.category in grouped:
+            grouped[player.category].append(player)
+
+    for cat in grouped:
+        grouped[cat].sort(key=lambda x: x.player_number or 0)
+    return grouped
+
+
+def load_teams():
+    """All teams with their full (polymorphic) rosters: two queries in total"""
+    return db.session.scalars(teams_statement()).unique().all()
+
+
+def load_team_summaries():
+    """All teams with their aggregate row but no roster, for counts-only views"""
+    return db.session.scalars(team_summaries_statement()).unique().all()
+
+
+def load_team(team_name):
+    """Single team by name with its roster preloaded, or None"""
+    return db.session.scalars(team_statement(team_name)).unique().first()
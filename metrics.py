@@ -0,0 +1,196 @@
+"""Per-request performance instrumentation.
+
+For every request this records wall time, the number of SQL statements and
+the time spent in them (engine cursor events), Jinja render time (template
+signals) and response size, then:
+
+- adds a Server-Timing header (total;dur=, db;dur=;desc="N queries",
+  render;dur=) so browser dev tools show the breakdown per page
+- accumulates per-endpoint histograms and counters served by /metrics in
+  the Prometheus text format
+- logs requests slower than SLOW_REQUEST_MS at WARNING, with the slowest
+  SQL statements they ran
+
+Metrics are kept per process; with several gunicorn workers each scrape
+sees the worker that answered it.
+"""
+import threading
+import time
+from flask import (current_app, g, has_request_context, request,
+                   template_rendered, before_render_template)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_SLOW_REQUEST_MS = 500
+# Statements kept per request for the slow log
+SLOW_LOG_STATEMENTS = 10
+
+
+class RequestStats:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.statements = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.queries = []  # (seconds, sql), only the slowest few are logged
+        self._render_starts = []
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Registry:
+    """Per-endpoint latency histograms and totals"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}      # (endpoint, method, status) -> Histogram
+        self.db_latency = {}   # endpoint -> Histogram
+        self.totals = {}       # endpoint -> {'statements', 'db_seconds', 'render_seconds', 'bytes'}
+        self.collectors = []   # callables returning extra exposition lines (e.g. db_pool.render)
+
+    def record(self, endpoint, method, status, wall, stats, size):
+        with self._lock:
+            key = (endpoint, method, str(status))
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(wall)
+            self.db_latency.setdefault(endpoint, Histogram(LATENCY_BUCKETS)).observe(stats.db_time)
+            totals = self.totals.setdefault(endpoint, dict.fromkeys(
+                ['statements', 'db_seconds', 'render_seconds', 'bytes'], 0))
+            totals['statements'] += stats.statements
+            totals['db_seconds'] += stats.db_time
+            totals['render_seconds'] += stats.render_time
+            totals['bytes'] += size or 0
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            lines += histogram_lines('auction_request_duration_seconds', 'Request wall time',
+                                [(dict(endpoint=e, method=m, status=s), h)
+                                 for (e, m, s), h in sorted(self.latency.items())])
+            lines += histogram_lines('auction_request_db_seconds', 'Time spent in SQL per request',
+                                [(dict(endpoint=e), h) for e, h in sorted(self.db_latency.items())])
+            for name, field, help_text in [
+                ('auction_db_statements_total', 'statements', 'SQL statements executed'),
+                ('auction_render_seconds_total', 'render_seconds', 'Jinja render time'),
+                ('auction_response_bytes_total', 'bytes', 'Response body bytes'),
+            ]:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} counter')
+                for endpoint, totals in sorted(self.totals.items()):
+                    lines.append(f'{name}{_labels(endpoint=endpoint)} {_number(totals[field])}')
+        for collect in self.collectors:
+            lines += collect()
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def histogram_lines(name, help_text, series):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for labels, histogram in series:
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {count}')
+        lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {histogram.count}')
+        lines.append(f'{name}_sum{_labels(**labels)} {_number(histogram.sum)}')
+        lines.append(f'{name}_count{_labels(**labels)} {histogram.count}')
+    return lines
+
+
+def _current():
+    return g.get('request_stats') if has_request_context() else None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current() is not None:
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current()
+    starts = conn.info.get('query_start')
+    if stats is None or not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats.statements += 1
+    stats.db_time += elapsed
+    stats.queries.append((elapsed, statement))
+
+
+def _before_render(sender, template, context, **extra):
+    stats = _current()
+    if stats is not None:
+        stats._render_starts.append(time.perf_counter())
+
+
+def _rendered(sender, template, context, **extra):
+    stats = _current()
+    if stats is not None and stats._render_starts:
+        stats.render_time += time.perf_counter() - stats._render_starts.pop()
+
+
+def _start_request():
+    g.request_stats = RequestStats()
+
+
+def _finish_request(response):
+    stats = g.pop('request_stats', None)
+    if stats is None:
+        return response
+    wall = time.perf_counter() - stats.start
+    endpoint = request.endpoint or 'unmatched'
+    size = None if response.is_streamed else response.calculate_content_length()
+
+    response.headers['Server-Timing'] = (
+        f'total;dur={wall * 1000:.1f}, '
+        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.statements} queries", '
+        f'render;dur={stats.render_time * 1000:.1f}'
+    )
+    current_app.extensions['request_metrics'].record(
+        endpoint, request.method, response.status_code, wall, stats, size)
+
+    threshold = current_app.config.get('SLOW_REQUEST_MS', DEFAULT_SLOW_REQUEST_MS)
+    if wall * 1000 >= threshold:
+        slowest = sorted(stats.queries, key=lambda q: q[0], reverse=True)[:SLOW_LOG_STATEMENTS]
+        current_app.logger.warning(
+            'Slow request %s %s (%s): %.1f ms total, %d queries in %.1f ms, render %.1f ms, %s bytes%s',
+            request.method, request.full_path, endpoint, wall * 1000, stats.statements,
+            stats.db_time * 1000, stats.render_time * 1000, size,
+            ''.join(f'\n  {seconds * 1000:8.1f} ms  {" ".join(sql.split())}' for seconds, sql in slowest))
+    return response
+
+
+def init_app(app):
+    app.extensions['request_metrics'] = Registry()
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+
+
+def registry():
+    return current_app.extensions['request_metrics']
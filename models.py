@@ -1,15 +1,70 @@
+import os
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy.orm import synonym
+from flask import g, has_app_context
 from flask_login import UserMixin
 from datetime import datetime
 
 db = SQLAlchemy()
 
+# How player stats are stored (see player_storage.py):
+#   'joined' - one table per player type joined to `player` (the original layout)
+#   'single' - every stat column on `player` (single-table inheritance), so
+#              polymorphic reads are one plain SELECT with no joins
+# Convert an existing database with `flask migrate-player-storage <layout>`.
+PLAYER_STORAGE_LAYOUTS = ('joined', 'single')
+PLAYER_STORAGE = os.environ.get('PLAYER_STORAGE', 'joined')
+if PLAYER_STORAGE not in PLAYER_STORAGE_LAYOUTS:
+    raise ValueError(f'Unknown PLAYER_STORAGE {PLAYER_STORAGE!r} (expected joined or single)')
+SINGLE_TABLE = PLAYER_STORAGE == 'single'
+
+ROSTER_CATEGORIES = ('batsmen', 'bowlers', 'wicketkeepers', 'allrounders')
+
+
+def _stat(type_):
+    # In the single layout several types declare the same stat; they share
+    # one column on `player` instead of conflicting
+    return db.mapped_column(type_, use_existing_column=True)
+
+def roster(team):
+    """team.all_players grouped by category, built once per request.
+
+    Pages read team.players once per category section and again for the
+    player JSON; the grouping is kept in g under the team's id for the rest
+    of the request. A reloaded roster (after a commit) is a new list and is
+    regrouped; code that changes a roster in place or with a bulk UPDATE
+    calls forget_rosters().
+    """
+    players = team.all_players
+    if not has_app_context():
+        return _group(players)
+    rosters = g.setdefault('rosters', {})
+    entry = rosters.get(team.id)
+    if entry is None or entry[0] is not team or entry[1] is not players:
+        entry = rosters[team.id] = (team, players, _group(players))
+    return entry[2]
+
+
+def forget_rosters():
+    """Drop this request's roster groupings (see roster())"""
+    if has_app_context():
+        g.pop('rosters', None)
+
+
+def _group(players):
+    grouped = {category: [] for category in ROSTER_CATEGORIES}
+    for player in players:
+        if player.category in grouped:
+            grouped[player.category].append(player)
+    return grouped
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(200), nullable=False)
     role = db.Column(db.String(20), default='viewer') # admin, owner, viewer
+    team_id = db.Column(db.Integer, db.ForeignKey('team.id', ondelete='SET NULL')) # the team an owner manages
 
 
     def get_id(self):
@@ -26,14 +81,19 @@ class Team(db.Model):
     # Relationship with players
     all_players = db.relationship('Player', backref='team', lazy=True)
 
+    # Running roster totals (see aggregates.py); None until first built
+    aggregate = db.relationship('TeamAggregate', uselist=False, lazy=True,
+                                cascade='all, delete-orphan')
+
+    # Names are unique ignoring case, as add_team and update_team check; existing
+    # databases get it with `flask create-indexes`
+    __table_args__ = (
+        db.Index('uq_team_name_lower', db.func.lower(name), unique=True),
+    )
+
     @property
     def players(self):
-        return {
-            'batsmen': [p for p in self.all_players if p.category == 'batsmen'],
-            'bowlers': [p for p in self.all_players if p.category == 'bowlers'],
-            'wicketkeepers': [p for p in self.all_players if p.category == 'wicketkeepers'],
-            'allrounders': [p for p in self.all_players if p.category == 'allrounders']
-        }
+        return roster(self)
 
     def to_dict(self):
         return {
@@ -46,6 +106,14 @@ class Team(db.Model):
 
     @property
     def stats(self):
+        if self.aggregate is not None:
+            return {
+                'batsmen_count': self.aggregate.batsmen_count,
+                'bowlers_count': self.aggregate.bowlers_count,
+                'wicketkeepers_count': self.aggregate.wicketkeepers_count,
+                'allrounders_count': self.aggregate.allrounders_count
+            }
+
         stats = {
             'batsmen_count': 0, 'bowlers_count': 0, 
             'wicketkeepers_count': 0, 'allrounders_count': 0
@@ -73,8 +141,25 @@ class Player(db.Model):
     
     __mapper_args__ = {
         'polymorphic_identity': 'player',
-        'polymorphic_on': type
+        'polymorphic_on': type,
+        # Stats are on this table in the single layout: always load them
+        **({'with_polymorphic': '*'} if SINGLE_TABLE else {}),
     }
+
+    if SINGLE_TABLE:
+        player_name = synonym('name')
+
+    # Search and roster lookups (see player_search.py); existing databases
+    # get them with `flask create-indexes`
+    __table_args__ = (
+        db.Index('ix_player_type_number', 'type', 'player_number'),
+        db.Index('ix_player_number', 'player_number'),  # unfiltered sort=player_number
+        db.Index('ix_player_status', 'status'),
+        db.Index('ix_player_team_id', 'team_id'),
+        # text_pattern_ops lets Postgres use the index for LIKE 'prefix%'
+        db.Index('ix_player_name', 'name', postgresql_ops={'name': 'text_pattern_ops'}),
+        db.Index('ix_player_base_price', 'base_price'),
+    )
     
     @property
     def category(self):
@@ -94,15 +179,18 @@ class Player(db.Model):
         }
 
 class Batsman(Player):
-    id = db.Column(db.Integer, db.ForeignKey('player.id'), primary_key=True)
-    player_name = db.Column(db.String(100)) # Denormalized for Supabase view
-    matches = db.Column(db.Integer)
-    runs = db.Column(db.Integer)
-    average = db.Column(db.Float)
-    strike_rate = db.Column(db.Float)
-    highest_score = db.Column(db.Integer)
-    fifties = db.Column(db.Integer)
-    hundreds = db.Column(db.Integer)
+    if SINGLE_TABLE:
+        __tablename__ = None
+    else:
+        id = db.Column(db.Integer, db.ForeignKey('player.id'), primary_key=True)
+        player_name = db.Column(db.String(100)) # Denormalized for Supabase view
+    matches = _stat(db.Integer)
+    runs = _stat(db.Integer)
+    average = _stat(db.Float)
+    strike_rate = _stat(db.Float)
+    highest_score = _stat(db.Integer)
+    fifties = _stat(db.Integer)
+    hundreds = _stat(db.Integer)
 
     __mapper_args__ = {
         'polymorphic_identity': 'batsmen',
@@ -127,12 +215,15 @@ class Batsman(Player):
 
 
 class Bowler(Player):
-    id = db.Column(db.Integer, db.ForeignKey('player.id'), primary_key=True)
-    player_name = db.Column(db.String(100)) # Denormalized for Supabase view
-    matches = db.Column(db.Integer)
-    wickets = db.Column(db.Integer)
-    economy = db.Column(db.Float)
-    best_bowling = db.Column(db.String(20))
+    if SINGLE_TABLE:
+        __tablename__ = None
+    else:
+        id = db.Column(db.Integer, db.ForeignKey('player.id'), primary_key=True)
+        player_name = db.Column(db.String(100)) # Denormalized for Supabase view
+    matches = _stat(db.Integer)
+    wickets = _stat(db.Integer)
+    economy = _stat(db.Float)
+    best_bowling = _stat(db.String(20))
 
     __mapper_args__ = {
         'polymorphic_identity': 'bowlers',
@@ -154,15 +245,18 @@ class Bowler(Player):
 
 
 class WicketKeeper(Player):
-    id = db.Column(db.Integer, db.ForeignKey('player.id'), primary_key=True)
-    player_name = db.Column(db.String(100)) # Denormalized for Supabase view
-    matches = db.Column(db.Integer)
-    runs = db.Column(db.Integer)
-    average = db.Column(db.Float)
-    strike_rate = db.Column(db.Float)
-    highest_score = db.Column(db.Integer)
-    fifties = db.Column(db.Integer)
-    hundreds = db.Column(db.Integer)
+    if SINGLE_TABLE:
+        __tablename__ = None
+    else:
+        id = db.Column(db.Integer, db.ForeignKey('player.id'), primary_key=True)
+        player_name = db.Column(db.String(100)) # Denormalized for Supabase view
+    matches = _stat(db.Integer)
+    runs = _stat(db.Integer)
+    average = _stat(db.Float)
+    strike_rate = _stat(db.Float)
+    highest_score = _stat(db.Integer)
+    fifties = _stat(db.Integer)
+    hundreds = _stat(db.Integer)
 
     __mapper_args__ = {
         'polymorphic_identity': 'wicketkeepers',
@@ -187,18 +281,21 @@ class WicketKeeper(Player):
 
 
 class AllRounder(Player):
-    id = db.Column(db.Integer, db.ForeignKey('player.id'), primary_key=True)
-    player_name = db.Column(db.String(100)) # Denormalized for Supabase view
-    matches = db.Column(db.Integer)
-    runs = db.Column(db.Integer)
-    average = db.Column(db.Float)
-    strike_rate = db.Column(db.Float)
-    highest_score = db.Column(db.Integer)
-    fifties = db.Column(db.Integer)
-    hundreds = db.Column(db.Integer)
-    wickets = db.Column(db.Integer)
-    economy = db.Column(db.Float)
-    best_bowling = db.Column(db.String(20))
+    if SINGLE_TABLE:
+        __tablename__ = None
+    else:
+        id = db.Column(db.Integer, db.ForeignKey('player.id'), primary_key=True)
+        player_name = db.Column(db.String(100)) # Denormalized for Supabase view
+    matches = _stat(db.Integer)
+    runs = _stat(db.Integer)
+    average = _stat(db.Float)
+    strike_rate = _stat(db.Float)
+    highest_score = _stat(db.Integer)
+    fifties = _stat(db.Integer)
+    hundreds = _stat(db.Integer)
+    wickets = _stat(db.Integer)
+    economy = _stat(db.Float)
+    best_bowling = _stat(db.String(20))
 
     __mapper_args__ = {
         'polymorphic_identity': 'allrounders',
@@ -225,9 +322,91 @@ class AllRounder(Player):
         }
 
 
+class TeamAggregate(db.Model):
+    # Per-team totals kept in step with the roster by aggregates.py, so
+    # evaluation and team pages don't re-walk every player
+    team_id = db.Column(db.Integer, db.ForeignKey('team.id'), primary_key=True)
+
+    batsmen_count = db.Column(db.Integer, default=0, nullable=False)
+    bowlers_count = db.Column(db.Integer, default=0, nullable=False)
+    wicketkeepers_count = db.Column(db.Integer, default=0, nullable=False)
+    allrounders_count = db.Column(db.Integer, default=0, nullable=False)
+    total_matches = db.Column(db.Integer, default=0, nullable=False)
+
+    total_runs_batsmen = db.Column(db.Integer, default=0, nullable=False)
+    total_runs_wicketkeepers = db.Column(db.Integer, default=0, nullable=False)
+    total_runs_allrounders = db.Column(db.Integer, default=0, nullable=False)
+    total_average_batsmen = db.Column(db.Float, default=0, nullable=False)
+    total_average_wicketkeepers = db.Column(db.Float, default=0, nullable=False)
+    total_average_allrounders = db.Column(db.Float, default=0, nullable=False)
+    total_strike_rate_batsmen = db.Column(db.Float, default=0, nullable=False)
+    total_strike_rate_wicketkeepers = db.Column(db.Float, default=0, nullable=False)
+    total_strike_rate_allrounders = db.Column(db.Float, default=0, nullable=False)
+    total_fifties_batsmen = db.Column(db.Integer, default=0, nullable=False)
+    total_fifties_wicketkeepers = db.Column(db.Integer, default=0, nullable=False)
+    total_fifties_allrounders = db.Column(db.Integer, default=0, nullable=False)
+    total_hundreds_batsmen = db.Column(db.Integer, default=0, nullable=False)
+    total_hundreds_wicketkeepers = db.Column(db.Integer, default=0, nullable=False)
+    total_hundreds_allrounders = db.Column(db.Integer, default=0, nullable=False)
+    total_wickets_bowlers = db.Column(db.Integer, default=0, nullable=False)
+    total_wickets_allrounders = db.Column(db.Integer, default=0, nullable=False)
+    total_economy_bowlers = db.Column(db.Float, default=0, nullable=False)
+    total_economy_allrounders = db.Column(db.Float, default=0, nullable=False)
+
+    # Money spent per category (selling price, or base price if unset)
+    spent_batsmen = db.Column(db.Float, default=0, nullable=False)
+    spent_bowlers = db.Column(db.Float, default=0, nullable=False)
+    spent_wicketkeepers = db.Column(db.Float, default=0, nullable=False)
+    spent_allrounders = db.Column(db.Float, default=0, nullable=False)
+
+
 class BidHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     player_id = db.Column(db.Integer, db.ForeignKey('player.id'), nullable=False)
     team_id = db.Column(db.Integer, db.ForeignKey('team.id'), nullable=False)
     amount = db.Column(db.Float, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class AllocatorSequence(db.Model):
+    # High-water mark per allocation scope ('player_id', 'team_id', 'player_number:batsmen', ...)
+    scope = db.Column(db.String(50), primary_key=True)
+    high_water = db.Column(db.Integer, nullable=False)
+
+
+class AllocatorFreeSlot(db.Model):
+    # Values released below the high-water mark, handed out again lowest-first
+    scope = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, primary_key=True)
+
+
+class AuctionState(db.Model):
+    # Single row whose version is bumped by every commit that changes auction
+    # data; rendered pages are cached against it (see cache.py)
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class JournalCheckpoint(db.Model):
+    # Last auction-state journal entry written to the database, committed in
+    # the same transaction as the entries themselves (see state_engine.py)
+    id = db.Column(db.Integer, primary_key=True)
+    seq = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class AuctionEvent(db.Model):
+    # Append-only log of auction changes (see event_log.py). changes maps
+    # 'players'/'teams' -> {id: [before, after]} with only the changed fields
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(30), nullable=False)
+    changes = db.Column(db.JSON, nullable=False, default=dict)
+    reverts = db.Column(db.Integer, db.ForeignKey('auction_event.id'), index=True)  # set on undo events
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class AuctionSnapshot(db.Model):
+    # Full player/team state right after event_id, so history lookups replay
+    # at most AUCTION_SNAPSHOT_EVERY events
+    event_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    state = db.Column(db.JSON, nullable=False)
@@ -0,0 +1,76 @@
+"""Validation rules for incoming player data.
+
+Shared by the /add-player form and bulk import so both accept and reject the
+same rows. parse_player() takes any mapping (request.form, a CSV row, an XLSX
+row) and returns the category plus the column values for the subclass model.
+"""
+from models import Batsman, Bowler, WicketKeeper, AllRounder
+
+PLAYER_CLASSES = {
+    'batsmen': Batsman,
+    'bowlers': Bowler,
+    'wicketkeepers': WicketKeeper,
+    'allrounders': AllRounder,
+}
+
+
+def _integer(value):
+    return int(value or 0)
+
+
+def _decimal(value):
+    return float(value or 0)
+
+
+def _bowling_figures(value):
+    return value or '0/0'
+
+
+BATTING_FIELDS = [
+    ('matches', _integer), ('runs', _integer), ('average', _decimal),
+    ('strike_rate', _decimal), ('highest_score', _integer),
+    ('fifties', _integer), ('hundreds', _integer),
+]
+BOWLING_FIELDS = [
+    ('matches', _integer), ('wickets', _integer), ('economy', _decimal),
+    ('best_bowling', _bowling_figures),
+]
+
+STAT_FIELDS = {
+    'batsmen': BATTING_FIELDS,
+    'bowlers': BOWLING_FIELDS,
+    'wicketkeepers': BATTING_FIELDS,
+    'allrounders': BATTING_FIELDS + BOWLING_FIELDS[1:],
+}
+
+
+def parse_player(data):
+    """Validate a player mapping; returns (category, column values) or raises ValueError"""
+    category = data.get('category')
+    if not category or category not in PLAYER_CLASSES:
+        raise ValueError('Invalid player category')
+
+    name = data.get('name')
+    if not name:
+        raise ValueError('Player name is required')
+
+    try:
+        base_price = float(data.get('base_price') or 0)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid base price: {data.get('base_price')!r}")
+    if base_price < 0:
+        raise ValueError('Base price cannot be negative')
+
+    fields = {
+        'name': name,
+        'player_name': name, # Denormalized
+        'base_price': base_price,
+        'status': 'untouched',
+    }
+    for field, parse in STAT_FIELDS[category]:
+        try:
+            fields[field] = parse(data.get(field))
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid value for {field}: {data.get(field)!r}')
+
+    return category, fields
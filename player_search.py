@@ -0,0 +1,153 @@
+"""Filtered, keyset-paginated player search behind GET /api/players.
+
+Pages are ordered by (sort column, id) and the cursor carries the last row's
+values, so page N costs the same as page 1 instead of growing with OFFSET.
+Filters map onto the Player indexes declared in models.py:
+
+    category  -> ix_player_type_number (sort=player_number within a category)
+    sort=player_number without a category -> ix_player_number
+    status    -> ix_player_status
+    team      -> ix_player_team_id
+    name      -> ix_player_name (prefix match, case-sensitive)
+    min_price / max_price and sort=price -> ix_player_base_price
+
+Prices are base prices; selling prices are returned but not searched.
+"""
+import base64
+import json
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+from models import db, Team
+from loaders import polymorphic_player, PLAYER_CATEGORIES
+
+STATUSES = ['untouched', 'sold', 'unsold']
+SORTS = {'player_number': 'player_number', 'price': 'base_price'}
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def encode_cursor(value, player_id):
+    raw = json.dumps([value, player_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, player_id = json.loads(base64.urlsafe_b64decode(padded))
+        return value, int(player_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+
+def _price(args, key):
+    value = args.get(key)
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f'Invalid {key}: {value!r}')
+
+
+def parse_args(args):
+    """Validate query-string arguments; raises ValueError with a user-facing message"""
+    category = args.get('category') or None
+    if category and category not in PLAYER_CATEGORIES:
+        raise ValueError('Invalid player category')
+
+    status = args.get('status') or None
+    if status and status not in STATUSES:
+        raise ValueError(f'Invalid status (expected one of {", ".join(STATUSES)})')
+
+    sort = args.get('sort') or 'player_number'
+    if sort not in SORTS:
+        raise ValueError(f'Invalid sort (expected one of {", ".join(SORTS)})')
+
+    direction = args.get('direction') or 'asc'
+    if direction not in ('asc', 'desc'):
+        raise ValueError("Invalid direction (expected 'asc' or 'desc')")
+
+    try:
+        limit = int(args.get('limit') or DEFAULT_LIMIT)
+    except ValueError:
+        raise ValueError('Invalid limit')
+    if limit < 1:
+        raise ValueError('Invalid limit')
+
+    team_id = args.get('team_id') or None
+    if team_id is not None:
+        try:
+            team_id = int(team_id)
+        except ValueError:
+            raise ValueError('Invalid team_id')
+
+    cursor = args.get('cursor')
+    return {
+        'category': category,
+        'status': status,
+        'team': args.get('team') or None,
+        'team_id': team_id,
+        'name': args.get('name') or None,
+        'min_price': _price(args, 'min_price'),
+        'max_price': _price(args, 'max_price'),
+        'sort': sort,
+        'direction': direction,
+        'limit': min(limit, MAX_LIMIT),
+        'cursor': decode_cursor(cursor) if cursor else None,
+    }
+
+
+def _after(column, id_column, cursor, descending):
+    """Rows strictly after the cursor in (column NULLS LAST, id) order"""
+    value, last_id = cursor
+    if value is None:
+        # Already in the NULL tail
+        return and_(column.is_(None), id_column > last_id)
+    beyond = column < value if descending else column > value
+    return or_(beyond, and_(column == value, id_column > last_id), column.is_(None))
+
+
+def search(params):
+    """One page of players for parse_args() output.
+
+    Returns (players, next_cursor); next_cursor is None on the last page.
+    Raises LookupError if a team filter names a team that does not exist.
+    """
+    poly = polymorphic_player()
+    query = db.session.query(poly).options(joinedload(poly.team))
+
+    if params['team'] is not None:
+        team = Team.query.filter_by(name=params['team']).first()
+        if not team:
+            raise LookupError('Team not found')
+        query = query.filter(poly.team_id == team.id)
+    if params['team_id'] is not None:
+        query = query.filter(poly.team_id == params['team_id'])
+    if params['category']:
+        query = query.filter(poly.type == params['category'])
+    if params['status']:
+        query = query.filter(poly.status == params['status'])
+    if params['name']:
+        query = query.filter(poly.name.startswith(params['name'], autoescape=True))
+    if params['min_price'] is not None:
+        query = query.filter(poly.base_price >= params['min_price'])
+    if params['max_price'] is not None:
+        query = query.filter(poly.base_price <= params['max_price'])
+
+    column = getattr(poly, SORTS[params['sort']])
+    descending = params['direction'] == 'desc'
+    if params['cursor'] is not None:
+        query = query.filter(_after(column, poly.id, params['cursor'], descending))
+
+    ordering = column.desc() if descending else column.asc()
+    query = query.order_by(ordering.nulls_last(), poly.id.asc())
+
+    # One extra row tells us whether another page exists
+    rows = query.limit(params['limit'] + 1).all()
+    players = rows[:params['limit']]
+    next_cursor = None
+    if len(rows) > params['limit']:
+        last = players[-1]
+        next_cursor = encode_cursor(getattr(last, SORTS[params['sort']]), last.id)
+    return players, next_cursor
@@ -0,0 +1,125 @@
+"""Convert a database between the joined and single player storage layouts.
+
+models.PLAYER_STORAGE decides which layout the app maps. This rewrites the
+tables of an existing database to match:
+
+- to 'single': add the stat columns to `player`, copy each subclass table
+  into them (one UPDATE ... FROM per table) and drop the subclass tables
+- to 'joined': recreate the subclass tables, copy each type's stats back
+  (one INSERT ... SELECT per table, player_name taken from name) and drop
+  the stat columns from `player`
+
+Each direction undoes the other. Both run in one transaction on Postgres.
+SQLite commits each ALTER TABLE on its own, so an interrupted run can leave
+a 'mixed' layout; running the same conversion again finishes it.
+
+Used by `flask migrate-player-storage`.
+"""
+from sqlalchemy import (Column, Float, ForeignKey, Integer, MetaData, String, Table,
+                        insert, inspect, select, update)
+from player_data import STAT_FIELDS
+
+# Subclass table per player type in the joined layout
+SUBCLASS_TABLES = {
+    'batsmen': 'batsman',
+    'bowlers': 'bowler',
+    'wicketkeepers': 'wicket_keeper',
+    'allrounders': 'all_rounder',
+}
+
+STAT_TYPES = {
+    'matches': Integer(),
+    'runs': Integer(),
+    'average': Float(),
+    'strike_rate': Float(),
+    'highest_score': Integer(),
+    'fifties': Integer(),
+    'hundreds': Integer(),
+    'wickets': Integer(),
+    'economy': Float(),
+    'best_bowling': String(20),
+}
+
+
+def stat_columns(category):
+    return [field for field, _ in STAT_FIELDS[category]]
+
+
+def layout(conn):
+    """'joined', 'single', 'mixed' (interrupted conversion) or None without a player table"""
+    inspector = inspect(conn)
+    tables = set(inspector.get_table_names())
+    if 'player' not in tables:
+        return None
+    has_stats = any(c['name'] in STAT_TYPES for c in inspector.get_columns('player'))
+    has_subclass_tables = any(name in tables for name in SUBCLASS_TABLES.values())
+    if has_stats and has_subclass_tables:
+        return 'mixed'
+    return 'single' if has_stats else 'joined'
+
+
+def _alter(conn, clause):
+    conn.exec_driver_sql(f'ALTER TABLE player {clause}')
+
+
+def to_single(conn):
+    tables = set(inspect(conn).get_table_names())
+    player = Table('player', MetaData(), autoload_with=conn)
+    quote = conn.dialect.identifier_preparer.quote
+    for name, type_ in STAT_TYPES.items():
+        if name not in player.c:
+            _alter(conn, f'ADD COLUMN {quote(name)} {type_.compile(dialect=conn.dialect)}')
+
+    metadata = MetaData()
+    player = Table('player', metadata, autoload_with=conn)
+    for category, table_name in SUBCLASS_TABLES.items():
+        if table_name not in tables:
+            continue
+        subclass = Table(table_name, metadata, autoload_with=conn)
+        conn.execute(
+            update(player)
+            .where(player.c.id == subclass.c.id, player.c.type == category)
+            .values({field: subclass.c[field] for field in stat_columns(category)})
+        )
+        subclass.drop(conn)
+
+
+def to_joined(conn):
+    metadata = MetaData()
+    player = Table('player', metadata, autoload_with=conn)
+    for category, table_name in SUBCLASS_TABLES.items():
+        fields = stat_columns(category)
+        subclass = Table(
+            table_name, metadata,
+            Column('id', Integer, ForeignKey('player.id'), primary_key=True),
+            Column('player_name', String(100)),
+            *[Column(field, STAT_TYPES[field]) for field in fields],
+        )
+        # Left over from an interrupted run: rebuilt from `player`
+        subclass.drop(conn, checkfirst=True)
+        subclass.create(conn)
+        conn.execute(insert(subclass).from_select(
+            ['id', 'player_name', *fields],
+            select(player.c.id, player.c.name, *[player.c[field] for field in fields])
+            .where(player.c.type == category)
+        ))
+
+    quote = conn.dialect.identifier_preparer.quote
+    for name in STAT_TYPES:
+        if name in player.c:
+            _alter(conn, f'DROP COLUMN {quote(name)}')
+
+
+def migrate(engine, target):
+    """Convert the player tables to target; returns False if already there"""
+    with engine.begin() as conn:
+        current = layout(conn)
+        if current is None:
+            raise LookupError('No player table to convert')
+        if current == target:
+            return False
+        if target == 'single':
+            to_single(conn)
+        else:
+            to_joined(conn)
+    return True
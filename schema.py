@@ -0,0 +1,95 @@
+"""Boot-time check that the database has what models.py maps.
+
+db.create_all() on every start costs a round trip per table against the
+remote database, and it still boots against a table that lacks a column the
+models need; the first request touching it fails instead. The production
+entry point (wsgi.py) runs check() once in the gunicorn master: the schema
+is reflected in a few queries, and the server refuses to start on a missing
+table or column, naming the command that fixes it. Missing indexes, and
+teams whose aggregate row was never built (they read as empty rosters), only
+warn.
+
+Creating the tables is an explicit step: `flask init-db` on a new database,
+or after an upgrade that adds tables or nullable columns.
+"""
+from sqlalchemy import exists, func, inspect, select
+from sqlalchemy.schema import CreateColumn
+from models import PLAYER_STORAGE, Team, TeamAggregate
+import player_storage
+
+
+class SchemaError(RuntimeError):
+    """The database is missing tables or columns the models need"""
+
+
+def problems(engine, metadata):
+    """(errors, warnings) as lists of strings; empty errors means the app can boot"""
+    errors, warnings = [], []
+    layout = player_storage.layout(engine)
+    if layout == 'mixed':
+        return [f'player tables are half converted: rerun `flask migrate-player-storage {PLAYER_STORAGE}`'], warnings
+    if layout and layout != PLAYER_STORAGE:
+        return [f'player tables use the {layout} layout but PLAYER_STORAGE={PLAYER_STORAGE}: '
+                f'set PLAYER_STORAGE={layout} or run `flask migrate-player-storage {PLAYER_STORAGE}`'], warnings
+
+    inspector = inspect(engine)
+    existing = set(inspector.get_table_names())
+    missing = [table.name for table in metadata.sorted_tables if table.name not in existing]
+    if missing:
+        errors.append(f"missing tables {', '.join(missing)}: run `flask init-db`")
+    tables = [table for table in metadata.sorted_tables if table.name in existing]
+    if not tables:
+        return errors, warnings
+
+    names = [table.name for table in tables]
+    columns = {name: {c['name'] for c in found}
+               for (_, name), found in inspector.get_multi_columns(filter_names=names).items()}
+    indexes = {name: {i['name'] for i in found}
+               for (_, name), found in inspector.get_multi_indexes(filter_names=names).items()}
+
+    for table in tables:
+        absent = [column.name for column in table.columns if column.name not in columns.get(table.name, ())]
+        if absent:
+            addable = all(table.columns[name].nullable for name in absent)
+            errors.append(f"{table.name} is missing columns {', '.join(absent)}: " +
+                          ('run `flask init-db`' if addable else 'the database predates this version of the models'))
+        absent = [index.name for index in table.indexes if index.name not in indexes.get(table.name, ())]
+        if absent:
+            warnings.append(f"{table.name} is missing indexes {', '.join(absent)}: run `flask create-indexes`")
+
+    if not errors and {Team.__table__.name, TeamAggregate.__table__.name} <= existing:
+        with engine.connect() as conn:
+            unbuilt = conn.scalar(select(func.count()).select_from(Team.__table__).where(
+                ~exists().where(TeamAggregate.team_id == Team.id)))
+        if unbuilt:
+            warnings.append(f'{unbuilt} teams have no aggregate row and show empty totals: run `flask init-db`')
+    return errors, warnings
+
+
+def check(engine, metadata, logger):
+    """Log warnings and raise SchemaError if the app cannot run against this database"""
+    errors, warnings = problems(engine, metadata)
+    for warning in warnings:
+        logger.warning('Schema: %s', warning)
+    if errors:
+        raise SchemaError('Database schema does not match the models:\n  ' + '\n  '.join(errors))
+
+
+def add_missing_columns(engine, metadata):
+    """ALTER TABLE ... ADD COLUMN for nullable columns existing tables lack; returns 'table.column' names"""
+    inspector = inspect(engine)
+    existing = set(inspector.get_table_names())
+    added = []
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing:
+                continue
+            present = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present or not column.nullable:
+                    continue
+                # Adds the column alone; a foreign key on it is not added to existing tables
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f'ALTER TABLE {engine.dialect.identifier_preparer.format_table(table)} ADD COLUMN {ddl}')
+                added.append(f'{table.name}.{column.name}')
+    return added
@@ -0,0 +1,223 @@
+"""What-if and squad scoring with NumPy.
+
+A team's totals (its TeamAggregate row) are a row of a matrix with one
+column per aggregates.FIELDS entry. The grading ladders of app.evaluate_team
+are applied to whole columns with np.select, so every row is scored in one
+pass.
+
+What-if uses this. The available players' stats are read into arrays with
+one SELECT. Each one's contribution, priced at the bid, is added to the
+team's row, and the resulting matrix (one row per candidate signing) is
+scored at once. squad_solver.py and simulator.py grade their rosters the
+same way.
+
+The evaluation pages call evaluate_team per team instead: with the totals
+materialized each team is O(1), and a batched pass was no faster once the
+strengths and weaknesses are formatted. benchmarks/check_evaluation_parity.py
+checks score() and evaluate_team against the original roster walk.
+"""
+import numpy as np
+from sqlalchemy import Float, select
+from models import db, Team, TeamAggregate
+from loaders import polymorphic_player, stat_column
+import aggregates
+
+FIELDS = aggregates.FIELDS
+COLUMN = {field: i for i, field in enumerate(FIELDS)}
+# Player stats a signing adds to the team totals (see aggregates.contributions)
+CANDIDATE_STATS = ['matches'] + sorted({stat for stats in aggregates.CATEGORY_STATS.values() for stat in stats})
+FLOAT_COLUMNS = [COLUMN[c.key] for c in TeamAggregate.__table__.columns
+                 if c.key in COLUMN and isinstance(c.type, Float)]
+
+# Per-player means evaluate_team grades on: (stat, category)
+MEANS = [
+    ('average', 'batsmen'), ('average', 'wicketkeepers'), ('average', 'allrounders'),
+    ('strike_rate', 'batsmen'), ('strike_rate', 'wicketkeepers'), ('strike_rate', 'allrounders'),
+    ('economy', 'bowlers'), ('economy', 'allrounders'),
+]
+
+# evaluate_team's checks in order. Each ladder's tiers are (points, conditions)
+# tried top-down; a tier holds when all its (value, operator, bound)
+# conditions do. If none holds the ladder adds nothing.
+LADDERS = [
+    [
+        (25, (('batsmen_count', '>=', 7), ('avg_average_batsmen', '>', 35),
+              ('avg_strike_rate_batsmen', '>', 140), ('total_runs_batsmen', '>', 2000))),
+        (15, (('batsmen_count', '>=', 5), ('avg_average_batsmen', '>', 25),
+              ('avg_strike_rate_batsmen', '>', 130), ('total_runs_batsmen', '>', 1500))),
+        (10, (('batsmen_count', '>=', 3), ('avg_average_batsmen', '>', 15),
+              ('avg_strike_rate_batsmen', '>', 100), ('total_runs_batsmen', '>', 500))),
+    ],
+    [
+        (25, (('bowlers_count', '>=', 7), ('avg_economy_bowlers', '<', 8), ('total_wickets_bowlers', '>', 100))),
+        (15, (('bowlers_count', '>=', 5), ('avg_economy_bowlers', '<', 10), ('total_wickets_bowlers', '>', 50))),
+        (10, (('bowlers_count', '>=', 3), ('avg_economy_bowlers', '<', 12), ('total_wickets_bowlers', '>', 20))),
+    ],
+    [
+        (20, (('allrounders_count', '>=', 7), ('avg_average_allrounders', '>', 25),
+              ('avg_economy_allrounders', '<', 9), ('avg_strike_rate_allrounders', '>', 120),
+              ('total_wickets_allrounders', '>', 50))),
+        (15, (('allrounders_count', '>=', 5), ('avg_average_allrounders', '>', 15),
+              ('avg_economy_allrounders', '<', 12), ('avg_strike_rate_allrounders', '>', 110),
+              ('total_wickets_allrounders', '>', 20))),
+        (5, (('allrounders_count', '>=', 3), ('avg_average_allrounders', '>', 10),
+             ('avg_economy_allrounders', '<', 15), ('avg_strike_rate_allrounders', '>', 100),
+             ('total_wickets_allrounders', '>', 10))),
+    ],
+    [
+        (10, (('wicketkeepers_count', '>=', 3), ('avg_average_wicketkeepers', '>', 30),
+              ('avg_strike_rate_wicketkeepers', '>', 130))),
+        (5, (('wicketkeepers_count', '>=', 2), ('avg_average_wicketkeepers', '>', 15),
+             ('avg_strike_rate_wicketkeepers', '>', 100))),
+    ],
+    # Squad composition
+    [(5, (('batsmen_count', '>=', 5),))],
+    [(5, (('bowlers_count', '>=', 5),))],
+    [(5, (('wicketkeepers_count', '>=', 3),))],
+    [(5, (('allrounders_count', '>=', 5),))],
+]
+
+OPERATORS = {'>=': np.greater_equal, '>': np.greater, '<': np.less}
+
+GRADES = [(90, 'A+'), (80, 'A'), (70, 'B+'), (60, 'B'), (50, 'C'), (40, 'C+')]
+
+
+def team_matrix(teams):
+    """Aggregate totals of teams as a (teams x FIELDS) matrix, read in one SELECT.
+
+    A team without an aggregate row gets zeros, like aggregates.totals(None).
+    """
+    if teams and not isinstance(teams[0], Team):
+        # In-memory state (state_engine.py): the totals are on the objects
+        rows = {team.id: [getattr(team.aggregate, field) for field in FIELDS] for team in teams}
+    else:
+        table = TeamAggregate.__table__
+        query = (select(table.c.team_id, *[table.c[field] for field in FIELDS])
+                 .where(table.c.team_id.in_([team.id for team in teams])))
+        rows = {row[0]: row[1:] for row in db.session.execute(query)}
+    empty = [0] * len(FIELDS)
+    matrix = np.array([rows.get(team.id, empty) for team in teams], dtype=float).reshape(len(teams), len(FIELDS))
+    return round_totals(matrix)
+
+
+def round_totals(matrix):
+    """Round the float columns in place exactly like round(value, 6) in aggregates.totals.
+
+    np.round alone can land one bit away from round(): value * 1e6 is off by
+    up to an ulp, which changes the rounding only within a hair of a half.
+    Those few values go through round() itself.
+    """
+    columns = matrix[:, FLOAT_COLUMNS]
+    scaled = columns * 1e6
+    rounded = np.rint(scaled) / 1e6
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    rounded[near_half] = [round(value, 6) for value in columns[near_half].tolist()]
+    matrix[:, FLOAT_COLUMNS] = rounded
+    return matrix
+
+
+def _values(matrix):
+    """Named columns plus the per-player means evaluate_team grades on"""
+    values = {field: matrix[:, i] for i, field in enumerate(FIELDS)}
+    for stat, category in MEANS:
+        count = values[f'{category}_count']
+        values[f'avg_{stat}_{category}'] = np.divide(
+            values[f'total_{stat}_{category}'], count, out=np.zeros(len(matrix)), where=count > 0)
+    return values
+
+
+def holds(values, conditions):
+    """Rows of values meeting every (value, operator, bound) condition"""
+    result = np.ones(len(next(iter(values.values()))), dtype=bool)
+    for key, operator, bound in conditions:
+        result &= OPERATORS[operator](values[key], bound)
+    return result
+
+
+def score(matrix):
+    """evaluate_team's score and grade for every row"""
+    values = _values(matrix)
+    total = np.zeros(len(matrix))
+    for tiers in LADDERS:
+        conditions = [holds(values, tier_conditions) for _, tier_conditions in tiers]
+        total += np.select(conditions, [points for points, _ in tiers], default=0)
+    total = np.minimum(total, 100)
+    grades = np.select([total >= bound for bound, _ in GRADES], [grade for _, grade in GRADES], default='D')
+    return total, grades
+
+
+def candidates(category=None, player_ids=None):
+    """Players on no team as arrays, read in one SELECT without building ORM objects.
+
+    Returns a dict of equal-length arrays: id, name, type, player_number,
+    base_price and every stat aggregates.contributions() reads (None -> 0).
+    """
+    poly = polymorphic_player()
+    query = select(poly.id, poly.name, poly.type, poly.player_number, poly.base_price,
+                   *[stat_column(poly, stat).label(stat) for stat in CANDIDATE_STATS]
+                   ).where(poly.team_id.is_(None))
+    if category:
+        query = query.where(poly.type == category)
+    if player_ids is not None:
+        query = query.where(poly.id.in_(player_ids))
+    rows = db.session.execute(query.order_by(poly.player_number, poly.id)).all()
+
+    columns = list(zip(*rows)) or [()] * (5 + len(CANDIDATE_STATS))
+    result = {
+        'id': list(columns[0]),
+        'name': list(columns[1]),
+        'type': np.array(columns[2], dtype=object),
+        'player_number': list(columns[3]),
+        'base_price': np.nan_to_num(np.array(columns[4], dtype=float)),
+    }
+    for stat, values in zip(CANDIDATE_STATS, columns[5:]):
+        result[stat] = np.nan_to_num(np.array(values, dtype=float))
+    return result
+
+
+def contribution_matrix(candidates, prices):
+    """What signing each candidate at its price adds to a team, one row per candidate"""
+    matrix = np.zeros((len(prices), len(FIELDS)))
+    matrix[:, COLUMN['total_matches']] = candidates['matches']
+    for category, stats in aggregates.CATEGORY_STATS.items():
+        rows = candidates['type'] == category
+        matrix[rows, COLUMN[f'{category}_count']] = 1
+        matrix[rows, COLUMN[f'spent_{category}']] = prices[rows]
+        for stat in stats:
+            matrix[rows, COLUMN[f'total_{stat}_{category}']] = candidates[stat][rows]
+    return matrix
+
+
+def what_if(team, candidates, price=None):
+    """Score the team with each candidate added at price (default: their base price).
+
+    candidates comes from candidates(). Returns the current score and grade
+    and one result per candidate, best first.
+    """
+    count = len(candidates['id'])
+    prices = np.full(count, float(price)) if price is not None else candidates['base_price']
+    current = team_matrix([team])
+    # Rounded like aggregates.totals, so a what-if equals the real signing's score
+    after = round_totals(current + contribution_matrix(candidates, prices))
+    now, now_grade = score(current)
+    scores, grades = score(after)
+
+    # Best score first, then cheapest, then catalogue order
+    order = np.lexsort((np.arange(count), prices, -scores)).tolist()
+    scores, grades, prices = scores.tolist(), grades.tolist(), prices.tolist()
+    purse = team.purse or 0
+    return {
+        'score': int(now[0]),
+        'grade': str(now_grade[0]),
+        'candidates': [{
+            'player_id': candidates['id'][i],
+            'name': candidates['name'][i],
+            'category': candidates['type'][i],
+            'player_number': candidates['player_number'][i],
+            'price': prices[i],
+            'affordable': prices[i] <= purse,
+            'score': int(scores[i]),
+            'grade': grades[i],
+            'score_change': int(scores[i] - now[0]),
+        } for i in order],
+    }
@@ -0,0 +1,244 @@
+"""Atomic purse settlement for selling and releasing players.
+
+The purse check and debit is one conditional statement,
+`UPDATE team SET purse = purse - :price WHERE id = :team AND purse >= :price`,
+so two consoles selling to the same team can never overspend it. The player
+moves with a compare-and-swap UPDATE that only matches the owner/status/price
+that was read. If another request moved the player first, the whole
+transaction is rolled back and retried against the new state. On Postgres
+the player row is also read FOR UPDATE, so the retry is rarely needed.
+
+In the same transaction a sale refunds the previous owner what it paid,
+updates both teams' aggregates and records a BidHistory row and an
+AuctionEvent (see event_log.py). The purses it touches are read FOR UPDATE
+first, so the event's before/after values are exact for undo.
+
+Whole-roster changes (team reset/delete/rename, resetting the auction) are
+single set-based statements whose count does not depend on roster size.
+"""
+from sqlalchemy import update, delete, select
+from models import db, Team, Player, BidHistory, TeamAggregate, User, forget_rosters
+import aggregates
+import event_log
+
+MAX_ATTEMPTS = 5
+INITIAL_PURSE = 100.0
+
+# Column values for a player back in the pool
+RELEASED = {'status': 'untouched', 'selling_price': None, 'team_id': None, 'team_name': None}
+
+
+class InsufficientPurse(ValueError):
+    pass
+
+
+class SettlementConflict(RuntimeError):
+    """The player kept changing under us for MAX_ATTEMPTS tries"""
+
+
+class _Moved(Exception):
+    pass
+
+
+def paid(player):
+    """What the owning team paid for a player, and gets back on release"""
+    return player.selling_price or player.base_price or 0
+
+
+def refund(team_id, amount):
+    """Credit a team's purse in place; returns the new purse (None if nothing changed)"""
+    if team_id is not None and amount:
+        return float(db.session.execute(
+            update(Team).where(Team.id == team_id).values(purse=Team.purse + amount)
+            .returning(Team.purse)
+        ).scalar())
+
+
+def _debit(team_id, amount, credit=0):
+    """Take amount from the purse (after adding credit) only if it covers it; returns the new purse"""
+    purse = db.session.execute(
+        update(Team)
+        .where(Team.id == team_id, Team.purse + credit >= amount)
+        .values(purse=Team.purse + credit - amount)
+        .returning(Team.purse)
+    ).scalar()
+    if purse is None:
+        raise InsufficientPurse('Insufficient team budget')
+    # SQLite's RETURNING hands back whole REAL values as int
+    return float(purse)
+
+
+def _purses(team_ids):
+    """Current purses of the teams a change will touch, locked in id order"""
+    ids = [team_id for team_id in team_ids if team_id is not None]
+    return dict(db.session.execute(
+        select(Team.id, Team.purse).where(Team.id.in_(ids)).order_by(Team.id).with_for_update()
+    ).all())
+
+
+def _record(event_type, player, before, purses, after_purses):
+    after = dict(before, **{field: getattr(player, field) for field in RELEASED})
+    event_log.record(event_type, players={player.id: (before, after)},
+                     teams={team_id: ({'purse': purse}, {'purse': after_purses.get(team_id, purse)})
+                            for team_id, purse in purses.items()})
+
+
+def _same(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def _lock(player_id):
+    player = db.session.get(Player, player_id, with_for_update=True, populate_existing=True)
+    if not player:
+        raise LookupError('Player not found')
+    return player
+
+
+def _move(player, **values):
+    """Compare-and-swap the player's ownership columns against what we read"""
+    result = db.session.execute(
+        update(Player)
+        .where(Player.id == player.id,
+               _same(Player.team_id, player.team_id),
+               _same(Player.status, player.status),
+               _same(Player.selling_price, player.selling_price))
+        .values(**values)
+    )
+    if result.rowcount != 1:
+        raise _Moved()
+    forget_rosters()
+
+
+def _retry(operation):
+    for _ in range(MAX_ATTEMPTS):
+        try:
+            result = operation()
+            db.session.commit()
+            return result
+        except _Moved:
+            db.session.rollback()
+        except Exception:
+            db.session.rollback()
+            raise
+    raise SettlementConflict('Player changed concurrently, please retry')
+
+
+def sell(player_id, team, price):
+    """Sell a player to team at price and commit.
+
+    Returns the ids of the teams whose purse changed (new owner first).
+    Raises LookupError, InsufficientPurse or SettlementConflict.
+    """
+    def attempt():
+        player = _lock(player_id)
+        previous_team_id = player.team_id
+        credit = paid(player) if previous_team_id else 0
+        before = aggregates.contributions(player)
+        logged = event_log.player_state(player)
+        purses = _purses([team.id, previous_team_id])
+        after = {}
+
+        if previous_team_id == team.id:
+            # Re-priced to the same team: one statement nets refund and debit
+            after[team.id] = _debit(team.id, price, credit)
+        elif previous_team_id is not None and previous_team_id < team.id:
+            # Touch team rows in id order so crossing re-sales can't deadlock
+            after[previous_team_id] = refund(previous_team_id, credit)
+            after[team.id] = _debit(team.id, price)
+        else:
+            after[team.id] = _debit(team.id, price)
+            after[previous_team_id] = refund(previous_team_id, credit)
+
+        _move(player, status='sold', selling_price=price, team_id=team.id, team_name=team.name)
+        if previous_team_id:
+            aggregates.add(previous_team_id, {field: -value for field, value in before.items()})
+        aggregates.apply(team.id, player)
+        db.session.add(BidHistory(player_id=player.id, team_id=team.id, amount=price))
+        _record('sold', player, logged, purses, {t: p for t, p in after.items() if p is not None})
+
+        if previous_team_id and previous_team_id != team.id:
+            return [team.id, previous_team_id]
+        return [team.id]
+
+    return _retry(attempt)
+
+
+def release(player_id, status, team_id=None):
+    """Take a player off its team with a refund and set status; commits.
+
+    With team_id, the player must currently belong to that team.
+    Returns the id of the refunded team, or None.
+    """
+    def attempt():
+        player = _lock(player_id)
+        if team_id is not None and player.team_id != team_id:
+            raise LookupError('Player not found in team')
+        previous_team_id = player.team_id
+        logged = event_log.player_state(player)
+        purses = _purses([previous_team_id])
+        after = {}
+
+        if previous_team_id:
+            after[previous_team_id] = refund(previous_team_id, paid(player))
+            aggregates.apply(previous_team_id, player, -1)
+        _move(player, **dict(RELEASED, status=status))
+        _record('unsold' if status == 'unsold' else 'released', player, logged, purses,
+                {t: p for t, p in after.items() if p is not None})
+        return previous_team_id
+
+    return _retry(attempt)
+
+
+def release_roster(team_id):
+    """Return every player of a team to the pool in one UPDATE; returns their ids.
+
+    No refund: callers reset or delete the team's purse themselves.
+    """
+    result = db.session.execute(
+        update(Player).where(Player.team_id == team_id).values(**RELEASED).returning(Player.id)
+    )
+    forget_rosters()
+    return [player_id for (player_id,) in result]
+
+
+def reset_team(team_id):
+    """Empty a team's roster and restore its purse; caller commits"""
+    ownership = [getattr(Player, field) for field in RELEASED]
+    roster = db.session.execute(select(Player.id, *ownership).where(Player.team_id == team_id)).all()
+    purses = _purses([team_id])
+    released = release_roster(team_id)
+    db.session.execute(update(Team).where(Team.id == team_id).values(purse=INITIAL_PURSE))
+    aggregates.reset(team_id)
+    event_log.record('team_reset',
+                     players={row[0]: (dict(zip(RELEASED, row[1:])), RELEASED) for row in roster},
+                     teams={team_id: ({'purse': purses[team_id]}, {'purse': INITIAL_PURSE})})
+    return released
+
+
+def delete_team(team_id):
+    """Release a team's players and delete it with its aggregate and bids; caller commits"""
+    released = release_roster(team_id)
+    db.session.execute(delete(BidHistory).where(BidHistory.team_id == team_id))
+    db.session.execute(delete(TeamAggregate).where(TeamAggregate.team_id == team_id))
+    # Team ids are reused (allocator.py): its owners must not inherit the next team
+    db.session.execute(update(User).where(User.team_id == team_id).values(team_id=None))
+    db.session.execute(delete(Team).where(Team.id == team_id))
+    return released
+
+
+def rename_team(team_id, name):
+    """Keep the players' denormalized team_name in step with a rename; caller commits"""
+    db.session.execute(update(Player).where(Player.team_id == team_id).values(team_name=name))
+
+
+def reset_auction():
+    """Put every player back in the pool and every team back to a full purse; caller commits"""
+    db.session.execute(
+        update(Player)
+        .where((Player.status != 'untouched') | Player.team_id.isnot(None))
+        .values(**RELEASED)
+    )
+    forget_rosters()
+    db.session.execute(update(Team).values(purse=INITIAL_PURSE))
+    db.session.execute(update(TeamAggregate).values(dict.fromkeys(aggregates.FIELDS, 0)))
+    db.session.execute(delete(BidHistory))
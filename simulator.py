@@ -0,0 +1,203 @@
+"""Monte Carlo auction simulator for purse and strategy planning.
+
+Replays the rest of the auction many times offline. In every simulated
+auction the players on no team go under the hammer one at a time, in a
+random order. Each team bids up to the value its strategy puts on the
+player, and the highest bidder wins at the second-highest bid (an English
+auction), under player_action's rules: the opening price is the base
+price but at least MIN_PRICE, and nobody bids more than their purse.
+Teams with max_squad players stop bidding, and a lot nobody bids on goes
+unsold.
+
+A strategy values a player at its opening price times lognormal noise
+(NOISE) times:
+
+    base        1
+    aggressive  2
+    needs       2 in a category where the team has fewer players than
+                NEEDS (the squad composition points), 0.5 otherwise
+    score       1 + the grade points the signing would add / 5
+
+All auctions of a batch advance together: purses are an (auctions x
+teams) array, team totals an (auctions x teams x FIELDS) array laid out
+like scoring.team_matrix, and each lot is one vectorized step for every
+auction and team. Rosters are graded with scoring.score(), the same
+grading as the evaluation page. Batches run in a process pool; each gets
+its own RNG from a SeedSequence spawned from the seed, so a seed gives the
+same results whatever the number of workers.
+
+Used by `flask simulate-auction`; benchmarks/bench_simulator.py checks
+the throughput.
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from auction_rules import DEFAULT_MAX_SQUAD, MIN_PRICE
+from loaders import load_team_summaries, PLAYER_CATEGORIES
+import scoring
+
+NOISE = 0.25  # sigma of the lognormal noise on every valuation
+DEFAULT_BATCH_SIZE = 250
+# Squad size per category that earns the composition points (scoring.LADDERS)
+NEEDS = {'batsmen': 5, 'bowlers': 5, 'wicketkeepers': 3, 'allrounders': 5}
+STRATEGIES = ['base', 'aggressive', 'needs', 'score']
+GRADES = [grade for _, grade in scoring.GRADES] + ['D']
+
+
+def load():
+    """Teams and the players on no team, as plain arrays a worker process can take"""
+    teams = sorted(load_team_summaries(), key=lambda team: team.name)
+    candidates = scoring.candidates()
+    categories = [PLAYER_CATEGORIES.index(category) for category in candidates['type']]
+    return {
+        'teams': [team.name for team in teams],
+        'purse': np.array([team.purse or 0 for team in teams], dtype=float),
+        'totals': scoring.team_matrix(teams),
+        'opening': np.maximum(candidates['base_price'], MIN_PRICE),
+        'category': np.array(categories, dtype=np.intp),
+        # What each signing adds to the totals; its price goes to the spent column
+        'contribution': scoring.contribution_matrix(candidates, np.zeros(len(categories))),
+    }
+
+
+def _grade_index(points):
+    return np.select([points >= bound for bound, _ in scoring.GRADES],
+                     range(len(scoring.GRADES)), default=len(scoring.GRADES))
+
+
+def _points(totals):
+    """Score of every (auction, team) roster"""
+    auctions, teams, fields = totals.shape
+    return scoring.score(totals.reshape(auctions * teams, fields))[0].reshape(auctions, teams)
+
+
+def run_batch(setup, strategies, auctions, seed, max_squad=DEFAULT_MAX_SQUAD):
+    """Simulate auctions at once; strategies has one name per team.
+
+    Returns the final points, grade index, money spent and players signed,
+    each an (auctions x teams) array.
+    """
+    rng = np.random.default_rng(seed)
+    opening, category = setup['opening'], setup['category']
+    contribution = setup['contribution']
+    lots, teams = len(opening), len(setup['teams'])
+    rows = np.arange(auctions)
+
+    purse = np.tile(setup['purse'], (auctions, 1))
+    totals = np.tile(setup['totals'], (auctions, 1, 1))
+    count_columns = np.array([scoring.COLUMN[f'{cat}_count'] for cat in PLAYER_CATEGORIES])
+    spent_columns = np.array([scoring.COLUMN[f'spent_{cat}'] for cat in PLAYER_CATEGORIES])
+    needs = np.array([NEEDS[cat] for cat in PLAYER_CATEGORIES])
+    squad = totals[:, :, count_columns].sum(axis=2)
+    signed = np.zeros((auctions, teams), dtype=np.int64)
+
+    strategies = np.array(strategies)
+    fixed = np.where(strategies == 'aggressive', 2.0, 1.0)
+    wants_needs = strategies == 'needs'
+    wants_score = strategies == 'score'
+    points = _points(totals) if wants_score.any() else None
+
+    order = rng.permuted(np.tile(np.arange(lots), (auctions, 1)), axis=1)
+    for lot in range(lots):
+        player = order[:, lot]
+        price = opening[player]
+        value = price[:, None] * rng.lognormal(0, NOISE, (auctions, teams)) * fixed
+        if wants_needs.any():
+            have = totals[rows, :, count_columns[category[player]]]
+            short = have < needs[category[player]][:, None]
+            value = np.where(wants_needs, value * np.where(short, 2.0, 0.5), value)
+        if points is not None:
+            after = totals + contribution[player][:, None, :]
+            gained = _points(after)
+            value = np.where(wants_score, value * (1 + (gained - points) / 5), value)
+
+        bids = np.minimum(value, purse)
+        bids[(squad >= max_squad) | (bids < price[:, None])] = 0
+        winner = bids.argmax(axis=1)
+        best = bids[rows, winner]
+        second = np.partition(bids, teams - 2, axis=1)[:, teams - 2] if teams > 1 else np.zeros(auctions)
+        sold = best > 0
+        if not sold.any():
+            continue
+
+        won, by, player = rows[sold], winner[sold], player[sold]
+        paid = np.maximum(price[sold], second[sold])
+        purse[won, by] -= paid
+        totals[won, by] += contribution[player]
+        totals[won, by, spent_columns[category[player]]] += paid
+        squad[won, by] += 1
+        signed[won, by] += 1
+        if points is not None:
+            points[won, by] = gained[won, by]
+
+    final = _points(totals)
+    return {
+        'points': final,
+        'grade': _grade_index(final),
+        'spent': setup['purse'] - purse,
+        'signed': signed,
+    }
+
+
+def _run_batch(args):
+    return run_batch(*args)
+
+
+def simulate(setup, strategies, runs, default='base', workers=None, seed=0,
+             batch_size=DEFAULT_BATCH_SIZE, max_squad=DEFAULT_MAX_SQUAD):
+    """Simulate runs auctions from load() output and summarize them per team.
+
+    strategies maps team name to strategy; other teams use default.
+    workers=1 runs in this process. Raises ValueError for an unknown team
+    or strategy.
+    """
+    unknown = set(strategies) - set(setup['teams'])
+    if unknown:
+        raise ValueError(f"Unknown team(s): {', '.join(sorted(unknown))}")
+    for name in [*strategies.values(), default]:
+        if name not in STRATEGIES:
+            raise ValueError(f'Unknown strategy {name!r}; expected one of {STRATEGIES}')
+    if runs < 1:
+        raise ValueError('runs must be at least 1')
+    plan = [strategies.get(team, default) for team in setup['teams']]
+
+    sizes = [min(batch_size, runs - start) for start in range(0, runs, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(setup, plan, size, batch_seed, max_squad) for size, batch_seed in zip(sizes, seeds)]
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    if workers == 1 or len(tasks) == 1:
+        batches = list(map(_run_batch, tasks))
+    else:
+        # spawn: the caller may be a threaded server holding database connections
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(min(workers, len(tasks)), mp_context=context) as pool:
+            batches = list(pool.map(_run_batch, tasks))
+    elapsed = time.perf_counter() - start
+
+    results = {key: np.concatenate([batch[key] for batch in batches]) for key in batches[0]}
+    return {
+        'runs': runs,
+        'seconds': elapsed,
+        'per_minute': runs / elapsed * 60 if elapsed else None,
+        'teams': {team: _summary(results, i, plan[i], setup['purse'][i])
+                  for i, team in enumerate(setup['teams'])},
+    }
+
+
+def _summary(results, column, strategy, purse):
+    points = results['points'][:, column]
+    grades = np.bincount(results['grade'][:, column], minlength=len(GRADES)) / len(points)
+    p10, p50, p90 = np.percentile(points, [10, 50, 90]).tolist()
+    spent = results['spent'][:, column].mean()
+    return {
+        'strategy': strategy,
+        'grades': {grade: round(share, 4) for grade, share in zip(GRADES, grades.tolist()) if share},
+        'score': {'mean': round(float(points.mean()), 2), 'p10': p10, 'p50': p50, 'p90': p90},
+        'spent': round(float(spent), 2),
+        'purse_left': round(float(purse - spent), 2),
+        'signed': round(float(results['signed'][:, column].mean()), 2),
+    }
@@ -0,0 +1,326 @@
+"""Budget-constrained squad recommendation behind GET /api/team/<name>/recommend.
+
+Which available players, bought at their price, raise the team's score the
+most without going over its purse? Every ladder in scoring.LADDERS looks at
+one category only, so the score is a sum of per-category points and the
+problem splits in two:
+
+1. Per category, for every combination of tiers the category's ladders can
+   reach (a level), the cheapest set of players meeting all the level's
+   conditions. Each condition is linear in the players signed: a count
+   (count >= k), a total (sum of stat > bound - current total) or a mean,
+   rewritten as sum(stat - bound) > bound * count - total (the other way
+   round for '<'). That is a small covering knapsack, solved exactly by
+   branch and bound: players in price order, each either signed or
+   skipped, pruned by the cheapest way to still cover the shortfall and by
+   what the remaining players can add at all. Explored states are
+   memoized: a state short of at least as much as one already explored at
+   the same player and squad size cannot lead anywhere cheaper. A search
+   past NODE_LIMIT nodes keeps its best set so far and the answer is
+   marked not optimal.
+2. Across categories, the combination of levels with the most points that
+   fits the budget and the free squad places, cheapest first. Each level
+   brings its cheapest plan only; a dearer plan with fewer players, which
+   might fit when squad places run short, is not looked for.
+
+The plan is then graded with scoring.score(), so the score reported is
+what the evaluation page will show after those signings.
+
+Per-category plans are cached on everything they depend on (the team's
+totals, the candidates with their prices and stats, the level), so after a
+sale only the category of the player sold is solved again.
+
+Prices are 'base' (each player's base price) or 'expected': the base price
+scaled by what teams have paid so far in that category (selling over base
+price of the sold players). Both are at least MIN_PRICE.
+"""
+import itertools
+import math
+import threading
+from collections import OrderedDict
+import numpy as np
+from sqlalchemy import func, select
+from auction_rules import DEFAULT_MAX_SQUAD, MIN_PRICE
+from models import db, Player
+from loaders import PLAYER_CATEGORIES
+import scoring
+
+PRICING = ['base', 'expected']
+NODE_LIMIT = 5000  # branch and bound nodes per category level; bounds the worst case
+CACHE_SIZE = 512
+
+_plans = OrderedDict()
+_lock = threading.Lock()
+
+
+def _category_of(key):
+    for category in PLAYER_CATEGORIES:
+        if key == f'{category}_count' or key.endswith(f'_{category}'):
+            return category
+    raise ValueError(f'No category in {key!r}')
+
+
+def levels(category, minimum=0):
+    """(points, conditions) for every combination of tiers the category's ladders can reach"""
+    choices = []
+    for tiers in scoring.LADDERS:
+        if _category_of(tiers[0][1][0][0]) == category:
+            choices.append([(0, ())] + tiers)
+    extra = ((f'{category}_count', '>=', minimum),) if minimum else ()
+    return [(sum(points for points, _ in combination),
+             extra + tuple(c for _, conditions in combination for c in conditions))
+            for combination in itertools.product(*choices)]
+
+
+def _constraint(key, operator, bound, current, stats):
+    """(weights, need, strict): the signed players must add sum(weights) > need (>= if not strict)"""
+    category = _category_of(key)
+    count = current[scoring.COLUMN[f'{category}_count']]
+    if key == f'{category}_count':
+        return np.ones(len(stats['matches'])), bound - count, False
+    kind, rest = key.split('_', 1)
+    stat = rest[:-len(category) - 1]
+    total = current[scoring.COLUMN[f'total_{stat}_{category}']]
+    if kind == 'total':
+        return stats[stat], bound - total, True
+    if operator == '<':
+        return bound - stats[stat], total - bound * count, True
+    return stats[stat] - bound, bound * count - total, True
+
+
+def cheapest(prices, weights, needs, strict, slots, node_limit=NODE_LIMIT):
+    """Cheapest set of players meeting every constraint, with at most slots players.
+
+    prices must be ascending; weights is one list per constraint. Returns
+    (cost, indices, optimal), or None when no set exists (or none was found
+    within node_limit).
+    """
+    count = len(prices)
+    constraints = range(len(needs))
+
+    def met(shortfall, j):
+        return shortfall < 0 if strict[j] else shortfall <= 0
+
+    prefix = [0.0]
+    for price in prices:
+        prefix.append(prefix[-1] + price)
+    # What players i.. can still add to each constraint, at most and at best per player
+    positive = [[0.0] * (count + 1) for _ in constraints]
+    largest = [[0.0] * (count + 1) for _ in constraints]
+    for j in constraints:
+        for i in range(count - 1, -1, -1):
+            positive[j][i] = positive[j][i + 1] + max(weights[j][i], 0.0)
+            largest[j][i] = max(largest[j][i + 1], weights[j][i])
+
+    # Players by price per unit of each constraint, for the fractional cover bound
+    by_value = [sorted((i for i in range(count) if weights[j][i] > 0), key=lambda i: prices[i] / weights[j][i])
+                for j in constraints]
+
+    best = [math.inf, None]
+    nodes = [0]
+    explored = {}
+
+    def players_needed(i, shortfall):
+        needed = 0
+        for j in constraints:
+            if met(shortfall[j], j):
+                continue
+            if largest[j][i] <= 0 or (positive[j][i] <= shortfall[j] if strict[j] else positive[j][i] < shortfall[j]):
+                return None
+            per_player = largest[j][i]
+            needed = max(needed, math.floor(shortfall[j] / per_player) + 1 if strict[j]
+                         else math.ceil(shortfall[j] / per_player))
+        return needed
+
+    def lower_bound(i, shortfall, needed):
+        """Least that players i.. must cost: the cheapest `needed` of them, or
+        covering any one constraint alone with fractions of players allowed"""
+        bound = prefix[i + needed] - prefix[i]
+        for j in constraints:
+            remaining = shortfall[j]
+            if remaining <= 0:
+                continue
+            cost = 0.0
+            for k in by_value[j]:
+                if k < i:
+                    continue
+                if weights[j][k] >= remaining:
+                    cost += prices[k] * remaining / weights[j][k]
+                    break
+                cost += prices[k]
+                remaining -= weights[j][k]
+            bound = max(bound, cost)
+        return bound
+
+    def greedy():
+        """A first set to prune against: the most progress per price, one player at a time"""
+        shortfall, chosen, cost = list(needs), [], 0.0
+        free = set(range(count))
+        while not all(met(shortfall[j], j) for j in constraints) and len(chosen) < slots:
+            def progress(k):
+                gain = sum(min(weights[j][k] / shortfall[j], 1.0) if shortfall[j] > 0 else 1.0
+                           for j in constraints if not met(shortfall[j], j) and weights[j][k] > 0)
+                return gain / prices[k] if prices[k] > 0 else math.inf
+            pick = max(free, key=progress, default=None)
+            if pick is None or progress(pick) <= 0:
+                return
+            free.discard(pick)
+            chosen.append(pick)
+            cost += prices[pick]
+            shortfall = [shortfall[j] - weights[j][pick] for j in constraints]
+        if all(met(shortfall[j], j) for j in constraints):
+            best[0], best[1] = cost, sorted(chosen)
+
+    def search(i, shortfall, chosen, cost):
+        nodes[0] += 1
+        if nodes[0] > node_limit:
+            return False
+        if all(met(shortfall[j], j) for j in constraints):
+            if cost < best[0]:
+                best[0], best[1] = cost, list(chosen)
+            return True
+        needed = players_needed(i, shortfall)
+        if needed is None or len(chosen) + needed > slots or i + needed > count:
+            return True
+        if cost + lower_bound(i, shortfall, needed) >= best[0] - 1e-9:
+            return True
+        seen = explored.setdefault((i, len(chosen)), [])
+        for previous, least in seen:
+            if cost + least >= best[0] and all(s >= p for s, p in zip(shortfall, previous)):
+                return True
+
+        finished = True
+        if any(weights[j][i] > 0 and not met(shortfall[j], j) for j in constraints):
+            chosen.append(i)
+            finished = search(i + 1, [shortfall[j] - weights[j][i] for j in constraints], chosen, cost + prices[i])
+            chosen.pop()
+        finished = finished and search(i + 1, shortfall, chosen, cost)
+        if finished:
+            # Nothing from here costs less than the best found since
+            seen.append((shortfall, best[0] - cost))
+        return finished
+
+    greedy()
+    optimal = search(0, list(needs), [], 0.0)
+    if best[1] is None:
+        return None
+    return best[0], best[1], optimal
+
+
+def _plan(category, conditions, current, candidates, slots):
+    """Cheapest (cost, player ids, optimal) meeting conditions in one category, cached"""
+    rows = candidates['rows'][category]
+    ids = [candidates['id'][row] for row in rows]
+    prices = candidates['price'][rows]
+    stats = {stat: candidates[stat][rows] for stat in scoring.CANDIDATE_STATS}
+    constraints = [_constraint(key, operator, bound, current, stats) for key, operator, bound in conditions]
+    # Keyed on ids, not positions: a sale elsewhere shifts every position
+    key = (category, tuple(ids), prices.tobytes(), slots,
+           tuple((weights.tobytes(), need, strict) for weights, need, strict in constraints))
+    with _lock:
+        if key in _plans:
+            _plans.move_to_end(key)
+            return _plans[key]
+
+    plan = cheapest(prices.tolist(), [weights.tolist() for weights, _, _ in constraints],
+                    [need for _, need, _ in constraints], [strict for _, _, strict in constraints], slots)
+    if plan is not None:
+        cost, positions, optimal = plan
+        plan = (cost, [ids[p] for p in positions], optimal)
+    with _lock:
+        _plans[key] = plan
+        while len(_plans) > CACHE_SIZE:
+            _plans.popitem(last=False)
+    return plan
+
+
+def expected_multipliers():
+    """Selling over base price of the players sold so far, per category (1 without sales)"""
+    query = (select(Player.type, func.sum(Player.selling_price), func.sum(Player.base_price))
+             .where(Player.team_id.isnot(None), Player.selling_price.isnot(None))
+             .group_by(Player.type))
+    multipliers = dict.fromkeys(PLAYER_CATEGORIES, 1.0)
+    for category, paid, base in db.session.execute(query):
+        if category in multipliers and paid and base:
+            multipliers[category] = max(paid / base, 1.0)
+    return multipliers
+
+
+def prices(candidates, pricing):
+    """What each candidate is expected to cost under pricing"""
+    price = candidates['base_price'].copy()
+    if pricing == 'expected':
+        multipliers = expected_multipliers()
+        price *= np.array([multipliers.get(category, 1.0) for category in candidates['type']])
+    return np.maximum(np.round(price, 2), MIN_PRICE)
+
+
+def recommend(team, candidates, budget, pricing='base', minimums=None,
+              max_squad=DEFAULT_MAX_SQUAD):
+    """The signings that raise the team's score the most within budget.
+
+    candidates comes from scoring.candidates(); minimums maps category to
+    the number of players the squad must have.
+    """
+    minimums = minimums or {}
+    current_matrix = scoring.team_matrix([team])
+    current = current_matrix[0]
+    squad = int(sum(current[scoring.COLUMN[f'{category}_count']] for category in PLAYER_CATEGORIES))
+    slots = max(max_squad - squad, 0)
+
+    # Price order inside each category is what cheapest() expects
+    candidates = dict(candidates, price=prices(candidates, pricing))
+    order = np.lexsort((candidates['player_number'], candidates['price']))
+    candidates['rows'] = {category: order[candidates['type'][order] == category]
+                          for category in PLAYER_CATEGORIES}
+
+    options = []
+    for category in PLAYER_CATEGORIES:
+        reachable = []
+        for points, conditions in levels(category, minimums.get(category, 0)):
+            plan = _plan(category, conditions, current, candidates, slots)
+            if plan is not None:
+                reachable.append((points, *plan))
+        options.append(reachable)
+
+    best = None
+    for combination in itertools.product(*options):
+        cost = sum(option[1] for option in combination)
+        signed = sum(len(option[2]) for option in combination)
+        if cost > budget + 1e-9 or signed > slots:
+            continue
+        key = (-sum(option[0] for option in combination), cost)
+        if best is None or key < best[0]:
+            best = (key, combination)
+
+    now, now_grade = scoring.score(current_matrix)
+    result = {
+        'score': int(now[0]),
+        'grade': str(now_grade[0]),
+        'feasible': best is not None,
+        'optimal': best is not None and all(option[3] for option in best[1]),
+        'players': [],
+        'cost': 0,
+    }
+    if best is None:
+        return result
+
+    row_of = {player_id: row for row, player_id in enumerate(candidates['id'])}
+    rows = sorted(row_of[player_id] for option in best[1] for player_id in option[2])
+    price = candidates['price']
+    signings = {key: candidates[key][rows] for key in ['type', *scoring.CANDIDATE_STATS]}
+    after = current_matrix + scoring.contribution_matrix(signings, price[rows]).sum(axis=0, keepdims=True)
+    then, then_grade = scoring.score(scoring.round_totals(after))
+    result.update(
+        players=[{
+            'player_id': candidates['id'][row],
+            'name': candidates['name'][row],
+            'category': candidates['type'][row],
+            'player_number': candidates['player_number'][row],
+            'price': float(price[row]),
+        } for row in rows],
+        cost=round(float(price[rows].sum()), 2),
+        recommended_score=int(then[0]),
+        recommended_grade=str(then_grade[0]),
+    )
+    return result
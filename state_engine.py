@@ -0,0 +1,569 @@
+"""In-memory authoritative auction state with write-behind persistence.
+
+With AUCTION_STATE=memory the process keeps teams, players, purses and roster
+totals in compact __slots__ objects and serves the auction pages from them,
+so a page view does not touch the database. Sales and unsold calls settle
+here as well:
+
+1. the action is validated against memory (same rules and errors as
+   settlement.py)
+2. it is appended to a local journal file (JSON lines, fsync'd by default)
+3. it is applied to memory, and the auctioneer gets the answer
+
+A background thread writes the changed players, purses, aggregate rows,
+bids and auction events (event_log.py) to the database every AUCTION_FLUSH_INTERVAL seconds, or sooner once
+AUCTION_FLUSH_BATCH actions are pending. It commits the last journal
+sequence number (JournalCheckpoint) in the same transaction and then
+truncates the journal. After a crash, the next start loads the database and
+replays journal entries past the checkpoint, so an acknowledged sale is
+never lost and never written twice.
+
+Only one process may own the state. The journal is guarded by an exclusive
+file lock taken when the app starts, so a second worker or a `flask` command
+against the same journal fails to start instead of diverging. Run memory
+mode with a single worker; use threads for concurrency. A preloading server
+(wsgi.py) hands the lock from its master to the worker with before_fork()
+and after_fork(), since a lock inherited across fork would be shared.
+
+Less frequent writes (adding, editing and deleting players or teams, purse
+edits, resets) are wrapped in @write_through: pending actions are flushed,
+the route writes to the database as usual, and memory is reloaded. Routes
+that query the database directly (search, what-if) are wrapped in @flushed
+so they see every acknowledged sale.
+"""
+import atexit
+import fcntl
+import json
+import os
+import threading
+from bisect import insort
+from contextlib import nullcontext
+from datetime import datetime
+from functools import wraps
+from flask import current_app, has_app_context, jsonify, request
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.orm import Session
+from models import db, Team, Player, TeamAggregate, BidHistory, JournalCheckpoint, AuctionEvent, roster, forget_rosters
+from player_data import STAT_FIELDS
+import aggregates
+import event_log
+import loaders
+import settlement
+
+MODES = ('database', 'memory')
+
+DEFAULTS = {
+    'AUCTION_STATE': 'database',
+    'AUCTION_JOURNAL_PATH': '',      # '' = <instance path>/auction-journal.jsonl
+    'AUCTION_FLUSH_INTERVAL': 1.0,   # seconds between write-behind flushes
+    'AUCTION_FLUSH_BATCH': 200,      # flush early once this many actions are pending
+    'AUCTION_JOURNAL_FSYNC': 'true',
+}
+
+STATS = list(dict.fromkeys(field for fields in STAT_FIELDS.values() for field, _ in fields))
+
+
+class StateLocked(RuntimeError):
+    """Another process already owns the auction state journal"""
+
+
+class AggregateState:
+    __slots__ = tuple(aggregates.FIELDS)
+
+    def __init__(self, row):
+        for field in aggregates.FIELDS:
+            setattr(self, field, getattr(row, field, 0) or 0)
+
+    def add(self, deltas):
+        # Same arithmetic as aggregates.add's `col = col + delta`
+        for field, delta in deltas.items():
+            if delta:
+                setattr(self, field, getattr(self, field) + delta)
+
+
+class TeamState:
+    __slots__ = ('id', 'name', 'owner_name', 'purse', 'aggregate', 'all_players')
+
+    def __init__(self, team):
+        self.id = team.id
+        self.name = team.name
+        self.owner_name = team.owner_name
+        self.purse = team.purse
+        self.aggregate = AggregateState(team.aggregate)
+        self.all_players = []  # kept in id order, like the database rosters
+
+    @property
+    def players(self):
+        return roster(self)
+
+    @property
+    def stats(self):
+        return {f'{category}_count': getattr(self.aggregate, f'{category}_count') for category in STAT_FIELDS}
+
+
+class PlayerState:
+    __slots__ = ('id', 'name', 'type', 'player_number', 'base_price', 'selling_price',
+                 'status', 'team_id', 'team_name', 'team', *STATS)
+
+    def __init__(self, player, team):
+        for field in ('id', 'name', 'type', 'player_number', 'base_price', 'selling_price',
+                      'status', 'team_id', 'team_name'):
+            setattr(self, field, getattr(player, field))
+        for field in STATS:
+            setattr(self, field, getattr(player, field, None))
+        self.team = team
+
+    @property
+    def category(self):
+        return self.type
+
+    @property
+    def stats(self):
+        return {field: getattr(self, field) for field, _ in STAT_FIELDS.get(self.type, [])}
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'category': self.type,
+            'player_number': self.player_number,
+            'base_price': self.base_price,
+            'status': self.status,
+            'selling_price': self.selling_price,
+            'sold_to': self.team.name if self.team else None,
+            'stats': self.stats,
+        }
+
+
+class StateEngine:
+    def __init__(self, engine, journal_path, flush_interval, flush_batch, fsync, logger,
+                 snapshot_every=event_log.DEFAULT_SNAPSHOT_EVERY):
+        self.engine = engine
+        self.snapshot_every = snapshot_every
+        self.journal_path = journal_path
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.fsync = fsync
+        self.logger = logger
+
+        # Lock order: _flush_lock before lock. Page renders and actions only
+        # take lock; the database write of a flush holds only _flush_lock.
+        self.lock = threading.RLock()
+        self._flush_lock = threading.RLock()
+
+        self._owner = self._journal = None
+        self.open_journal()
+
+        self.loaded = False
+        self.version = 0      # bumped by every change; cache keys use it
+        self.seq = 0          # last journal entry written
+        self.flushed_seq = 0  # last journal entry in the database
+        self.teams = {}
+        self.teams_by_name = {}
+        self.players = {}
+        self._dirty_players = set()
+        self._dirty_teams = set()
+        self._bids = []
+        self._events = []
+
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    # Journal ownership
+
+    def open_journal(self):
+        """Take the journal's exclusive lock; raises StateLocked if another process holds it"""
+        if self._owner is not None:
+            return
+        os.makedirs(os.path.dirname(self.journal_path) or '.', exist_ok=True)
+        self._owner = open(self.journal_path + '.lock', 'a')
+        try:
+            fcntl.flock(self._owner, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._owner.close()
+            self._owner = None
+            raise StateLocked(f'{self.journal_path} is owned by another process; '
+                              'AUCTION_STATE=memory needs a single worker')
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    def close_journal(self):
+        """Give the journal up before forking. Only an unloaded engine may be handed over:
+        a forked child keeps neither the flush thread nor a consistent copy of the lock."""
+        if self.loaded:
+            raise RuntimeError('The auction state was loaded before forking; load it in the worker')
+        if self._owner is not None:
+            self._journal.close()
+            self._owner.close()  # the lock goes with the last descriptor
+            self._owner = self._journal = None
+
+    # Loading and recovery
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            with self._flush_lock, self.lock:
+                if not self.loaded:
+                    self.load()
+
+    def load(self):
+        """Build the state from the database, then replay unflushed journal entries"""
+        JournalCheckpoint.__table__.create(self.engine, checkfirst=True)
+        db.session.expire_all()
+        team_rows = Team.query.all()
+
+        self.teams = {team.id: TeamState(team) for team in team_rows}
+        self.teams_by_name = {team.name: team for team in self.teams.values()}
+        self.players = {}
+        for row in sorted(loaders.load_players(), key=lambda p: p.id):
+            team = self.teams.get(row.team_id)
+            player = self.players[row.id] = PlayerState(row, team)
+            if team is not None:
+                team.all_players.append(player)
+        self._dirty_players.clear()
+        self._dirty_teams.clear()
+        self._bids = []
+        self._events = []
+
+        checkpoint = db.session.get(JournalCheckpoint, 1)
+        self.flushed_seq = self.seq = checkpoint.seq if checkpoint else 0
+        db.session.commit()
+
+        replayed = 0
+        for entry in self._read_journal():
+            if entry['seq'] <= self.flushed_seq:
+                continue
+            self._check(entry)
+            self._apply(entry)
+            self.seq = entry['seq']
+            replayed += 1
+        if replayed:
+            self.logger.warning('Replayed %d auction actions from %s', replayed, self.journal_path)
+            self._wake.set()
+
+        self.version += 1
+        self.loaded = True
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='auction-state-flush', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def reload(self):
+        """Rebuild from the database after a write-through route; pending actions must be flushed"""
+        with self._flush_lock, self.lock:
+            self.load()
+
+    def _read_journal(self):
+        with open(self.journal_path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        for number, line in enumerate(lines, 1):
+            try:
+                yield json.loads(line)
+            except ValueError:
+                if number == len(lines):
+                    # Torn final write: that action was never acknowledged
+                    self.logger.warning('Ignoring incomplete last journal line in %s', self.journal_path)
+                    return
+                raise
+
+    # Actions
+
+    def sell(self, player_id, team_name, price):
+        """Sell a player to a team; returns (player, teams whose purse changed, new owner first)"""
+        with self.lock:
+            player = self._player(player_id)
+            team = self.teams_by_name.get(team_name)
+            if team is None:
+                raise LookupError('Team not found')
+            previous = player.team
+            self._record({'op': 'sell', 'player': player_id, 'team': team.id, 'price': price})
+            return player, [team] + ([previous] if previous and previous is not team else [])
+
+    def release(self, player_id, status):
+        """Take a player off its team with a refund; returns (player, refunded teams)"""
+        with self.lock:
+            player = self._player(player_id)
+            previous = player.team
+            self._record({'op': 'release', 'player': player_id, 'status': status})
+            return player, [previous] if previous else []
+
+    def _player(self, player_id):
+        player = self.players.get(player_id)
+        if player is None:
+            raise LookupError('Player not found')
+        return player
+
+    def _record(self, entry):
+        """Validate, journal, then apply one action"""
+        self._check(entry)
+        entry = dict(entry, seq=self.seq + 1, at=datetime.utcnow().isoformat())
+        self._journal.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self.seq = entry['seq']
+        self._apply(entry)
+        self.version += 1
+        if self.seq - self.flushed_seq >= self.flush_batch:
+            self._wake.set()
+
+    def _check(self, entry):
+        player = self._player(entry['player'])
+        if entry['op'] == 'sell':
+            team = self.teams.get(entry['team'])
+            if team is None:
+                raise LookupError('Team not found')
+            credit = settlement.paid(player) if player.team is team else 0
+            if not team.purse + credit >= entry['price']:
+                raise settlement.InsufficientPurse('Insufficient team budget')
+
+    def _apply(self, entry):
+        # Mirrors settlement.sell/release statement for statement, so the
+        # flushed values equal what the database path would have written
+        player = self.players[entry['player']]
+        previous = player.team
+        touched = [t for t in (previous, self.teams.get(entry.get('team'))) if t is not None]
+        purses = {team.id: team.purse for team in touched}
+        logged = event_log.player_state(player)
+        if previous is not None:
+            credit = settlement.paid(player)
+            previous.aggregate.add({field: -value for field, value in aggregates.contributions(player).items()})
+            previous.all_players.remove(player)
+            self._dirty_teams.add(previous.id)
+
+        if entry['op'] == 'sell':
+            team = self.teams[entry['team']]
+            price = entry['price']
+            if previous is team:
+                team.purse = team.purse + credit - price
+            else:
+                team.purse = team.purse - price
+                if previous is not None and credit:
+                    previous.purse = previous.purse + credit
+            player.status = 'sold'
+            player.selling_price = price
+            player.team_id = team.id
+            player.team_name = team.name
+            player.team = team
+            insort(team.all_players, player, key=lambda p: p.id)
+            team.aggregate.add(aggregates.contributions(player))
+            self._dirty_teams.add(team.id)
+            self._bids.append({'player_id': player.id, 'team_id': team.id, 'amount': price,
+                               'timestamp': datetime.fromisoformat(entry['at'])})
+        else:
+            if previous is not None and credit:
+                previous.purse = previous.purse + credit
+            for field, value in settlement.RELEASED.items():
+                setattr(player, field, value)
+            player.status = entry['status']
+            player.team = None
+        self._dirty_players.add(player.id)
+        forget_rosters()
+
+        event_type = 'sold' if entry['op'] == 'sell' else 'unsold' if entry['status'] == 'unsold' else 'released'
+        self._events.append({
+            'type': event_type,
+            'created_at': datetime.fromisoformat(entry['at']),
+            'changes': event_log.changes_of(
+                players={player.id: (logged, event_log.player_state(player))},
+                teams={team.id: ({'purse': purses[team.id]}, {'purse': team.purse}) for team in touched}),
+        })
+
+    # Write-behind
+
+    def pending(self):
+        return self.seq - self.flushed_seq
+
+    def flush(self):
+        """Write every journaled action to the database; returns how many were flushed"""
+        with self._flush_lock:
+            with self.lock:
+                seq = self.seq
+                if seq == self.flushed_seq:
+                    return 0
+                players = [{'_id': p.id, 'status': p.status, 'selling_price': p.selling_price,
+                            'team_id': p.team_id, 'team_name': p.team_name}
+                           for p in map(self.players.get, self._dirty_players) if p is not None]
+                teams = [self.teams[team_id] for team_id in self._dirty_teams if team_id in self.teams]
+                purses = [{'_id': t.id, 'purse': t.purse} for t in teams]
+                totals = [{'_id': t.id, **{f: getattr(t.aggregate, f) for f in aggregates.FIELDS}} for t in teams]
+                bids, events = self._bids, self._events
+                dirty = (self._dirty_players, self._dirty_teams)
+                self._dirty_players, self._dirty_teams, self._bids, self._events = set(), set(), [], []
+
+            try:
+                self._write(seq, players, purses, totals, bids, events)
+            except Exception:
+                with self.lock:
+                    self._dirty_players |= dirty[0]
+                    self._dirty_teams |= dirty[1]
+                    self._bids = bids + self._bids
+                    self._events = events + self._events
+                raise
+
+            with self.lock:
+                flushed = seq - self.flushed_seq
+                self.flushed_seq = seq
+                if self.seq == seq:
+                    # Everything is in the database (and the checkpoint says so)
+                    os.ftruncate(self._journal.fileno(), 0)
+            return flushed
+
+    def _write(self, seq, players, purses, totals, bids, events):
+        player_table = Player.__table__
+        team_table = Team.__table__
+        aggregate_table = TeamAggregate.__table__
+        checkpoint_table = JournalCheckpoint.__table__
+        with self.engine.begin() as conn:
+            if players:
+                conn.execute(update(player_table).where(player_table.c.id == bindparam('_id'))
+                             .values({field: bindparam(field) for field in players[0] if field != '_id'}),
+                             players)
+            if purses:
+                conn.execute(update(team_table).where(team_table.c.id == bindparam('_id'))
+                             .values(purse=bindparam('purse')), purses)
+                conn.execute(update(aggregate_table).where(aggregate_table.c.team_id == bindparam('_id'))
+                             .values({field: bindparam(field) for field in aggregates.FIELDS}), totals)
+            if bids:
+                conn.execute(insert(BidHistory.__table__), bids)
+            if events:
+                conn.execute(insert(AuctionEvent.__table__), events)
+                # Single writer: this batch holds the newest ids
+                last = conn.scalar(select(func.max(AuctionEvent.id)))
+                with Session(bind=conn) as session:
+                    event_log.write_snapshots(session, last - len(events) + 1, last,
+                                              [event['changes'] for event in events], self.snapshot_every)
+            result = conn.execute(update(checkpoint_table).where(checkpoint_table.c.id == 1).values(seq=seq))
+            if result.rowcount == 0:
+                conn.execute(insert(checkpoint_table).values(id=1, seq=seq))
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                self.logger.exception('Write-behind flush failed; %d actions stay in the journal', self.pending())
+
+    def close(self):
+        self._stopped = True
+        self._wake.set()
+        try:
+            self.flush()
+        except Exception:
+            self.logger.exception('Final flush failed; the journal is replayed on next start')
+
+    def stats(self):
+        with self.lock:
+            return {
+                'players': len(self.players),
+                'teams': len(self.teams),
+                'version': self.version,
+                'journal_seq': self.seq,
+                'flushed_seq': self.flushed_seq,
+                'pending': self.pending(),
+            }
+
+
+def init_app(app, db):
+    mode = app.config.get('AUCTION_STATE') or 'database'
+    if mode not in MODES:
+        raise ValueError(f'Unknown AUCTION_STATE {mode!r}; expected one of {list(MODES)}')
+    if mode != 'memory':
+        return
+    with app.app_context():
+        engine = db.engine
+    path = app.config.get('AUCTION_JOURNAL_PATH') or os.path.join(app.instance_path, 'auction-journal.jsonl')
+    app.extensions['auction_state'] = StateEngine(
+        engine, path,
+        flush_interval=float(app.config['AUCTION_FLUSH_INTERVAL']),
+        flush_batch=int(app.config['AUCTION_FLUSH_BATCH']),
+        fsync=str(app.config['AUCTION_JOURNAL_FSYNC']).lower() in ('1', 'true', 'yes', 'on'),
+        logger=app.logger,
+        snapshot_every=int(app.config.get('AUCTION_SNAPSHOT_EVERY') or event_log.DEFAULT_SNAPSHOT_EVERY),
+    )
+
+
+def before_fork(app):
+    """Release the journal in a preloading server's master (see wsgi.py)"""
+    if 'auction_state' in app.extensions:
+        app.extensions['auction_state'].close_journal()
+
+
+def after_fork(app):
+    """Take the journal in the forked worker and load the state before the first request"""
+    if 'auction_state' in app.extensions:
+        engine = app.extensions['auction_state']
+        engine.open_journal()
+        with app.app_context():
+            engine.ensure_loaded()
+
+
+def enabled():
+    return has_app_context() and 'auction_state' in current_app.extensions
+
+
+def current():
+    """The app's state engine, loaded on first use"""
+    engine = current_app.extensions['auction_state']
+    engine.ensure_loaded()
+    return engine
+
+
+def locked():
+    """Hold the state still while a page renders from it (no-op in database mode)"""
+    return current().lock if enabled() else nullcontext()
+
+
+def version():
+    return current().version
+
+
+# Drop-in replacements for the loaders.py page queries
+
+def load_players():
+    return list(current().players.values())
+
+
+def load_teams():
+    return list(current().teams.values())
+
+
+load_team_summaries = load_teams
+
+
+def load_team(team_name):
+    return current().teams_by_name.get(team_name)
+
+
+# Route decorators
+
+def flushed(view):
+    """Flush pending actions before a view that queries the database directly"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if enabled():
+            current().flush()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def write_through(view):
+    """Run a database-writing route with actions flushed before and memory reloaded after.
+
+    Goes inside auth.require, so a refused request never takes the locks."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not enabled() or request.method == 'GET':
+            return view(*args, **kwargs)
+        engine = current()
+        with engine._flush_lock, engine.lock:
+            try:
+                engine.flush()
+            except Exception as e:
+                return jsonify({'error': f'Auction state could not be saved: {e}'}), 503
+            try:
+                return view(*args, **kwargs)
+            finally:
+                engine.reload()
+    return wrapper
@@ -0,0 +1,221 @@
+// Live auction updates over Server-Sent Events (/api/events).
+//
+// Every write endpoint publishes a small delta (players, teams, released or
+// deleted ids). This script patches whatever the current page shows of them,
+// found through data attributes:
+//   #player-data               JSON island: the page's players by id, read
+//                              through AuctionLive.player(id) and kept current
+//   [data-player-id]           element showing that player
+//     [data-field]             selling_price | status | sale | name | stat:<key>
+//   [data-team-purse]          remaining purse of team <id>
+//   [data-team-stat]           "<id>:<stat>", e.g. "3:batsmen_count"
+//   [data-team-spent]          "<id>:<category|overall>"
+//   [data-team-label] / [data-team-link] / option[data-team-id]
+//   [data-team-card]           removed when the team is deleted
+//   [data-roster-team-id][data-roster-category]  roster lists; items carry
+//                              [data-roster-player-id]
+// Pages can set AuctionLive.renderRosterItem(container, player),
+// AuctionLive.onChange() and AuctionLive.reloadOnRename.
+(function () {
+    const live = {
+        connected: false,
+        renderRosterItem: null,
+        onChange: null,
+        reloadOnRename: false
+    };
+    window.AuctionLive = live;
+
+    // Pages call this after a successful write. The published event patches
+    // the DOM, so only reload when the feed is down.
+    live.afterChange = function () {
+        if (!live.connected) {
+            location.reload();
+        }
+    };
+
+    // The players the page was rendered with, from its JSON island, by id
+    let players = null;
+    function playerMap() {
+        if (players === null) {
+            const island = document.getElementById('player-data');
+            players = island ? JSON.parse(island.textContent) : {};
+        }
+        return players;
+    }
+
+    live.player = function (id) {
+        return playerMap()[id] || null;
+    };
+
+    // Match how Jinja prints Python floats (100.0, 95.5)
+    live.formatAmount = function (value) {
+        const number = Number(value);
+        return Number.isInteger(number) ? number.toFixed(1) : String(number);
+    };
+
+    function title(text) {
+        return text ? text.charAt(0).toUpperCase() + text.slice(1) : '';
+    }
+
+    function renderField(cell, player) {
+        const field = cell.dataset.field;
+        if (field === 'selling_price') {
+            cell.textContent = player.selling_price ? `₹${live.formatAmount(player.selling_price)}Cr` : '-';
+        } else if (field === 'status') {
+            cell.textContent = title(player.status);
+        } else if (field === 'name') {
+            cell.textContent = player.name;
+        } else if (field.startsWith('stat:')) {
+            cell.textContent = player.stats[field.slice(5)];
+        } else if (field === 'sale') {
+            cell.replaceChildren();
+            if (player.status === 'sold') {
+                const badge = document.createElement('span');
+                badge.className = 'badge bg-success';
+                badge.textContent = `Sold to ${player.sold_to}`;
+                cell.appendChild(badge);
+            } else {
+                const button = document.createElement('button');
+                button.className = 'btn btn-sm btn-success';
+                button.textContent = 'Sell';
+                button.addEventListener('click', () => sellPlayer(String(player.id)));
+                cell.appendChild(button);
+            }
+        }
+    }
+
+    function syncRosters(player) {
+        document.querySelectorAll(`[data-roster-player-id="${player.id}"]`).forEach(item => {
+            const container = item.closest('[data-roster-team-id]');
+            if (!container || Number(container.dataset.rosterTeamId) !== player.team_id) {
+                item.remove();
+            }
+        });
+
+        if (!player.team_id) {
+            return;
+        }
+        const container = document.querySelector(
+            `[data-roster-team-id="${player.team_id}"][data-roster-category="${player.category}"]`);
+        if (container && !container.querySelector(`[data-roster-player-id="${player.id}"]`)) {
+            if (live.renderRosterItem) {
+                live.renderRosterItem(container, player);
+            } else {
+                location.reload();
+            }
+        }
+    }
+
+    function patchPlayer(player) {
+        playerMap()[player.id] = player;
+        document.querySelectorAll(`[data-player-id="${player.id}"]`).forEach(el => {
+            if (el.dataset.status !== undefined) {
+                el.dataset.status = player.status;
+            }
+            el.querySelectorAll('[data-field]').forEach(cell => renderField(cell, player));
+        });
+        syncRosters(player);
+    }
+
+    function releasePlayer(id) {
+        const player = live.player(id);
+        if (!player) {
+            // Only shown in a roster here; nothing else to re-render
+            document.querySelectorAll(`[data-roster-player-id="${id}"]`).forEach(el => el.remove());
+            return;
+        }
+        Object.assign(player, { status: 'untouched', selling_price: null, sold_to: null, team_id: null });
+        patchPlayer(player);
+    }
+
+    function deletePlayer(id) {
+        delete playerMap()[id];
+        document.querySelectorAll(`[data-player-id="${id}"], [data-roster-player-id="${id}"]`)
+            .forEach(el => el.remove());
+    }
+
+    function patchTeam(team, previousName) {
+        if (previousName && previousName !== team.name) {
+            if (document.body.dataset.pageTeamId === String(team.id)) {
+                window.location.href = `/team/${encodeURIComponent(team.name)}`;
+                return;
+            }
+            if (live.reloadOnRename) {
+                location.reload();
+                return;
+            }
+        }
+
+        document.querySelectorAll(`[data-team-purse="${team.id}"]`)
+            .forEach(el => el.textContent = live.formatAmount(team.purse));
+        Object.entries(team.stats).forEach(([stat, value]) => {
+            document.querySelectorAll(`[data-team-stat="${team.id}:${stat}"]`)
+                .forEach(el => el.textContent = value);
+        });
+        Object.entries(team.spent).forEach(([category, value]) => {
+            document.querySelectorAll(`[data-team-spent="${team.id}:${category}"]`)
+                .forEach(el => el.textContent = live.formatAmount(value));
+        });
+        document.querySelectorAll(`[data-team-label="${team.id}"]`)
+            .forEach(el => el.textContent = team.name);
+        document.querySelectorAll(`[data-team-link="${team.id}"]`)
+            .forEach(el => el.href = `/team/${encodeURIComponent(team.name)}`);
+        document.querySelectorAll(`option[data-team-id="${team.id}"]`).forEach(option => {
+            option.value = team.name;
+            option.textContent = `${team.name} (₹${live.formatAmount(team.purse)}M)`;
+        });
+    }
+
+    function deleteTeam(id) {
+        if (document.body.dataset.pageTeamId === String(id)) {
+            window.location.href = '/teams';
+            return;
+        }
+        document.querySelectorAll(`[data-team-card="${id}"], option[data-team-id="${id}"]`)
+            .forEach(el => el.remove());
+    }
+
+    function apply(event) {
+        if (event.reload) {
+            location.reload();
+            return;
+        }
+        (event.players || []).forEach(patchPlayer);
+        (event.released || []).forEach(releasePlayer);
+        (event.deleted_player_ids || []).forEach(deletePlayer);
+        (event.teams || []).forEach(team => patchTeam(team, event.previous_name));
+        (event.deleted_team_ids || []).forEach(deleteTeam);
+        if (live.onChange) {
+            live.onChange(event);
+        }
+    }
+
+    if (!window.EventSource) {
+        return;
+    }
+
+    let everConnected = false;
+    function connect() {
+        const source = new EventSource('/api/events');
+        source.onopen = () => {
+            // Deltas sent while we were disconnected are lost; re-render once.
+            if (everConnected && !live.connected) {
+                location.reload();
+                return;
+            }
+            everConnected = true;
+            live.connected = true;
+        };
+        source.onerror = () => {
+            live.connected = false;
+            // A refused stream (503: the server is at AUCTION_EVENTS_MAX_CLIENTS)
+            // is closed for good; try again later instead of giving up, spread
+            // out so refused pages don't all come back at once.
+            if (source.readyState === EventSource.CLOSED) {
+                setTimeout(connect, 30000 + Math.random() * 15000);
+            }
+        };
+        source.onmessage = (message) => apply(JSON.parse(message.data));
+    }
+    connect();
+})();
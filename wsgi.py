@@ -0,0 +1,75 @@
+"""Production entry point.
+
+    gunicorn -c gunicorn.conf.py
+
+gunicorn.conf.py loads create_app() once in the master (preload_app), so
+the imports, template compilation and the schema check are paid once and
+the workers fork with them already in memory. It refuses to start with the
+default session secret while logins are on (auth.py). Development still runs
+`python main.py`.
+
+Nothing that holds a socket, a thread or a file lock may cross the fork:
+before_fork() closes the master's database connections and hands the
+journal lock back (AUCTION_STATE=memory), and after_fork() rebuilds the
+live-update backend, takes the journal and opens the worker's first
+connections, so the first request doesn't pay for them.
+"""
+import sys
+
+
+def create_app():
+    """The Flask app, checked against the database and ready to fork"""
+    from app import app
+    from models import db
+    import auth
+    import schema
+
+    if auth.enabled(app) and app.secret_key == auth.DEFAULT_SECRET:
+        raise RuntimeError('Set SESSION_SECRET: login sessions are signed with it')
+    with app.app_context():
+        schema.check(db.engine, db.metadata, app.logger)
+        # Load every template now (from the bytecode cache when it is warm, see
+        # cache.py) rather than on each worker's first request
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+        db.engine.dispose()
+    return app
+
+
+def before_fork():
+    """Called in the master before each worker is forked"""
+    if 'app' not in sys.modules:
+        return  # not preloaded; each worker imports the app itself
+    from app import app
+    from models import db
+    import state_engine
+
+    with app.app_context():
+        db.engine.dispose()
+    state_engine.before_fork(app)
+
+
+def after_fork(warm_up=0, max_streams=None):
+    """Called in each worker after the fork, before it accepts requests.
+
+    max_streams caps the worker's live streams when AUCTION_EVENTS_MAX_CLIENTS
+    is not set (gunicorn.conf.py sizes it from the worker's threads)."""
+    if 'app' not in sys.modules:
+        return
+    from app import app
+    from models import db
+    import db_pool
+    import live
+    import state_engine
+
+    if max_streams is not None:
+        app.config['AUCTION_EVENTS_MAX_CLIENTS'] = max_streams
+    live.init_app(app)  # the Redis relay thread stayed in the master
+    state_engine.after_fork(app)
+    if warm_up:
+        try:
+            with app.app_context():
+                opened = db_pool.warm_up(db.engine, warm_up)
+            app.logger.info('Opened %d database connections in worker', opened)
+        except Exception as e:
+            app.logger.warning('Database warm-up failed: %s', e)